@@ -5,13 +5,34 @@ import re
 import os
 import json
 import time
+import asyncio
 import operator
-from typing import TypedDict, Optional, Annotated
+from contextlib import nullcontext
+from typing import Any, TypedDict, Optional, Annotated
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, START, END
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from dotenv import load_dotenv
-from mock_db import get_merchant_logs, search_docs
+from signatures import scan_sections
+from llm_cache import DEFAULT_TTL_SECONDS, ResponseCache, cache_key
+from ticket_dedup import DEFAULT_SIMILARITY, NearDuplicateIndex, log_signature
+from shared_work import SharedWork
+from insights import AnalysisStore
+from mock_db import (
+    docs_version,
+    log_store,
+    merchant_resolver,
+    extract_merchant_id,
+    get_merchant_logs,
+    get_merchant_log_messages,
+    get_merchant_log_templates,
+    get_merchant_log_high_water,
+    resolve_merchant_id,
+    passage_term_counts,
+    rank_passages_by_counts,
+)
 
 # Load environment variables
 load_dotenv()
@@ -24,23 +45,88 @@ llm = ChatGoogleGenerativeAI(
     max_retries=3,
 )
 
+# Cache of generate_solution results keyed on the full prompt: an in-memory
+# LRU in front of a SQLite file. Set LLM_CACHE_PATH= (empty) for memory only.
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "llm_cache.sqlite3"))
+response_cache = ResponseCache(
+    LLM_CACHE_PATH or None,
+    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+)
+
+# Reworded tickets for the same merchant and logs reuse an earlier analysis
+# when their MinHash similarity reaches TICKET_DEDUP_SIMILARITY
+duplicate_index = NearDuplicateIndex(similarity=float(os.getenv("TICKET_DEDUP_SIMILARITY", DEFAULT_SIMILARITY)))
+
+# Latest analysis of each ticket, stamped with its inputs (ticket hash, log
+# high-water mark, doc corpus version). Set ANALYSIS_STORE_PATH= (empty) for memory only.
+ANALYSIS_STORE_PATH = os.getenv("ANALYSIS_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "analyses.sqlite3"))
+analysis_store = AnalysisStore(ANALYSIS_STORE_PATH or None)
+
+# Number of doc passages (sections, not whole articles) passed to the LLM
+MAX_DOC_PASSAGES = 5
+
+# Number of collapsed log templates passed to the LLM
+MAX_LOG_TEMPLATES = 40
+
+
+def merge_timings(left: dict, right: dict) -> dict:
+    """Reducer for node timings written by parallel branches."""
+    return {**(left or {}), **(right or {})}
+
+
+def elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def llm_slot(config: Optional[RunnableConfig]):
+    """Concurrency limiter for LLM calls from config["configurable"]["llm_semaphore"] (batch runs)."""
+    semaphore = ((config or {}).get("configurable") or {}).get("llm_semaphore")
+    return semaphore if semaphore is not None else nullcontext()
+
+
+async def shared(config: Optional[RunnableConfig], key: tuple, compute):
+    """
+    Run a CPU-bound lookup in a worker thread, once per batch via
+    config["configurable"]["shared_work"], else just for this call.
+    """
+    work = ((config or {}).get("configurable") or {}).get("shared_work")
+    if work is not None:
+        return await work.get_or_compute(key, compute)
+    return await asyncio.to_thread(compute)
+
 
 class AgentState(TypedDict):
     """State schema for the agent workflow."""
     ticket_text: str
     merchant_id: Optional[str]
+    email: Optional[str]  # Submitter email, used for local merchant resolution
     logs_found: list[str]
-    relevant_docs: list[str]
+    log_hwm: int  # Merchant log rows when the logs were read (high-water mark)
+    relevant_docs: list[str]  # Doc section passages, best match first
+    error_types: list[str]  # Error signatures detected in the merchant's logs
+    search_terms: list[str]  # Doc search terms from signatures in the logs
+    ticket_terms: list[str]  # Doc search terms from signatures in the ticket text
+    ticket_counts: Any  # Passage-index term counts of the ticket text (NumPy vector)
+    timings: Annotated[dict[str, float], merge_timings]  # Node durations in ms
     diagnosis: str
     confidence_score: float
     recommended_action: str
+    llm_error: Optional[str]  # Why Gemini failed, when the diagnosis is a fallback
     steps_log: Annotated[list[str], operator.add]  # Accumulates steps
 
 
-def extract_metadata(state: AgentState) -> dict:
+async def extract_metadata(state: AgentState, config: RunnableConfig = None) -> dict:
+    """Node 1 (branch A): merchant ID extraction, timed for the branch report."""
+    start = time.perf_counter()
+    result = await extract_merchant(state, config)
+    return {**result, "timings": {"extract_metadata": elapsed_ms(start)}}
+
+
+async def extract_merchant(state: AgentState, config: RunnableConfig = None) -> dict:
     """
-    Node 1: Extract merchant_id from ticket text.
-    Uses multiple strategies: regex patterns, then LLM as fallback.
+    Extract merchant_id from ticket text.
+    Uses a single compiled regex pass first, then the local fuzzy resolver
+    (email, ID typos, log vocabulary), and only then the LLM as fallback.
     Skips extraction if merchant_id is already provided from ticket metadata.
     """
     # If merchant_id is already provided (from ticket metadata), skip extraction
@@ -52,36 +138,30 @@ def extract_metadata(state: AgentState) -> dict:
     steps = []
     merchant_id = None
     
-    # Strategy 1: Direct m_XXX or m_ecom_XXX pattern (most common)
-    pattern1 = r'm_(?:ecom_)?\d+'
-    matches = re.findall(pattern1, ticket_text, re.IGNORECASE)
-    if matches:
-        merchant_id = matches[0].lower()
-        steps.append(f"✓ Extracted Merchant ID: {merchant_id}")
+    # Strategies 1-3: one precompiled regex pass (m_XXX, "merchant ID: XXX",
+    # "id/account/customer: XXX"), candidates ranked against known merchants off the event loop
+    candidate = await asyncio.to_thread(extract_merchant_id, ticket_text)
+    if candidate and not candidate.plausible:
+        # "merchant: acme" names no known merchant and does not look like an ID: a hint, not a match
+        steps.append(f"⚠ Ignoring '{candidate.raw}': not a known merchant ID")
+        candidate = None
+    if candidate:
+        merchant_id = candidate.merchant_id
+        label = "ID" if candidate.strategy == "generic" else "Merchant ID"
+        steps.append(f"✓ Extracted {label}: {merchant_id}")
+        if not candidate.known:
+            steps.append(f"⚠ {merchant_id} is not a known merchant")
         return {"merchant_id": merchant_id, "steps_log": steps}
     
-    # Strategy 2: "merchant ID: XXX" or "merchant: XXX" pattern
-    pattern2 = r'merchant\s*(?:id)?[:\s]+([a-zA-Z0-9_-]+)'
-    matches = re.findall(pattern2, ticket_text, re.IGNORECASE)
-    if matches:
-        merchant_id = matches[0]
-        # Normalize to m_XXX format if it's just a number
-        if merchant_id.isdigit():
-            merchant_id = f"m_{merchant_id}"
-        steps.append(f"✓ Extracted Merchant ID: {merchant_id}")
-        return {"merchant_id": merchant_id, "steps_log": steps}
+    # Strategy 4: Resolve locally (CPU-bound scoring, off the event loop); only escalate to the LLM when not confident
+    local = await asyncio.to_thread(merchant_resolver.resolve, ticket_text, state.get("email"))
+    if local.merchant_id and local.confidence >= merchant_resolver.threshold:
+        merchant_resolver.record(escalated=False)
+        steps.append(f"✓ Resolved Merchant ID locally: {local.merchant_id} ({local.method}, {local.confidence * 100:.0f}% confidence)")
+        return {"merchant_id": local.merchant_id, "steps_log": steps}
+    merchant_resolver.record(escalated=True)
     
-    # Strategy 3: Look for any ID-like patterns (ID: XXX, id=XXX, etc.)
-    pattern3 = r'(?:id|account|customer)[:\s=]+([a-zA-Z0-9_-]+)'
-    matches = re.findall(pattern3, ticket_text, re.IGNORECASE)
-    if matches:
-        merchant_id = matches[0]
-        if merchant_id.isdigit():
-            merchant_id = f"m_{merchant_id}"
-        steps.append(f"✓ Extracted ID: {merchant_id}")
-        return {"merchant_id": merchant_id, "steps_log": steps}
-    
-    # Strategy 4: Use LLM to extract merchant ID
+    # Strategy 5: Use LLM to extract merchant ID
     steps.append("🔍 Using AI to extract merchant information...")
     try:
         extract_prompt = f"""Extract the merchant ID, customer ID, or account ID from this support ticket.
@@ -92,7 +172,8 @@ If you find an ID, respond with ONLY the ID (e.g., "m_123" or "123").
 If no ID is found, respond with "NONE".
 Do not include any other text."""
 
-        response = llm.invoke([HumanMessage(content=extract_prompt)])
+        async with llm_slot(config):
+            response = await llm.ainvoke([HumanMessage(content=extract_prompt)])
         content = response.content
         if isinstance(content, list):
             extracted = "".join(str(part) for part in content).strip()
@@ -121,91 +202,138 @@ Do not include any other text."""
     }
 
 
-def tool_check_logs(state: AgentState) -> dict:
+async def tool_check_logs(state: AgentState, config: RunnableConfig = None) -> dict:
     """
-    Node 2: Look up logs for the extracted merchant ID.
-    Queries the mock log database for relevant error entries.
+    Node 2 (branch A): Look up logs for the extracted merchant ID.
+    Depends on the merchant ID only, so batch runs share one lookup per merchant.
     """
+    start = time.perf_counter()
     merchant_id = state.get("merchant_id")
+    result = await shared(config, ("check_logs", merchant_id), lambda: check_merchant_logs(merchant_id))
+    return {**result, "timings": {"check_logs": elapsed_ms(start)}}
+
+
+def check_merchant_logs(merchant_id: Optional[str]) -> dict:
+    """
+    Queries the mock log database for relevant error entries, then classifies
+    the distinct log messages against the error signature catalog in one pass
+    (error types + doc search terms).
+    """
     steps = []
     logs_found = []
+    log_hwm = 0
+    error_types = []
+    error_messages = []
+    other_messages = []
     
     if merchant_id:
         steps.append(f"🔍 Searching logs for merchant {merchant_id}...")
-        logs_found = get_merchant_logs(merchant_id)
+        match = resolve_merchant_id(merchant_id)
+        if match.ambiguous:
+            steps.append(f"⚠ Merchant ID {merchant_id} is ambiguous, matches: {', '.join(match.candidates)}")
+        elif match.merchant_id and match.merchant_id != merchant_id:
+            steps.append(f"✓ Resolved merchant ID {merchant_id} → {match.merchant_id}")
+            merchant_id = match.merchant_id
+        # Read the high-water mark first: rows appended meanwhile make the result stale, never missed
+        log_hwm = get_merchant_log_high_water(merchant_id) if match.merchant_id else 0
+        logs_found = get_merchant_logs(merchant_id) if match.merchant_id else []
         
         if logs_found:
             steps.append(f"✓ Found {len(logs_found)} log entries")
-            # Identify error types in logs
-            error_types = []
-            for log in logs_found:
-                if "403" in log:
-                    error_types.append("403 Forbidden")
-                elif "500" in log:
-                    error_types.append("500 Server Error")
-                elif "429" in log:
-                    error_types.append("429 Rate Limited")
-                elif "SSL" in log.upper():
-                    error_types.append("SSL Certificate Issue")
-                elif "JSON" in log.upper():
-                    error_types.append("JSON Parsing Error")
-            
-            if error_types:
-                unique_errors = list(set(error_types))
-                steps.append(f"🚨 Detected errors: {', '.join(unique_errors)}")
+            error_messages = get_merchant_log_messages(merchant_id, levels=["ERROR", "WARN"])
+            other_messages = get_merchant_log_messages(merchant_id, levels=["INFO", "DEBUG"])
         else:
             steps.append(f"⚠ No logs found for merchant {merchant_id}")
     else:
         steps.append("⏭ Skipping log lookup (no merchant ID)")
     
+    # One signature pass over ERROR/WARN messages and the rest. Errors are
+    # detected at any level (as when every log line was checked), ERROR/WARN
+    # ones listed first; every hit feeds doc search. The ticket text is
+    # classified by the parallel search_ticket_docs branch.
+    error_hits, other_hits = scan_sections(["\n".join(error_messages), "\n".join(other_messages)])
+    for sig in [*error_hits, *other_hits]:
+        if sig.error_type and sig.error_type not in error_types:
+            error_types.append(sig.error_type)
+    if error_types:
+        steps.append(f"🚨 Detected errors: {', '.join(error_types)}")
+    
+    search_terms = []
+    for sig in [*error_hits, *other_hits]:
+        for term in sig.doc_terms:
+            if term not in search_terms:
+                search_terms.append(term)
+    
     return {
+        "merchant_id": merchant_id,
         "logs_found": logs_found,
+        "log_hwm": log_hwm,
+        "error_types": error_types,
+        "search_terms": search_terms,
         "steps_log": steps
     }
 
 
-def tool_search_docs(state: AgentState) -> dict:
+async def tool_search_ticket_docs(state: AgentState, config: RunnableConfig = None) -> dict:
     """
-    Node 3: Search documentation based on error patterns found.
-    Uses simple keyword matching to find relevant docs.
+    Node 1 (branch B): Ticket-text side of doc retrieval.
+    Needs neither the merchant ID nor the logs, so it runs in parallel with
+    extraction and log lookup: classifies the ticket against the signature
+    catalog and counts its query terms over the passage index.
     """
-    logs_found = state.get("logs_found", [])
+    start = time.perf_counter()
     ticket_text = state.get("ticket_text", "")
+    result = await shared(config, ("ticket_docs", ticket_text), lambda: ticket_doc_terms(ticket_text))
+    return {**result, "timings": {"search_ticket_docs": elapsed_ms(start)}, "steps_log": []}
+
+
+def ticket_doc_terms(ticket_text: str) -> dict:
+    """Signature doc terms and passage term counts of the ticket text."""
+    (ticket_hits,) = scan_sections([ticket_text])
+    ticket_terms = []
+    for sig in ticket_hits:
+        for term in sig.doc_terms:
+            if term not in ticket_terms:
+                ticket_terms.append(term)
+    return {"ticket_terms": ticket_terms, "ticket_counts": passage_term_counts(ticket_text)}
+
+
+async def tool_search_docs(state: AgentState, config: RunnableConfig = None) -> dict:
+    """
+    Node 3 (join): Search documentation based on error patterns found.
+    Adds the log lines and log-derived signature terms to the ticket's term
+    counts from branch B and scores every doc section with BM25, so only the
+    relevant passages of each article are kept.
+    """
+    logs_found = state.get("logs_found", [])
+    timings = state.get("timings") or {}
     steps = []
-    relevant_docs = []
     
-    # Build search queries from logs and ticket text
-    search_terms = []
-    combined_text = ticket_text + " ".join(logs_found)
-    
-    # Identify key issues to search for
-    if "403" in combined_text or "API Key" in combined_text.upper():
-        search_terms.append("API Key")
-    if "429" in combined_text or "rate limit" in combined_text.lower():
-        search_terms.append("Rate Limit")
-    if "500" in combined_text or "database" in combined_text.lower():
-        search_terms.append("Database")
-    if "SSL" in combined_text.upper() or "certificate" in combined_text.lower():
-        search_terms.append("SSL")
-    if "JSON" in combined_text.upper() or "invalid" in combined_text.lower():
-        search_terms.append("JSON")
-    if "migration" in combined_text.lower() or "v2" in combined_text.lower():
-        search_terms.append("Migration")
+    branch_logs = timings.get("extract_metadata", 0.0) + timings.get("check_logs", 0.0)
+    branch_docs = timings.get("search_ticket_docs", 0.0)
+    steps.append(f"⏱ Parallel branches: merchant + logs {branch_logs:.1f}ms ∥ ticket docs {branch_docs:.1f}ms")
+    
+    # Log-derived terms come from tool_check_logs, ticket terms from branch B
+    log_terms = list(state.get("search_terms") or [])
+    extra_terms = [term for term in state.get("ticket_terms") or [] if term not in log_terms]
+    search_terms = log_terms + extra_terms
     
     if not search_terms:
-        search_terms = ["API"]  # Default search
+        extra_terms = search_terms = ["API"]  # Default search
     
     steps.append(f"📚 Searching docs for: {', '.join(search_terms)}")
     
-    # Search docs for each term
-    for term in search_terms:
-        docs = search_docs(term)
-        for doc in docs:
-            if doc not in relevant_docs:
-                relevant_docs.append(doc)
+    # Rank every doc section against the ticket, logs and error terms, best matches
+    # first. The log side depends on the merchant only and is shared across a batch.
+    log_counts = await shared(
+        config,
+        ("log_doc_counts", state.get("merchant_id")),
+        lambda: passage_term_counts(" ".join([*logs_found, *log_terms])),
+    )
+    relevant_docs = await asyncio.to_thread(rank_doc_passages, log_counts, extra_terms, state.get("ticket_counts"))
     
     if relevant_docs:
-        steps.append(f"✓ Found {len(relevant_docs)} relevant documentation articles")
+        steps.append(f"✓ Found {len(relevant_docs)} relevant documentation passages")
     else:
         steps.append("⚠ No matching documentation found")
     
@@ -215,7 +343,111 @@ def tool_search_docs(state: AgentState) -> dict:
     }
 
 
-def generate_solution(state: AgentState) -> dict:
+def find_duplicate(ticket_text: str, merchant_id: Optional[str], logs_context: str):
+    """(reuse signature, earlier analysis of a near-duplicate ticket or None); the signature is None when reuse is off."""
+    (ticket_hits,) = scan_sections([ticket_text])
+    signature = log_signature(merchant_id, logs_context, [sig.error_type for sig in ticket_hits if sig.error_type])
+    if signature is None:
+        return None, None
+    return signature, duplicate_index.find(ticket_text, signature)
+
+
+def rank_doc_passages(log_counts, extra_terms: list[str], ticket_counts) -> list[str]:
+    """Best doc passages for the log-side counts plus the extra terms and the ticket's own counts."""
+    counts = log_counts + passage_term_counts(" ".join(extra_terms))
+    if ticket_counts is not None:
+        counts += ticket_counts
+    return [passage for passage, _score in rank_passages_by_counts(counts, top_k=MAX_DOC_PASSAGES)]
+
+
+def build_logs_context(merchant_id: str) -> list[str]:
+    """
+    Collapsed log lines for the prompt, capped at MAX_LOG_TEMPLATES.
+    When capping, the most severe and most recent templates are kept.
+    """
+    templates = get_merchant_log_templates(merchant_id)
+    omitted = len(templates) - MAX_LOG_TEMPLATES
+    if omitted > 0:
+        keep = {id(t) for t in sorted(templates, key=lambda t: (t.level, t.last_ts), reverse=True)[:MAX_LOG_TEMPLATES]}
+        templates = [t for t in templates if id(t) in keep]
+    lines = log_store.format_templates(templates)
+    if omitted > 0:
+        lines.append(f"... ({omitted} lower-priority log templates omitted)")
+    return lines
+
+
+# Escapes a JSON string may contain, decoded while streaming
+JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonFieldStream:
+    """
+    Incrementally decodes one string field of a JSON object that arrives in
+    chunks, so the field's text can be streamed before the object is complete.
+    """
+
+    def __init__(self, field: str):
+        self.opening = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self.buffer = ""
+        self.position = None  # Index of the next undecoded character of the value
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk; return the newly decoded part of the field value."""
+        self.buffer += chunk
+        if self.done:
+            return ""
+        if self.position is None:
+            match = self.opening.search(self.buffer)
+            if not match:
+                return ""
+            self.position = match.end()
+
+        out = []
+        i, text = self.position, self.buffer
+        while i < len(text):
+            ch = text[i]
+            if ch == '"':
+                self.done = True
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(text):
+                break  # Escape split across chunks
+            code = text[i + 1]
+            if code == "u":
+                if i + 6 > len(text):
+                    break
+                point = int(text[i + 2:i + 6], 16)
+                if 0xD800 <= point < 0xDC00:
+                    # High surrogate: decoded together with the low surrogate escape after it
+                    if i + 12 > len(text):
+                        break
+                    low = int(text[i + 8:i + 12], 16) if text[i + 6:i + 8] == "\\u" else 0
+                    if 0xDC00 <= low < 0xE000:
+                        point = 0x10000 + ((point - 0xD800) << 10) + (low - 0xDC00)
+                        i += 6
+                out.append(chr(point))
+                i += 6
+            else:
+                out.append(JSON_ESCAPES.get(code, code))
+                i += 2
+        self.position = i
+        return "".join(out)
+
+
+def chunk_text(content) -> str:
+    """Text of a streamed message chunk (a string or a list of content blocks)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return ""
+
+
+async def generate_solution(state: AgentState, config: RunnableConfig = None) -> dict:
     """
     Node 4: Use Gemini LLM to synthesize findings into a diagnosis and recommended action.
     Combines log analysis and doc search results with AI-powered reasoning.
@@ -225,12 +457,16 @@ def generate_solution(state: AgentState) -> dict:
     merchant_id = state.get("merchant_id")
     ticket_text = state.get("ticket_text", "")
     steps = []
+    llm_error = None  # Set below when the diagnosis is a fallback
     
-    steps.append("🧠 Sending context to Gemini for analysis...")
-    
-    # Build context for the LLM
-    logs_context = "\n".join(logs_found) if logs_found else "No logs found for this merchant."
-    docs_context = "\n\n---\n\n".join(relevant_docs[:3]) if relevant_docs else "No relevant documentation found."
+    # Build context for the LLM. Logs are collapsed into templates so repeated
+    # lines cost one prompt line each, however many times they occurred.
+    logs_context = (
+        "\n".join(await shared(config, ("logs_context", merchant_id), lambda: build_logs_context(merchant_id)))
+        if logs_found else "No logs found for this merchant."
+    )
+    # relevant_docs holds section-level passages ranked by BM25 score, best first
+    docs_context = "\n\n---\n\n".join(relevant_docs[:MAX_DOC_PASSAGES]) if relevant_docs else "No relevant documentation found."
     
     # System prompt for the support agent
     system_prompt = """You are an expert technical support agent for an e-commerce platform that helps merchants migrate from fully-hosted solutions (Shopify, BigCommerce, Magento) to headless architecture.
@@ -279,6 +515,32 @@ You must respond in the following JSON format:
 Based on the above information, diagnose the issue and draft a helpful customer response.
 Remember to respond ONLY with valid JSON in the specified format."""
 
+    # Identical prompts (re-analysis, many merchants hitting one outage) reuse the earlier answer
+    prompt_key = cache_key(getattr(llm, "model", ""), system_prompt, ticket_text, merchant_id or "", logs_context, docs_context)
+    cached, tier = await asyncio.to_thread(response_cache.get, prompt_key)
+    if cached is not None:
+        steps.append(f"⚡ Reused cached Gemini analysis ({tier} cache)")
+        steps.append(f"✓ Generated diagnosis with {int(cached['confidence_score'] * 100)}% confidence")
+        steps.append("✅ Analysis complete")
+        return {**cached, "llm_error": None, "steps_log": steps}
+    
+    # Near-duplicate of an analyzed ticket (same merchant, logs and detected
+    # errors): reuse its answer, with confidence scaled down by how different
+    # the wording is (MinHash of the ticket wording: CPU-bound, so off the event loop)
+    logs_signature, duplicate = await asyncio.to_thread(find_duplicate, ticket_text, merchant_id, logs_context)
+    if duplicate is not None:
+        confidence_score = duplicate.result["confidence_score"] * (0.5 + 0.5 * duplicate.similarity)
+        preview = " ".join(duplicate.ticket_text.split())[:60]
+        steps.append(f"♻ Reused from similar ticket ({duplicate.similarity * 100:.0f}% similar): \"{preview}...\"")
+        steps.append(f"✓ Generated diagnosis with {int(confidence_score * 100)}% confidence")
+        steps.append("✅ Analysis complete")
+        return {**duplicate.result, "confidence_score": confidence_score, "llm_error": None, "steps_log": steps}
+    
+    steps.append("🧠 Sending context to Gemini for analysis...")
+    # Streamed right away: this node's steps otherwise only arrive once it finishes
+    writer = get_stream_writer()
+    writer({"step": steps[-1]})
+    
     try:
         # Call Gemini with retry logic for rate limits
         messages = [
@@ -286,18 +548,31 @@ Remember to respond ONLY with valid JSON in the specified format."""
             HumanMessage(content=user_prompt)
         ]
         
+        # Stream the answer; recommended_action text goes to stream_analysis
+        # listeners as it arrives (the writer is a no-op under a plain ainvoke)
         # Retry logic with exponential backoff
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = llm.invoke(messages)
+                response = None
+                action_stream = JsonFieldStream("recommended_action")
+                async with llm_slot(config):
+                    async for chunk in llm.astream(messages):
+                        response = chunk if response is None else response + chunk
+                        text = action_stream.feed(chunk_text(chunk.content))
+                        if text:
+                            writer({"token": text})
+                if response is None:
+                    raise ValueError("Empty response from LLM")
                 break
             except Exception as retry_error:
+                if action_stream.position is not None:
+                    writer({"reset": True})
                 if "429" in str(retry_error) or "RESOURCE_EXHAUSTED" in str(retry_error):
                     if attempt < max_retries - 1:
                         wait_time = (2 ** attempt) * 5  # 5s, 10s, 20s
                         steps.append(f"⏳ Rate limited, waiting {wait_time}s before retry...")
-                        time.sleep(wait_time)
+                        await asyncio.sleep(wait_time)
                     else:
                         raise retry_error
                 else:
@@ -369,6 +644,16 @@ Remember to respond ONLY with valid JSON in the specified format."""
         # Clamp confidence score
         confidence_score = max(0.0, min(1.0, confidence_score))
         
+        # Only well-formed answers are cached; fallbacks should be retried next time
+        result = {
+            "diagnosis": diagnosis,
+            "confidence_score": confidence_score,
+            "recommended_action": recommended_action,
+        }
+        await asyncio.to_thread(response_cache.put, prompt_key, result)
+        if logs_signature is not None:
+            await asyncio.to_thread(duplicate_index.add, ticket_text, logs_signature, result)
+        
         steps.append(f"✓ Gemini analysis complete")
         steps.append(f"✓ Generated diagnosis with {int(confidence_score * 100)}% confidence")
         steps.append("✅ Analysis complete")
@@ -389,6 +674,7 @@ Remember to respond ONLY with valid JSON in the specified format."""
         else:
             diagnosis = "**Analysis Error**: The AI response was empty or invalid."
             confidence_score = 0.3
+            llm_error = f"Empty or invalid LLM response: {e}"
             recommended_action = "Please contact support for assistance with this issue."
         
     except Exception as e:
@@ -398,6 +684,7 @@ Remember to respond ONLY with valid JSON in the specified format."""
         # Fallback response
         diagnosis = f"**Analysis Error**: Unable to complete AI analysis. Error: {str(e)}"
         confidence_score = 0.3
+        llm_error = str(e)
         recommended_action = (
             "Hi,\n\n"
             "Thank you for reaching out. I'm currently reviewing your case and will get back to you shortly.\n\n"
@@ -412,76 +699,318 @@ Remember to respond ONLY with valid JSON in the specified format."""
         "diagnosis": diagnosis,
         "confidence_score": confidence_score,
         "recommended_action": recommended_action,
+        "llm_error": llm_error,
         "steps_log": steps
     }
 
 
-def build_agent_graph() -> StateGraph:
-    """Build and compile the LangGraph agent workflow."""
+# Graph topology: each node and the nodes it waits for (START = the input state).
+# Two parallel branches are joined before doc ranking:
+#   A: extract_metadata -> check_logs   (merchant ID, maybe via the LLM, then logs)
+#   B: search_ticket_docs               (ticket-only signatures + term counts)
+AGENT_NODES = {
+    "extract_metadata": (extract_metadata, [START]),
+    "check_logs": (tool_check_logs, ["extract_metadata"]),
+    "search_ticket_docs": (tool_search_ticket_docs, [START]),
+    "search_docs": (tool_search_docs, ["check_logs", "search_ticket_docs"]),
+    "generate_solution": (generate_solution, ["search_docs"]),
+}
+
+
+def downstream_of(nodes) -> set[str]:
+    """The given nodes plus every node that (transitively) waits for one of them."""
+    result = set(nodes)
+    for node, (_, upstream) in AGENT_NODES.items():  # Topological order
+        if any(parent in result for parent in upstream):
+            result.add(node)
+    return result
+
+
+def build_agent_graph(nodes=tuple(AGENT_NODES)) -> StateGraph:
+    """
+    Build and compile the LangGraph agent workflow, or the sub-graph of just
+    `nodes` for a partial re-run: left-out nodes keep their outputs from the
+    starting state and their dependents wait on whatever is upstream of them.
+    Every node is a coroutine; the CPU-bound log/doc lookups run in worker
+    threads (see shared()), so the event loop never blocks on them.
+    """
+    included = [node for node in AGENT_NODES if node in nodes]
+    
+    def upstream(node: str) -> list[str]:
+        parents = []
+        for parent in AGENT_NODES[node][1]:
+            for p in ([parent] if parent == START or parent in included else upstream(parent)):
+                if p not in parents:
+                    parents.append(p)
+        # START precedes everything; only wait on it when there is nothing else
+        return [p for p in parents if p != START] or [START]
     
     # Create the graph
     graph = StateGraph[AgentState, None, AgentState, AgentState](AgentState)
+    for node in included:
+        graph.add_node(node, AGENT_NODES[node][0])
     
-    # Add nodes
-    graph.add_node("extract_metadata", extract_metadata)
-    graph.add_node("check_logs", tool_check_logs)
-    graph.add_node("search_docs", tool_search_docs)
-    graph.add_node("generate_solution", generate_solution)
-    
-    # Define edges (sequential flow)
-    graph.add_edge(START, "extract_metadata")
-    graph.add_edge("extract_metadata", "check_logs")
-    graph.add_edge("check_logs", "search_docs")
-    graph.add_edge("search_docs", "generate_solution")
-    graph.add_edge("generate_solution", END)
+    # Define edges, with a join wherever a node waits on more than one branch
+    waits = {node: upstream(node) for node in included}
+    for node, parents in waits.items():
+        graph.add_edge(parents if len(parents) > 1 else parents[0], node)
+    for node in included:
+        if not any(node in parents for parents in waits.values()):
+            graph.add_edge(node, END)
     
     # Compile the graph
     return graph.compile()
 
 
-# Create the compiled agent
-agent = build_agent_graph()
+# Compiled graphs by node set, built on first use
+compiled_graphs: dict[frozenset, Any] = {}
 
 
-def analyze_ticket(ticket_text: str, merchant_id: str = None) -> dict:
-    """
-    Main entry point to analyze a support ticket.
-    Returns the final state with diagnosis and recommendations.
-    
-    Args:
-        ticket_text: The ticket content/description
-        merchant_id: Optional merchant ID from ticket metadata (if provided, skips extraction)
-    """
+def graph_for(nodes) -> Any:
+    """Compiled (sub-)graph running exactly `nodes`."""
+    key = frozenset(nodes)
+    if key not in compiled_graphs:
+        compiled_graphs[key] = build_agent_graph(key)
+    return compiled_graphs[key]
+
+
+# Create the compiled agent, plus the retrieval-only graph used by speculative
+# pre-analysis (everything but the diagnosis)
+agent = graph_for(AGENT_NODES)
+retrieval_agent = graph_for(set(AGENT_NODES) - {"generate_solution"})
+
+
+def build_initial_state(ticket_text: str, merchant_id: str = None, email: str = None) -> AgentState:
+    """Initial graph state for a ticket, with the opening steps already logged."""
     steps = ["🚀 Starting ticket analysis..."]
     
     # If merchant_id is provided from metadata, use it directly
     if merchant_id:
         steps.append(f"✓ Using Merchant ID from ticket metadata: {merchant_id}")
     
-    # Initialize state
-    initial_state: AgentState = {
+    return {
         "ticket_text": ticket_text,
         "merchant_id": merchant_id,  # Can be None or provided value
+        "email": email,
         "logs_found": [],
+        "log_hwm": 0,
         "relevant_docs": [],
+        "error_types": [],
+        "search_terms": [],
+        "ticket_terms": [],
+        "ticket_counts": None,
+        "timings": {},
         "diagnosis": "",
         "confidence_score": 0.0,
         "recommended_action": "",
+        "llm_error": None,
         "steps_log": steps
     }
-    
-    # Run the agent
-    final_state = agent.invoke(initial_state)
-    
-    # Debug logging
+
+
+def print_analysis(final_state: dict):
+    """Debug logging of a finished analysis."""
     print("=" * 50)
     print("AGENT ANALYSIS RESULTS:")
-    print(f"  Ticket preview: {ticket_text[:100]}...")
+    print(f"  Ticket preview: {final_state.get('ticket_text', '')[:100]}...")
     print(f"  Merchant ID: {final_state.get('merchant_id', 'NOT FOUND')}")
     print(f"  Logs found: {len(final_state.get('logs_found', []))} entries")
     print(f"  Docs found: {len(final_state.get('relevant_docs', []))} articles")
     print(f"  Confidence: {final_state.get('confidence_score', 0) * 100:.0f}%")
     print(f"  Steps: {final_state.get('steps_log', [])}")
     print("=" * 50)
+
+
+def ticket_hash(ticket_text: str, merchant_id: str = None) -> str:
+    """
+    Hash of the ticket inputs a stored analysis was computed from. The email is
+    left out: it only feeds merchant resolution, and ticket text carries it.
+    """
+    return cache_key(ticket_text, merchant_id or "")
+
+
+def plan_analysis(ticket_text: str, merchant_id: str = None, email: str = None, ticket_id: str = None):
+    """
+    Pick the graph and starting state for an analysis, as (graph, state, outcome).
     
+    Without a stored analysis of this ticket (or if the ticket changed) the
+    full graph runs. Otherwise only the nodes downstream of inputs that changed
+    since it was stored re-run on the stored state: new merchant logs re-run
+    check_logs onwards, a new doc corpus search_ticket_docs onwards, and a
+    retrieval-only entry just the diagnosis. If nothing changed, graph is None
+    and the stored state is the result.
+    """
+    stored = analysis_store.get(ticket_id)
+    if stored is None or stored["ticket_hash"] != ticket_hash(ticket_text, merchant_id):
+        return agent, build_initial_state(ticket_text, merchant_id, email), "full"
+    
+    stale, reasons = [], []
+    if get_merchant_log_high_water(stored["merchant_id"]) != stored["log_hwm"]:
+        stale.append("check_logs")
+        reasons.append("new merchant logs")
+    if stored["docs_version"] != docs_version:
+        stale.append("search_ticket_docs")
+        reasons.append("docs updated")
+    if not stored["complete"]:
+        stale.append("generate_solution")
+        reasons.append("no diagnosis yet")
+    
+    state = dict(stored["state"])
+    if not stale:
+        state["steps_log"] = [*state["steps_log"], "⚡ Served stored analysis (ticket, logs and docs unchanged)"]
+        return None, state, "served"
+    
+    rerun = downstream_of(stale)
+    names = ", ".join(node for node in AGENT_NODES if node in rerun)
+    if rerun == {"generate_solution"}:
+        # Retrieval is current: keep its steps, the diagnosis adds its own
+        state["steps_log"] = [*state["steps_log"], "⚡ Merchant, logs and docs pre-computed when the ticket was created"]
+    else:
+        state["steps_log"] = [
+            "🚀 Starting ticket analysis...",
+            f"♻ Reusing stored analysis, re-running {names} ({', '.join(reasons)})",
+        ]
+    return graph_for(rerun), state, "partial"
+
+
+def store_analysis(ticket_id: Optional[str], ticket_text: str, merchant_id: Optional[str], final_state: dict,
+                   complete: bool = True):
+    """
+    Keep a finished analysis for the ticket, stamped with the inputs it was computed from.
+    A failed diagnosis (llm_error set) is kept as retrieval only, so the next run retries Gemini.
+    """
+    if not ticket_id:
+        return
+    complete = complete and not final_state.get("llm_error")
+    analysis_store.put(
+        ticket_id,
+        ticket_hash(ticket_text, merchant_id),
+        final_state.get("merchant_id"),
+        final_state.get("log_hwm", 0),
+        docs_version,
+        complete,
+        final_state,
+    )
+
+
+def stored_analysis(ticket_id: str, ticket_text: str, merchant_id: str = None, email: str = None) -> Optional[dict]:
+    """The ticket's stored analysis if it is complete and still current, else None."""
+    graph, state, outcome = plan_analysis(ticket_text, merchant_id, email, ticket_id)
+    if graph is not None:
+        return None
+    analysis_store.record(outcome)
+    return state
+
+
+async def analyze_ticket(ticket_text: str, merchant_id: str = None, email: str = None, ticket_id: str = None) -> dict:
+    """
+    Main entry point to analyze a support ticket.
+    Returns the final state with diagnosis and recommendations.
+    
+    Args:
+        ticket_text: The ticket content/description
+        merchant_id: Optional merchant ID from ticket metadata (if provided, skips extraction)
+        email: Optional submitter email, used to resolve the merchant without the LLM
+        ticket_id: Optional ticket ID; reuses and updates the ticket's stored analysis
+    """
+    graph, state, outcome = await asyncio.to_thread(plan_analysis, ticket_text, merchant_id, email, ticket_id)
+    if graph is None:
+        final_state = state
+    else:
+        final_state = await graph.ainvoke(state)
+        await asyncio.to_thread(store_analysis, ticket_id, ticket_text, merchant_id, final_state)
+    if ticket_id:
+        analysis_store.record(outcome)
+    print_analysis(final_state)
     return final_state
+
+
+async def precompute_analysis(ticket_text: str, merchant_id: str = None, email: str = None, ticket_id: str = None,
+                              full: bool = False, config: RunnableConfig = None) -> dict:
+    """
+    Speculative run for a new ticket: retrieval only, or the full analysis when
+    full=True. Stored for the ticket, unless someone analyzed it meanwhile.
+    """
+    graph = agent if full else retrieval_agent
+    final_state = await graph.ainvoke(build_initial_state(ticket_text, merchant_id, email), config=config)
+    existing = await asyncio.to_thread(analysis_store.get, ticket_id)
+    if existing is None or not existing["complete"]:
+        await asyncio.to_thread(store_analysis, ticket_id, ticket_text, merchant_id, final_state, full)
+    return final_state
+
+
+async def stream_analysis(ticket_text: str, merchant_id: str = None, email: str = None, ticket_id: str = None):
+    """
+    Streaming variant of analyze_ticket, as an async generator of (event, payload):
+        ("step", str)    each steps_log entry, as soon as its node finishes
+        ("token", str)   recommended_action text as Gemini produces it
+        ("reset", "")    a retry restarted the LLM answer; drop streamed tokens
+        ("result", dict) the final state, last
+    """
+    graph, initial_state, outcome = await asyncio.to_thread(plan_analysis, ticket_text, merchant_id, email, ticket_id)
+    if ticket_id:
+        analysis_store.record(outcome)
+    for step in initial_state["steps_log"]:
+        yield "step", step
+    
+    final_state = initial_state
+    if graph is None:
+        print_analysis(final_state)
+        yield "result", final_state
+        return
+    
+    early_steps = []  # Steps a node streamed before finishing; skipped in its update
+    async for mode, chunk in graph.astream(initial_state, stream_mode=["updates", "custom", "values"]):
+        if mode == "updates":
+            for update in chunk.values():
+                for step in (update or {}).get("steps_log", []):
+                    if early_steps and early_steps[0] == step:
+                        early_steps.pop(0)
+                        continue
+                    yield "step", step
+        elif mode == "custom":
+            if chunk.get("step"):
+                early_steps.append(chunk["step"])
+                yield "step", chunk["step"]
+            elif chunk.get("reset"):
+                yield "reset", ""
+            elif chunk.get("token"):
+                yield "token", chunk["token"]
+        else:
+            final_state = chunk
+    
+    await asyncio.to_thread(store_analysis, ticket_id, ticket_text, merchant_id, final_state)
+    print_analysis(final_state)
+    yield "result", final_state
+
+
+async def analyze_batch(tickets: list[dict], concurrency: int):
+    """
+    Analyze many tickets at once, as an async generator of (index, final_state
+    or exception, duration_ms) in completion order; duration_ms is that
+    ticket's own run time.
+
+    All graphs run concurrently; Gemini calls are capped at `concurrency` by a
+    shared semaphore, and merchant log lookups / doc retrieval pieces are
+    computed once per batch via SharedWork. Yields ("summary", stats, None) last.
+    """
+    work = SharedWork()
+    config = {"configurable": {"llm_semaphore": asyncio.Semaphore(concurrency), "shared_work": work}}
+    
+    async def run(index: int, ticket: dict):
+        start_time = time.time()
+        try:
+            state = build_initial_state(ticket["ticket_text"], ticket.get("merchant_id"), ticket.get("email"))
+            outcome = await agent.ainvoke(state, config=config)
+        except Exception as e:
+            outcome = e
+        return index, outcome, (time.time() - start_time) * 1000
+    
+    tasks = [asyncio.create_task(run(i, ticket)) for i, ticket in enumerate(tickets)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+    yield "summary", work.get_stats(), None
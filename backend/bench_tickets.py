@@ -0,0 +1,110 @@
+# Benchmark for the SQLite ticket store
+# Bursts of concurrent ticket creates with group commit vs one commit per
+# ticket, then a restart: time to the first page with the lazy warm-load.
+# Then a bulk import (add_many) and a full export of the imported tickets.
+# Runs locally against a temp file; Supabase is not needed.
+#
+# Usage (from backend/):  python bench_tickets.py [--tickets 20000] [--threads 32] [--bulk 500000]
+
+import os
+import time
+import uuid
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from pydantic import BaseModel
+from ticket_db import SQLiteTicketBackend
+from ticket_store import TicketStore
+
+
+class Ticket(BaseModel):
+    """Same shape as main.Ticket (importing main would start the whole app)."""
+    id: str
+    title: str
+    description: str
+    email: str
+    merchant_id: str
+    status: str
+    created_at: str
+
+
+def make_ticket(i: int) -> Ticket:
+    return Ticket(
+        id=str(uuid.uuid4()),
+        title=f"Checkout webhook failing #{i}",
+        description="Stripe webhooks return 500 since the move to the headless storefront. " * 3,
+        email=f"user{i % 500}@example.com",
+        merchant_id=f"m_ecom_{i % 40:03d}",
+        status="open",
+        created_at=datetime.now().isoformat(),
+    )
+
+
+def burst(store: TicketStore, count: int, threads: int) -> float:
+    """Create `count` tickets from `threads` concurrent writers. Returns seconds."""
+    per_thread = count // threads
+
+    def writer(offset: int):
+        for i in range(offset, offset + per_thread):
+            store.add(make_ticket(i))
+
+    workers = [threading.Thread(target=writer, args=(t * per_thread,)) for t in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--bulk", type=int, default=500000)
+    parser.add_argument("--batch", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, max_batch in (("per-ticket", 1), ("group", 1000)):
+            path = os.path.join(directory, f"{name}.sqlite3")
+            store = TicketStore(SQLiteTicketBackend(path, max_batch=max_batch), model=Ticket)
+            seconds = burst(store, args.tickets, args.threads)
+            stats = store.backend.get_stats()
+            print(f"{name:<11} {args.tickets / seconds:9.0f} tickets/s  "
+                  f"{stats['commits']:6d} commits, {stats['rows_per_commit']} rows/commit")
+            store.close()
+
+        # Restart on the group-commit file
+        path = os.path.join(directory, "group.sqlite3")
+        start = time.perf_counter()
+        store = TicketStore(SQLiteTicketBackend(path), model=Ticket)
+        page, _ = store.page(limit=100, descending=True)
+        first_page = time.perf_counter() - start
+        filtered, _ = store.page(limit=100, merchant_id="m_ecom_007", status="open")
+        stats = store.get_stats()
+        print(f"restart     first page in {first_page * 1000:.1f} ms, "
+              f"{stats['bodies_in_memory']}/{stats['tickets']} bodies read after a filtered page too")
+        start = time.perf_counter()
+        store.all()
+        print(f"full load   {(time.perf_counter() - start) * 1000:.1f} ms for every body")
+        store.close()
+
+        # Bulk import, as POST /tickets/import does it: batches, bodies left on disk
+        store = TicketStore(SQLiteTicketBackend(os.path.join(directory, "bulk.sqlite3")), model=Ticket)
+        start = time.perf_counter()
+        for offset in range(0, args.bulk, args.batch):
+            store.add_many([make_ticket(i) for i in range(offset, min(offset + args.batch, args.bulk))],
+                           keep_bodies=False)
+        seconds = time.perf_counter() - start
+        print(f"bulk import {args.bulk / seconds:9.0f} tickets/s  ({seconds:.1f} s for {args.bulk})")
+        start = time.perf_counter()
+        exported = sum(len(rows) for rows in store.export())
+        print(f"export      {exported / (time.perf_counter() - start):9.0f} tickets/s  "
+              f"{store.get_stats()['bodies_in_memory']} bodies left in memory")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# Inverted index for the documentation knowledge base
+# Tokenizes every article once at load time. Substring search and BM25
+# ranking of free text both walk only the postings of the query's terms
+# (BM25 weights are precomputed per posting in a CSR term-document matrix).
+# Docs can also be chunked into section-level passages and indexed the same way.
+
+import re
+import textwrap
+from collections import defaultdict
+
+import numpy as np
+
+# Lowercase alphanumeric runs; "API Key" -> ["api", "key"]
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Filler words dropped from free-text BM25 queries (ticket + log text)
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "for",
+    "from", "has", "have", "i", "if", "in", "is", "it", "my", "no", "not", "of",
+    "on", "or", "our", "so", "that", "the", "this", "to", "was", "we", "with", "you",
+})
+
+# Section headers: "## Title" lines and lines that open with a **Bold** label
+HEADER_PATTERN = re.compile(r"^(#{2,}\s+.+|\*\*[^*]+\*\*:?.*)$")
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase alphanumeric tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def chunk_document(text: str) -> list[str]:
+    """
+    Split a markdown article into section-level passages.
+
+    A new passage starts at every "##" header or "**Bold**" header line
+    (outside code fences). Each passage is prefixed with the article title
+    so it still makes sense on its own in a prompt.
+    """
+    # Articles are indented string literals: dedent everything after the first line
+    first_line, _, rest = text.strip().partition("\n")
+    lines = [first_line, *textwrap.dedent(rest).splitlines()]
+
+    title = None
+    sections: list[list[str]] = [[]]
+    in_code = False
+
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            in_code = not in_code
+        if not in_code and HEADER_PATTERN.match(stripped):
+            if stripped.startswith("#") and title is None:
+                title = stripped
+                continue
+            sections.append([])
+        sections[-1].append(line.rstrip())
+
+    passages = []
+    for lines in sections:
+        body = "\n".join(lines).strip()
+        if not body:
+            continue
+        passages.append(f"{title}\n{body}" if title else body)
+    return passages
+
+
+class DocIndex:
+    """
+    Inverted index over a list of documents.
+
+    Postings map each term to a list of (doc_id, term_frequency) pairs,
+    so query cost grows with the number of matching postings rather than
+    with corpus size.
+    """
+
+    def __init__(self, documents: list[str]):
+        self.documents = documents
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.doc_lengths: list[int] = []
+        self.lowered = [text.lower() for text in documents]
+
+        for doc_id, text in enumerate(documents):
+            tokens = tokenize(text)
+            self.doc_lengths.append(len(tokens))
+            counts: dict[str, int] = defaultdict(int)
+            for token in tokens:
+                counts[token] += 1
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((doc_id, tf))
+
+        self._build_bm25_matrix()
+
+    def _build_bm25_matrix(self):
+        """
+        Build the sparse BM25 term-document matrix in CSR form (rows = terms):
+        term_starts[t]:term_starts[t + 1] is the slice of bm25_docs and
+        bm25_weights holding term t's postings. Each stored value is the full
+        BM25 weight of a term in a doc, so scoring a query only gathers the
+        slices of its own terms.
+        """
+        self.vocab = {term: term_id for term_id, term in enumerate(self.postings)}
+        n_docs = len(self.documents)
+        lengths = np.asarray(self.doc_lengths, dtype=np.float64)
+        avg_length = lengths.mean() if n_docs else 1.0
+
+        nnz = sum(len(plist) for plist in self.postings.values())
+        starts = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        doc_ids = np.empty(nnz, dtype=np.int32)
+        tfs = np.empty(nnz, dtype=np.float64)
+
+        pos = 0
+        for term_id, plist in enumerate(self.postings.values()):
+            end = pos + len(plist)
+            doc_ids[pos:end] = [doc_id for doc_id, _ in plist]
+            tfs[pos:end] = [tf for _, tf in plist]
+            starts[term_id + 1] = end
+            pos = end
+
+        dfs = np.diff(starts).astype(np.float64)
+        idf = np.log(1 + (n_docs - dfs + 0.5) / (dfs + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_ids] / avg_length)
+
+        self.term_starts = starts
+        self.bm25_docs = doc_ids
+        self.bm25_weights = np.repeat(idf, np.diff(starts)) * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+    def term_counts(self, text: str) -> np.ndarray:
+        """Raw query term counts over the index vocabulary. Counts of several texts can be summed."""
+        term_ids = [self.vocab[t] for t in tokenize(text) if t in self.vocab and t not in STOPWORDS]
+        return np.bincount(term_ids, minlength=len(self.vocab)).astype(np.float64)
+
+    @staticmethod
+    def weight_counts(counts: np.ndarray) -> np.ndarray:
+        # Dampen repeated query terms so long log dumps don't swamp the ticket text
+        vector = np.zeros(len(counts), dtype=np.float64)
+        np.log1p(counts, out=vector, where=counts > 0)
+        return vector
+
+    def rank_counts(self, counts: np.ndarray, top_k: int = 5) -> list[tuple[int, float]]:
+        """
+        BM25-score the docs against precomputed term_counts() (e.g. ticket and
+        log counts summed), walking only the postings of the query's terms.
+
+        Returns:
+            List of (doc_id, score) pairs with a positive score, best first
+        """
+        terms = np.flatnonzero(counts)
+        if not len(terms) or top_k <= 0:
+            return []
+        query = self.weight_counts(counts[terms])
+        lengths = self.term_starts[terms + 1] - self.term_starts[terms]
+        # Positions of every posting of the query terms, and each one's query weight
+        offsets = np.repeat(self.term_starts[terms] - np.cumsum(lengths) + lengths, lengths)
+        positions = offsets + np.arange(lengths.sum())
+        doc_ids, slots = np.unique(self.bm25_docs[positions], return_inverse=True)
+        scores = np.bincount(slots, weights=self.bm25_weights[positions] * np.repeat(query, lengths))
+
+        # Only matched docs are sorted; ties go to the lower doc id
+        top = np.lexsort((doc_ids, -scores))[:top_k]
+        return [(int(doc_ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def find_substring(self, query: str) -> list[int]:
+        """
+        Ids of the docs containing the query as a case-insensitive substring, in order.
+
+        The postings narrow the candidates first: a token strictly inside the
+        query must be a whole token of a matching doc, and one at an edge part
+        of a token. Only candidates get the substring check.
+        """
+        query = query.lower()
+        tokens = list(TOKEN_PATTERN.finditer(query))
+        if not tokens:
+            return [doc_id for doc_id, text in enumerate(self.lowered) if query in text]
+
+        candidates = None
+        for match in tokens:
+            token = match.group()
+            inner = match.start() > 0 and match.end() < len(query)
+            terms = [token] if inner else [term for term in self.postings if token in term]
+            docs = {doc_id for term in terms for doc_id, _ in self.postings.get(term, ())}
+            candidates = docs if candidates is None else candidates & docs
+            if not candidates:
+                return []
+        return [doc_id for doc_id in sorted(candidates) if query in self.lowered[doc_id]]
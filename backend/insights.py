@@ -0,0 +1,134 @@
+# Ticket analysis store
+# Latest agent state per ticket, stamped with the inputs that produced it:
+# a hash of the ticket, the merchant's log high-water mark and the doc corpus
+# version. A stored analysis stays valid until one of those changes, and then
+# only the graph nodes downstream of the changed input have to run again.
+# Kept in a SQLite file (memory-only with path=None) behind a small LRU.
+
+import os
+import time
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Decoded entries kept in memory; the rest are read back from SQLite
+DEFAULT_MEMORY_ENTRIES = 512
+
+# Outcomes counted by record()
+OUTCOMES = ("served", "partial", "full")
+
+
+class AnalysisStore:
+    """
+    Stored analyses by ticket id.
+
+    An entry is a dict with ticket_hash, merchant_id, log_hwm, docs_version,
+    complete (diagnosis included, or retrieval only), state and computed_at.
+    States hold NumPy vectors (ticket term counts), so they are pickled; the
+    file only ever holds states this process wrote.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_memory_entries: int = DEFAULT_MEMORY_ENTRIES):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.memory: OrderedDict[str, dict] = OrderedDict()
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(OUTCOMES, 0)
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " ticket_id TEXT PRIMARY KEY,"
+            " ticket_hash TEXT NOT NULL,"
+            " merchant_id TEXT,"
+            " log_hwm INTEGER NOT NULL,"
+            " docs_version TEXT NOT NULL,"
+            " complete INTEGER NOT NULL,"
+            " state BLOB NOT NULL,"
+            " computed_at REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def _remember(self, ticket_id: str, entry: dict):
+        self.memory[ticket_id] = entry
+        self.memory.move_to_end(ticket_id)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, ticket_id: Optional[str]) -> Optional[dict]:
+        if not ticket_id:
+            return None
+        with self.lock:
+            entry = self.memory.get(ticket_id)
+            if entry is not None:
+                self.memory.move_to_end(ticket_id)
+                return entry
+            row = self.db.execute(
+                "SELECT ticket_hash, merchant_id, log_hwm, docs_version, complete, state, computed_at"
+                " FROM analyses WHERE ticket_id = ?",
+                (ticket_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            entry = {
+                "ticket_hash": row[0],
+                "merchant_id": row[1],
+                "log_hwm": row[2],
+                "docs_version": row[3],
+                "complete": bool(row[4]),
+                "state": pickle.loads(row[5]),
+                "computed_at": row[6],
+            }
+            self._remember(ticket_id, entry)
+            return entry
+
+    def put(self, ticket_id: str, ticket_hash: str, merchant_id: Optional[str], log_hwm: int,
+            docs_version: str, complete: bool, state: dict):
+        entry = {
+            "ticket_hash": ticket_hash,
+            "merchant_id": merchant_id,
+            "log_hwm": log_hwm,
+            "docs_version": docs_version,
+            "complete": complete,
+            "state": state,
+            "computed_at": time.time(),
+        }
+        blob = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self._remember(ticket_id, entry)
+            self.db.execute(
+                "INSERT OR REPLACE INTO analyses"
+                " (ticket_id, ticket_hash, merchant_id, log_hwm, docs_version, complete, state, computed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (ticket_id, ticket_hash, merchant_id, log_hwm, docs_version, int(complete), blob, entry["computed_at"]),
+            )
+            self.db.commit()
+
+    def delete(self, ticket_id: str):
+        with self.lock:
+            self.memory.pop(ticket_id, None)
+            self.db.execute("DELETE FROM analyses WHERE ticket_id = ?", (ticket_id,))
+            self.db.commit()
+
+    def record(self, outcome: str):
+        """Count how a request was answered: served as stored, partial re-run, or full run."""
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stored, complete = self.db.execute("SELECT COUNT(*), COALESCE(SUM(complete), 0) FROM analyses").fetchone()
+            requests = sum(self.counts.values())
+            return {
+                "stored": stored,
+                "complete": complete,
+                "retrieval_only": stored - complete,
+                "served_as_stored": self.counts["served"],
+                "partial_reruns": self.counts["partial"],
+                "full_runs": self.counts["full"],
+                "reuse_rate": f"{((self.counts['served'] + self.counts['partial']) / requests * 100):.1f}%" if requests > 0 else "N/A",
+            }
@@ -0,0 +1,320 @@
+# Persistent job queue and async worker pool
+# Jobs live in a local SQLite file (a stand-in for a real broker), so queued
+# and in-flight work survives restarts. Workers claim jobs atomically, retry
+# failures with exponential backoff and dead-letter jobs that keep failing.
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"  # Failed max_attempts times; kept for inspection and manual retry
+FINISHED_STATES = (DONE, DEAD)
+
+DEFAULT_MAX_ATTEMPTS = 3
+# Retry delay: RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+RETRY_BASE_SECONDS = 2.0
+# Idle workers re-check the queue at least this often (for delayed retries)
+IDLE_POLL_SECONDS = 1.0
+
+# Priorities: higher runs first
+PRIORITY_INTERACTIVE = 10
+PRIORITY_NORMAL = 0
+PRIORITY_BACKGROUND = -10
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue.
+
+    All methods are synchronous and serialized by one lock; async callers go
+    through asyncio.to_thread. Finished jobs wake long-pollers through
+    per-job asyncio events when they finish in this process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " priority INTEGER NOT NULL DEFAULT 0,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " max_attempts INTEGER NOT NULL,"
+            " available_at REAL NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " result TEXT,"
+            " error TEXT)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, available_at, created_at)")
+        self.db.commit()
+        self.lock = threading.Lock()
+
+        # In-process notifications (set from the event loop thread)
+        self.finished_events: dict[str, set[asyncio.Event]] = {}  # job id -> one event per waiter
+        self.wakeup: Optional[asyncio.Event] = None
+
+    def enqueue(self, kind: str, payload: dict, priority: int = PRIORITY_NORMAL, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO jobs (id, kind, payload, status, priority, max_attempts, available_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), QUEUED, priority, max_attempts, now, now),
+            )
+            self.db.commit()
+        return job_id
+
+    def claim(self, min_priority: Optional[int] = None) -> Optional[dict]:
+        """Atomically take the highest-priority ready job, optionally only at or above min_priority."""
+        now = time.time()
+        floor = min_priority if min_priority is not None else -2 ** 63
+        with self.lock:
+            row = self.db.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?"
+                " WHERE id = (SELECT id FROM jobs WHERE status = ? AND available_at <= ? AND priority >= ?"
+                "             ORDER BY priority DESC, available_at, created_at LIMIT 1)"
+                " RETURNING *",
+                (RUNNING, now, QUEUED, now, floor),
+            ).fetchone()
+            self.db.commit()
+        return self._to_dict(row) if row else None
+
+    def complete(self, job_id: str, result: Any):
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ? WHERE id = ?",
+                (DONE, json.dumps(result), time.time(), job_id),
+            )
+            self.db.commit()
+
+    def fail(self, job_id: str, error: str) -> str:
+        """Record a failed attempt: requeue with backoff, or dead-letter after max_attempts. Returns the new status."""
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return DEAD
+            if row["attempts"] < row["max_attempts"]:
+                delay = RETRY_BASE_SECONDS * 2 ** (row["attempts"] - 1)
+                self.db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, available_at = ? WHERE id = ?",
+                    (QUEUED, error, now + delay, job_id),
+                )
+                status = QUEUED
+            else:
+                self.db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (DEAD, error, now, job_id),
+                )
+                status = DEAD
+            self.db.commit()
+        return status
+
+    def retry(self, job_id: str) -> bool:
+        """Move a dead-lettered job back to the queue with a fresh attempt budget."""
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, finished_at = NULL WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), job_id, DEAD),
+            )
+            self.db.commit()
+        return cursor.rowcount > 0
+
+    def recover(self) -> int:
+        """Requeue jobs left running by a previous process (crash or restart)."""
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE jobs SET status = ?, available_at = ? WHERE status = ?",
+                (QUEUED, time.time(), RUNNING),
+            )
+            self.db.commit()
+        return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self.lock:
+            row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status: str, limit: int = 50) -> list[dict]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def metrics(self) -> dict:
+        now = time.time()
+        with self.lock:
+            counts = dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = self.db.execute(
+                "SELECT MIN(created_at) FROM jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()[0]
+            durations = self.db.execute(
+                "SELECT AVG(finished_at - started_at), AVG(finished_at - created_at) FROM"
+                " (SELECT started_at, finished_at, created_at FROM jobs WHERE status = ?"
+                "  ORDER BY finished_at DESC LIMIT 100)",
+                (DONE,),
+            ).fetchone()
+        return {
+            "queue_depth": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "done": counts.get(DONE, 0),
+            "dead_letter": counts.get(DEAD, 0),
+            "oldest_queued_age_s": round(now - oldest, 1) if oldest else 0.0,
+            "avg_run_ms": round(durations[0] * 1000, 1) if durations[0] is not None else None,
+            "avg_turnaround_ms": round(durations[1] * 1000, 1) if durations[1] is not None else None,
+        }
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    # === Async helpers (event loop side) ===
+
+    async def submit(self, kind: str, payload: dict, priority: int = PRIORITY_NORMAL, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+        job_id = await asyncio.to_thread(self.enqueue, kind, payload, priority, max_attempts)
+        if self.wakeup is not None:
+            self.wakeup.set()
+        return job_id
+
+    def notify_finished(self, job_id: str):
+        for event in self.finished_events.pop(job_id, ()):
+            event.set()
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Long-poll: return the job once finished, or its current state after timeout."""
+        if timeout <= 0:
+            return await asyncio.to_thread(self.get, job_id)
+        # Register before reading the state, so a job finishing in between still wakes us
+        event = asyncio.Event()
+        self.finished_events.setdefault(job_id, set()).add(event)
+        try:
+            job = await asyncio.to_thread(self.get, job_id)
+            if job is None or job["status"] in FINISHED_STATES:
+                return job
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return await asyncio.to_thread(self.get, job_id)
+        finally:
+            waiters = self.finished_events.get(job_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self.finished_events[job_id]
+
+
+Handler = Callable[[dict], Awaitable[Any]]
+
+
+class WorkerPool:
+    """
+    Async workers draining a JobQueue. Each job's kind picks its handler;
+    a handler's return value is stored as the job result, an exception counts
+    as a failed attempt.
+
+    At most background_slots workers run background-priority jobs at once;
+    the others only claim normal and interactive work, so a backlog of
+    background jobs never starves requests someone is waiting on.
+    """
+
+    def __init__(self, queue: JobQueue, handlers: dict[str, Handler], size: int, background_slots: int = 1):
+        self.queue = queue
+        self.handlers = handlers
+        self.size = size
+        self.background_slots = min(background_slots, size)
+        self.background_running = 0
+        self.tasks: list[asyncio.Task] = []
+        self.processed = 0
+        self.failed_attempts = 0
+
+    async def start(self):
+        self.queue.wakeup = asyncio.Event()
+        recovered = await asyncio.to_thread(self.queue.recover)
+        if recovered:
+            print(f"[Jobs] Requeued {recovered} interrupted jobs")
+        self.tasks = [asyncio.create_task(self._work(f"worker-{i}")) for i in range(self.size)]
+        print(f"[Jobs] Started {self.size} workers")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _work(self, name: str):
+        while True:
+            # Reserve a background slot before claiming, so concurrent claims can't overshoot it
+            background = self.background_running < self.background_slots
+            if background:
+                self.background_running += 1
+            job = await asyncio.to_thread(self.queue.claim, None if background else PRIORITY_NORMAL)
+            if background and (job is None or job["priority"] >= PRIORITY_NORMAL):
+                self.background_running -= 1
+                background = False
+            if job is None:
+                self.queue.wakeup.clear()
+                # asyncio.wait, not wait_for: on 3.11 wait_for can swallow a stop() cancel
+                # that lands just as the wakeup fires, leaving the worker running
+                waiter = asyncio.ensure_future(self.queue.wakeup.wait())
+                try:
+                    await asyncio.wait({waiter}, timeout=IDLE_POLL_SECONDS)
+                finally:
+                    waiter.cancel()
+                continue
+            try:
+                await self._run(name, job)
+            finally:
+                if background:
+                    self.background_running -= 1
+
+    async def _run(self, name: str, job: dict):
+        handler = self.handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind '{job['kind']}'")
+            result = await handler(job["payload"])
+            await asyncio.to_thread(self.queue.complete, job["id"], result)
+            self.processed += 1
+            self.queue.notify_finished(job["id"])
+        except asyncio.CancelledError:
+            # Shutdown mid-job: leave it for recover() on the next start
+            raise
+        except Exception as e:
+            self.failed_attempts += 1
+            status = await asyncio.to_thread(self.queue.fail, job["id"], str(e))
+            print(f"[Jobs] {name}: job {job['id']} attempt {job['attempts']} failed ({status}): {e}")
+            if status == DEAD:
+                self.queue.notify_finished(job["id"])
+
+    def get_stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "background_slots": self.background_slots,
+            "background_running": self.background_running,
+            "processed": self.processed,
+            "failed_attempts": self.failed_attempts,
+            **self.queue.metrics(),
+        }
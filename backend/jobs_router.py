@@ -0,0 +1,151 @@
+# FastAPI Router for background analysis jobs
+# Submitting returns a job id at once; a worker pool runs the agent and the
+# result is fetched (or long-polled) by job id
+
+import os
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from agent import analyze_ticket, precompute_analysis
+from router import to_response
+from job_queue import DEAD, PRIORITY_BACKGROUND, PRIORITY_NORMAL, JobQueue, WorkerPool
+
+# Create router instance
+router = APIRouter(prefix="/jobs", tags=["Analysis Jobs"])
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Longest a GET /jobs/{id}?wait= request is held open
+MAX_WAIT_SECONDS = 30.0
+
+# Speculative pre-analysis of new tickets: "off", "retrieval" (merchant, logs
+# and docs) or "full" (also the Gemini diagnosis)
+SPECULATIVE_ANALYSIS = os.getenv("SPECULATIVE_ANALYSIS", "off").lower()
+# Workers that may run speculative (background) jobs at once
+SPECULATIVE_WORKERS = int(os.getenv("SPECULATIVE_WORKERS", "1"))
+# Concurrent Gemini calls from speculative runs, shared by all of them
+SPECULATIVE_LLM_CONCURRENCY = int(os.getenv("SPECULATIVE_LLM_CONCURRENCY", "1"))
+
+speculative_llm_semaphore = asyncio.Semaphore(SPECULATIVE_LLM_CONCURRENCY)
+
+
+async def run_analysis(payload: dict) -> dict:
+    """
+    Job handler: run the agent (reusing the ticket's stored analysis) and store the API response shape.
+    A Gemini failure raises, so the queue retries the job with backoff and dead-letters it in the end.
+    """
+    result = await analyze_ticket(payload["ticket_text"], merchant_id=payload.get("merchant_id"),
+                                  email=payload.get("email"), ticket_id=payload.get("ticket_id"))
+    if result.get("llm_error"):
+        raise RuntimeError(f"LLM analysis failed: {result['llm_error']}")
+    return to_response(result).model_dump()
+
+
+async def run_speculation(payload: dict) -> dict:
+    """Job handler: pre-compute a new ticket's analysis into the analysis store for when the ticket is opened."""
+    full = payload.get("mode") == "full"
+    state = await precompute_analysis(
+        payload["ticket_text"], merchant_id=payload.get("merchant_id"), email=payload.get("email"),
+        ticket_id=payload["ticket_id"], full=full,
+        config={"configurable": {"llm_semaphore": speculative_llm_semaphore}},
+    )
+    print(f"[Speculative] Pre-computed {'analysis' if full else 'retrieval'} for ticket {payload['ticket_id']}")
+    return {"ticket_id": payload["ticket_id"], "mode": payload.get("mode"), "merchant_id": state.get("merchant_id")}
+
+
+job_queue = JobQueue(JOB_QUEUE_PATH)
+worker_pool = WorkerPool(
+    job_queue,
+    {"analyze": run_analysis, "speculate": run_speculation},
+    size=JOB_WORKERS,
+    background_slots=SPECULATIVE_WORKERS,
+)
+
+
+class AnalyzeJobRequest(BaseModel):
+    """Request model for an analysis job."""
+    ticket_text: str
+    merchant_id: Optional[str] = None
+    email: Optional[str] = None
+    ticket_id: Optional[str] = None  # Ticket the analysis belongs to, for reference
+
+
+async def submit_analysis(ticket_text: str, merchant_id: Optional[str] = None, email: Optional[str] = None,
+                          ticket_id: Optional[str] = None, priority: int = PRIORITY_NORMAL) -> str:
+    """Queue an analysis job and return its id."""
+    payload = {"ticket_text": ticket_text, "merchant_id": merchant_id, "email": email, "ticket_id": ticket_id}
+    return await job_queue.submit("analyze", payload, priority=priority, max_attempts=JOB_MAX_ATTEMPTS)
+
+
+async def submit_speculation(ticket_text: str, ticket_id: str, merchant_id: Optional[str] = None,
+                             email: Optional[str] = None) -> Optional[str]:
+    """Queue speculative pre-analysis of a new ticket at background priority, if enabled. Returns the job id."""
+    if SPECULATIVE_ANALYSIS not in ("retrieval", "full"):
+        return None
+    payload = {"ticket_text": ticket_text, "merchant_id": merchant_id, "email": email,
+               "ticket_id": ticket_id, "mode": SPECULATIVE_ANALYSIS}
+    # Speculation is best-effort: one attempt, no retries
+    return await job_queue.submit("speculate", payload, priority=PRIORITY_BACKGROUND, max_attempts=1)
+
+
+def job_view(job: dict) -> dict:
+    """Public view of a job row."""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "ticket_id": job["payload"].get("ticket_id"),
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+        "result": job["result"],
+    }
+
+
+@router.post("/analyze", status_code=202)
+async def create_analysis_job(request: AnalyzeJobRequest):
+    """Queue a ticket analysis. Returns immediately with the job id."""
+    if not request.ticket_text.strip():
+        raise HTTPException(status_code=400, detail="ticket_text cannot be empty")
+    job_id = await submit_analysis(request.ticket_text, request.merchant_id, request.email, request.ticket_id)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get("/metrics")
+async def get_job_metrics():
+    """Queue depth, worker activity and job timings."""
+    return await asyncio.to_thread(worker_pool.get_stats)
+
+
+@router.get("/dead-letter")
+async def get_dead_letter(limit: int = 50):
+    """Jobs that failed every attempt, most recent first."""
+    jobs = await asyncio.to_thread(job_queue.list, DEAD, limit)
+    return {"count": len(jobs), "jobs": [job_view(job) for job in jobs]}
+
+
+@router.post("/{job_id}/retry")
+async def retry_job(job_id: str):
+    """Requeue a dead-lettered job."""
+    if not await asyncio.to_thread(job_queue.retry, job_id):
+        raise HTTPException(status_code=404, detail="No dead-lettered job with that id")
+    if job_queue.wakeup is not None:
+        job_queue.wakeup.set()
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """
+    Job status and, once done, its result.
+    With ?wait=N (seconds, max 30) the request is held until the job finishes
+    or the wait runs out (long-polling).
+    """
+    job = await job_queue.wait(job_id, min(max(wait, 0.0), MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(job)
@@ -0,0 +1,161 @@
+# LLM response cache
+# Content-addressed cache for generate_solution: identical prompts (same
+# ticket, logs and docs context) reuse the earlier Gemini answer. Two tiers:
+# an in-memory LRU and a SQLite file that survives restarts, both with TTL
+# and size-based eviction.
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Entries older than this are treated as misses and dropped
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+# Size limits per tier; least recently used entries are evicted first
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_DISK_ENTRIES = 5000
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_prompt_part(text: str) -> str:
+    """Collapse whitespace so formatting-only differences share a key."""
+    return WHITESPACE_PATTERN.sub(" ", text or "").strip()
+
+
+def cache_key(*parts: str) -> str:
+    """SHA-256 over the normalized prompt parts (unit-separator joined)."""
+    joined = "\x1f".join(normalize_prompt_part(part) for part in parts)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier LRU + TTL cache of JSON-serializable LLM results.
+
+    Reads check memory first, then disk (promoting disk hits into memory).
+    Writes go to both tiers. With path=None only the memory tier is used.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+        max_disk_entries: int = DEFAULT_DISK_ENTRIES,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self.memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()  # key -> (created_at, value)
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self.db.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, value: dict):
+        self.memory[key] = (created_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> tuple[Optional[dict], Optional[str]]:
+        """Return (value, tier) where tier is "memory" or "disk", or (None, None) on a miss."""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if not self._expired(created_at, now):
+                    self.memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value, "memory"
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, created_at = json.loads(row[0]), row[1]
+                    if not self._expired(created_at, now):
+                        self.db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                        self.db.commit()
+                        self._remember(key, created_at, value)
+                        self.disk_hits += 1
+                        return value, "disk"
+                    self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.db.commit()
+
+            self.misses += 1
+            return None, None
+
+    def put(self, key: str, value: dict):
+        """Store a result in both tiers, evicting the least recently used entries over the limits."""
+        now = time.time()
+        with self.lock:
+            self._remember(key, now, value)
+            if self.db is None:
+                return
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            # TTL sweep, then trim to the size limit by last access
+            cursor = self.db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.evictions += cursor.rowcount
+            cursor = self.db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+            self.evictions += cursor.rowcount
+            self.db.commit()
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+
+    def get_stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        disk_entries = None
+        if self.db is not None:
+            with self.lock:
+                disk_entries = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": f"{((self.memory_hits + self.disk_hits) / lookups * 100):.1f}%" if lookups > 0 else "N/A",
+            "memory_entries": len(self.memory),
+            "disk_entries": disk_entries,
+            "evictions": self.evictions,
+        }
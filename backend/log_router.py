@@ -0,0 +1,195 @@
+# FastAPI Router for merchant log ingestion
+# Streams NDJSON log batches from log shippers into the merchant log store
+
+import re
+import json
+import time
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from mock_db import append_merchant_logs, get_merchant_logs, log_store
+from log_store import LINE_PATTERN, TIMESTAMP_PATTERN, parse_timestamp
+
+# Create router instance
+router = APIRouter(prefix="/logs", tags=["Log Ingestion"])
+
+# Lines buffered before a batch is handed to the store
+INGEST_BATCH_LINES = 1000
+# Batches allowed in flight per request; when full the endpoint stops reading
+# the request body, which pushes back on the shipper through TCP flow control
+INGEST_QUEUE_BATCHES = 4
+# Per-line errors echoed back in the response
+MAX_REPORTED_ERRORS = 20
+
+# A raw line that opens with a date must be a full "YYYY-MM-DD HH:MM:SS LEVEL: message"
+# line; otherwise it would be stored unparsed, invisible to level and time filters
+DATED_LINE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def parse_log_record(record: dict) -> tuple[str, str]:
+    """
+    Turn one NDJSON record into (merchant_id, raw log line).
+
+    Accepted shapes:
+        {"merchant_id": "m_123", "line": "2024-01-15 10:23:45 ERROR: ..."}
+        {"merchant_id": "m_123", "timestamp": "2024-01-15 10:23:45", "level": "ERROR", "message": "..."}
+
+    Timestamps are exactly "YYYY-MM-DD HH:MM:SS" (or with a 'T'), UTC, no
+    fractions or zone; anything else fails the record. Lines that do not
+    start with a date are kept as free-form text.
+    """
+    merchant_id = str(record.get("merchant_id") or "").strip().lower()
+    if not merchant_id:
+        raise ValueError("missing merchant_id")
+
+    if record.get("line"):
+        line = str(record["line"])
+        match = LINE_PATTERN.match(line.strip())
+        if match:
+            check_timestamp(match.group(1))
+        elif DATED_LINE_PATTERN.match(line.strip()):
+            raise ValueError("line must start with 'YYYY-MM-DD HH:MM:SS LEVEL:'")
+        return merchant_id, line
+    if record.get("message") is not None and record.get("timestamp"):
+        check_timestamp(str(record["timestamp"]))
+        level = str(record.get("level") or "INFO").upper()
+        return merchant_id, f"{record['timestamp']} {level}: {record['message']}"
+    raise ValueError("record needs 'line' or 'timestamp' + 'message'")
+
+
+def check_timestamp(value: str):
+    """
+    Reject timestamps the store cannot keep as-is (e.g. "2024-02-30", a zone
+    offset or fractional seconds) so they fail this line, not the batch.
+    """
+    if not TIMESTAMP_PATTERN.match(value):
+        raise ValueError(f"invalid timestamp '{value}' (expected YYYY-MM-DD HH:MM:SS, UTC)")
+    try:
+        parse_timestamp(value)
+    except ValueError:
+        raise ValueError(f"invalid timestamp '{value}'")
+
+
+async def _write_batches(queue: asyncio.Queue, stats: dict):
+    """Drain queued batches into the store off the event loop."""
+    while True:
+        batch = await queue.get()
+        try:
+            if batch is None:
+                return
+            if "write_error" not in stats:
+                stats["accepted"] += await asyncio.to_thread(append_merchant_logs, batch)
+        except Exception as e:
+            # Keep draining so the reader never blocks on a dead writer
+            stats["write_error"] = str(e)
+        finally:
+            queue.task_done()
+
+
+@router.post("/ingest")
+async def ingest_logs(request: Request):
+    """
+    Stream merchant log lines into the log store.
+
+    The body is NDJSON (one record per line, see parse_log_record) and may be
+    sent with chunked transfer encoding. Records are parsed as they arrive,
+    grouped per merchant and appended in batches of INGEST_BATCH_LINES.
+    Logs are visible to /agent/analyze as soon as their batch is written.
+    """
+    start_time = time.time()
+    stats = {"accepted": 0, "rejected": 0, "errors": []}
+    merchants: set[str] = set()
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=INGEST_QUEUE_BATCHES)
+    writer = asyncio.create_task(_write_batches(queue, stats))
+
+    batch: dict[str, list[str]] = {}
+    batch_lines = 0
+    buffer = b""
+    line_number = 0
+
+    def handle_line(raw: bytes) -> Optional[str]:
+        """Parse one NDJSON line into the current batch. Returns an error message on failure."""
+        nonlocal batch_lines
+        if not raw.strip():
+            return None
+        try:
+            record = json.loads(raw)
+            if not isinstance(record, dict):
+                raise ValueError("record must be a JSON object")
+            merchant_id, line = parse_log_record(record)
+        except ValueError as e:
+            return str(e)
+        batch.setdefault(merchant_id, []).append(line)
+        merchants.add(merchant_id)
+        batch_lines += 1
+        return None
+
+    def reject(error: str):
+        stats["rejected"] += 1
+        if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+            stats["errors"].append({"line": line_number, "error": error})
+
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for raw in lines:
+                line_number += 1
+                error = handle_line(raw)
+                if error:
+                    reject(error)
+                if batch_lines >= INGEST_BATCH_LINES:
+                    await queue.put(batch)  # Blocks while the store is behind
+                    batch, batch_lines = {}, 0
+
+        # Last line may come without a trailing newline
+        if buffer.strip():
+            line_number += 1
+            error = handle_line(buffer)
+            if error:
+                reject(error)
+        if batch:
+            await queue.put(batch)
+        await queue.put(None)
+        await writer
+        if "write_error" in stats:
+            raise RuntimeError(stats["write_error"])
+    except Exception as e:
+        writer.cancel()
+        print(f"[Log Ingest] Failed after {stats['accepted']} lines: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
+
+    duration_ms = (time.time() - start_time) * 1000
+    print(f"[Log Ingest] +{stats['accepted']} lines, {stats['rejected']} rejected, {len(merchants)} merchants | {duration_ms:.0f}ms")
+
+    return {
+        "accepted": stats["accepted"],
+        "rejected": stats["rejected"],
+        "merchants": len(merchants),
+        "errors": stats["errors"],
+        "duration_ms": round(duration_ms, 2),
+    }
+
+
+@router.post("/flush")
+async def flush_logs():
+    """Seal buffered log lines into an on-disk segment (requires LOG_SEGMENTS_DIR)."""
+    if not log_store.segment_dir:
+        raise HTTPException(status_code=400, detail="LOG_SEGMENTS_DIR is not configured")
+    written = await asyncio.to_thread(log_store.flush)
+    return {"flushed": written, "segments": len(log_store.segment_dir.segments)}
+
+
+@router.get("/{merchant_id}")
+async def read_logs(merchant_id: str, level: Optional[str] = None, newest: Optional[int] = None, collapse: bool = False):
+    """
+    Read a merchant's logs. level is a comma-separated filter (e.g. "ERROR,WARN").
+    With collapse=true, repeated lines are returned as templates with counts.
+    """
+    levels = [name.strip() for name in level.split(",")] if level else None
+    try:
+        lines = get_merchant_logs(merchant_id, levels=levels, newest=newest, collapse=collapse)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Unknown log level: {str(e)}")
+    return {"merchant_id": merchant_id, "count": len(lines), "logs": lines}
@@ -0,0 +1,244 @@
+# On-disk log segments for the merchant log store
+# Sealed log rows live in append-only segment files read through mmap,
+# so opening a store is cheap and queries only page in the slice they need.
+# Opening reads one small catalog file, however many segments there are.
+#
+# Directory layout:
+#   messages.dat          UTF-8 message texts, concatenated (append-only)
+#   messages.off          uint64 offsets into messages.dat, one per message + 1
+#   messages.hash         uint64 hash of each message, for interning without decoding them all
+#   segment-000001.rows   8-byte magic + packed ROW_DTYPE records, grouped by merchant
+#   segment-000001.idx    JSON: {"rows": N, "merchants": {merchant_id: [first_row, count]}}
+#   catalog.json          JSON: {"segments": N, "merchants": {merchant_id: rows in all segments}}
+
+import os
+import json
+import mmap
+import hashlib
+import threading
+from typing import Optional
+
+import numpy as np
+
+# One packed 13-byte record per log line
+ROW_DTYPE = np.dtype([("ts", "<i8"), ("level", "u1"), ("msg", "<u4")])
+SEGMENT_MAGIC = b"MLOGSEG1"
+
+MESSAGES_DATA = "messages.dat"
+MESSAGES_OFFSETS = "messages.off"
+MESSAGES_HASHES = "messages.hash"
+CATALOG = "catalog.json"
+
+
+def message_hash(message: str) -> int:
+    """Stable 64-bit hash of a message text."""
+    return int.from_bytes(hashlib.blake2b(message.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _map_file(path: str) -> Optional[mmap.mmap]:
+    """Read-only mmap of a file, or None if it is empty/missing."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MessageTable:
+    """
+    Append-only interned message table backed by three files.
+    Message texts are decoded from the mmap on access; nothing is read at open.
+    find() looks a text up by its stored hash, decoding only the candidates.
+    """
+
+    def __init__(self, directory: str):
+        self.data_path = os.path.join(directory, MESSAGES_DATA)
+        self.offsets_path = os.path.join(directory, MESSAGES_OFFSETS)
+        self.hashes_path = os.path.join(directory, MESSAGES_HASHES)
+        # Guards the maps against being swapped (and closed) mid-read by append()
+        self.lock = threading.Lock()
+        self._data = None
+        self._offsets_map = None
+        self._offsets = np.zeros(1, dtype="<u8")
+        self._lookup = None  # (sorted hashes, message ids), built on the first find()
+        self._remap()
+
+    def _remap(self):
+        """Map the files again after they grew, closing the previous maps."""
+        with self.lock:
+            old = (self._data, self._offsets_map)
+            self._data = _map_file(self.data_path)
+            self._offsets_map = _map_file(self.offsets_path)
+            if self._offsets_map is not None:
+                self._offsets = np.frombuffer(self._offsets_map, dtype="<u8")
+            for mapped in old:
+                if mapped is not None:
+                    try:
+                        mapped.close()
+                    except BufferError:
+                        pass  # A view of it is still alive; the map is released with that view
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, msg_id: int) -> str:
+        with self.lock:
+            start, end = int(self._offsets[msg_id]), int(self._offsets[msg_id + 1])
+            return self._data[start:end].decode("utf-8") if end > start else ""
+
+    def _hashes(self) -> np.ndarray:
+        """Hash of every message, one per id, as written by append()."""
+        if not len(self):
+            return np.zeros(0, dtype="<u8")
+        return np.fromfile(self.hashes_path, dtype="<u8")
+
+    def find(self, message: str) -> Optional[int]:
+        """
+        Id of a message stored before the first call, or None. The lookup is
+        a sorted copy of the hash column (vectorized); messages appended
+        later are not covered, their writer interns them itself.
+        """
+        if self._lookup is None:
+            hashes = self._hashes()
+            ids = np.argsort(hashes, kind="stable")
+            self._lookup = (hashes[ids], ids)
+        sorted_hashes, ids = self._lookup
+        target = np.uint64(message_hash(message))
+        position = int(np.searchsorted(sorted_hashes, target))
+        while position < len(sorted_hashes) and sorted_hashes[position] == target:
+            if self[int(ids[position])] == message:
+                return int(ids[position])
+            position += 1
+        return None
+
+    def append(self, messages: list[str]):
+        """Append messages; their ids continue from the current length."""
+        if not messages:
+            return
+        encoded = [message.encode("utf-8") for message in messages]
+        base = int(self._offsets[-1])
+        new_offsets = base + np.cumsum([len(blob) for blob in encoded], dtype=np.uint64)
+
+        with open(self.data_path, "ab") as f:
+            f.write(b"".join(encoded))
+        with open(self.offsets_path, "ab") as f:
+            if f.tell() == 0:
+                f.write(np.zeros(1, dtype="<u8").tobytes())
+            f.write(new_offsets.astype("<u8").tobytes())
+        with open(self.hashes_path, "ab") as f:
+            f.write(np.array([message_hash(message) for message in messages], dtype="<u8").tobytes())
+        self._remap()
+
+
+class SegmentReader:
+    """
+    Read-only view of one sealed segment.
+    The per-merchant index and the row mmap are opened on first use.
+    """
+
+    def __init__(self, rows_path: str, index: Optional[dict[str, list[int]]] = None):
+        self.rows_path = rows_path
+        self.index_path = rows_path[:-len(".rows")] + ".idx"
+        self._index = index
+        self._rows: Optional[mmap.mmap] = None
+
+    @property
+    def index(self) -> dict[str, list[int]]:
+        if self._index is None:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)["merchants"]
+        return self._index
+
+    def rows(self, merchant_id: str) -> Optional[np.ndarray]:
+        """Zero-copy structured array of one merchant's rows, or None if absent."""
+        entry = self.index.get(merchant_id)
+        if entry is None:
+            return None
+        if self._rows is None:
+            self._rows = _map_file(self.rows_path)
+            if self._rows[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+                raise ValueError(f"Not a log segment: {self.rows_path}")
+        first_row, count = entry
+        offset = len(SEGMENT_MAGIC) + first_row * ROW_DTYPE.itemsize
+        return np.frombuffer(self._rows, dtype=ROW_DTYPE, count=count, offset=offset)
+
+
+class SegmentDirectory:
+    """
+    A directory of sealed segments plus the shared message table.
+
+    The catalog (merchant -> rows across all segments) answers "which
+    merchants exist" and "how many rows" without opening segment indexes.
+    write_segment() only writes files; add_segment() makes a segment visible.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.catalog_path = os.path.join(directory, CATALOG)
+        self.messages = MessageTable(directory)
+        self.segments = [
+            SegmentReader(os.path.join(directory, name))
+            for name in sorted(os.listdir(directory))
+            if name.startswith("segment-") and name.endswith(".rows")
+        ]
+        self.catalog = self._load_catalog()
+
+    def _load_catalog(self) -> dict[str, int]:
+        if os.path.exists(self.catalog_path):
+            with open(self.catalog_path, "r", encoding="utf-8") as f:
+                catalog = json.load(f)
+            if catalog["segments"] == len(self.segments):
+                return catalog["merchants"]
+        # Missing or behind (a crash between sealing a segment and updating it): rebuild once
+        merchants: dict[str, int] = {}
+        for segment in self.segments:
+            for merchant_id, (_, count) in segment.index.items():
+                merchants[merchant_id] = merchants.get(merchant_id, 0) + count
+        self._write_catalog(len(self.segments), merchants)
+        return merchants
+
+    def _write_catalog(self, segments: int, merchants: dict[str, int]):
+        with open(self.catalog_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"segments": segments, "merchants": merchants}, f)
+        os.replace(self.catalog_path + ".tmp", self.catalog_path)
+
+    def write_segment(self, merchant_rows: dict[str, np.ndarray]) -> SegmentReader:
+        """
+        Seal rows into a new segment. merchant_rows maps merchant_id to a
+        ROW_DTYPE array. Files are written under temp names and renamed, so
+        readers never see a partial segment. The segment is not visible
+        until it is passed to add_segment().
+        """
+        seq = len(self.segments) + 1
+        base = os.path.join(self.directory, f"segment-{seq:06d}")
+        index = {}
+        first_row = 0
+
+        with open(base + ".rows.tmp", "wb") as f:
+            f.write(SEGMENT_MAGIC)
+            for merchant_id, rows in merchant_rows.items():
+                if len(rows) == 0:
+                    continue
+                f.write(np.ascontiguousarray(rows, dtype=ROW_DTYPE).tobytes())
+                index[merchant_id] = [first_row, len(rows)]
+                first_row += len(rows)
+        with open(base + ".idx.tmp", "w", encoding="utf-8") as f:
+            json.dump({"rows": first_row, "merchants": index}, f)
+
+        os.replace(base + ".idx.tmp", base + ".idx")
+        os.replace(base + ".rows.tmp", base + ".rows")
+
+        self._write_catalog(seq, self._counted(index))
+        return SegmentReader(base + ".rows", index)
+
+    def add_segment(self, segment: SegmentReader):
+        """Make a written segment visible (the caller excludes concurrent readers)."""
+        self.catalog = self._counted(segment.index)
+        self.segments = self.segments + [segment]
+
+    def _counted(self, index: dict[str, list[int]]) -> dict[str, int]:
+        """The catalog with a segment's rows added."""
+        merchants = dict(self.catalog)
+        for merchant_id, (_, count) in index.items():
+            merchants[merchant_id] = merchants.get(merchant_id, 0) + count
+        return merchants
@@ -0,0 +1,394 @@
+# Columnar merchant log store
+# Parses each raw log line once into NumPy columns (timestamp, level, message id)
+# so per-merchant queries are array masks instead of string scans.
+# Optionally backed by mmap'd on-disk segments (see log_segments.py).
+
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+
+from log_segments import ROW_DTYPE, SegmentDirectory
+from log_templates import LogTemplate, mine_templates
+
+# Severity levels, stored as uint8 codes (index into this tuple)
+LEVELS = ("DEBUG", "INFO", "WARN", "ERROR")
+LEVEL_CODES = {name: code for code, name in enumerate(LEVELS)}
+# Aliases seen in the wild
+LEVEL_CODES.update({"WARNING": LEVEL_CODES["WARN"], "ERR": LEVEL_CODES["ERROR"], "CRITICAL": LEVEL_CODES["ERROR"]})
+
+# The level byte also records how the line spelled it, so rendering gives back
+# the original text: bits 0-1 severity, bit 2 a 'T' date/time separator,
+# bits 3-7 the level token (0 = the canonical LEVELS name, so plain rows are
+# just the severity code). Tokens outside LEVEL_SPELLINGS are kept in front of
+# the message instead (RAW_SPELLING).
+SEVERITY_MASK = 0b11
+T_SEPARATOR = 0b100
+SPELLING_SHIFT = 3
+LEVEL_SPELLINGS = ("",) + tuple(
+    spelling
+    for name in LEVEL_CODES
+    for spelling in (name, name.lower(), name.title())
+    if spelling not in LEVELS
+)
+SPELLING_CODES = {spelling: index for index, spelling in enumerate(LEVEL_SPELLINGS) if spelling}
+RAW_SPELLING = 31
+
+# "2024-01-15 10:23:45" (or with a 'T'): whole seconds, no zone, read as UTC
+TIMESTAMP_FORMAT = r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}"
+TIMESTAMP_PATTERN = re.compile(rf"^{TIMESTAMP_FORMAT}$")
+# "2024-01-15 10:23:45 ERROR: message"
+LINE_PATTERN = re.compile(rf"^({TIMESTAMP_FORMAT})\s+([A-Za-z]+):\s?(.*)$")
+
+# Timestamp stored for lines we could not parse; they keep their raw text as message
+UNPARSED_TS = -1
+
+
+def parse_timestamp(value: str) -> int:
+    """
+    Parse "YYYY-MM-DD HH:MM:SS" (treated as UTC) to epoch seconds. Callers
+    pass TIMESTAMP_PATTERN matches only: fromisoformat alone would also take
+    dates without a time, fractions and zone offsets.
+    """
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+
+
+def format_timestamp(ts: int) -> str:
+    """Inverse of parse_timestamp."""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class _MerchantColumns:
+    """Growable column arrays for one merchant's log rows, in insertion order."""
+
+    def __init__(self, capacity: int = 16):
+        self.size = 0
+        self.ts = np.empty(capacity, dtype=np.int64)
+        self.level = np.empty(capacity, dtype=np.uint8)
+        self.msg = np.empty(capacity, dtype=np.uint32)
+
+    def append(self, ts: np.ndarray, level: np.ndarray, msg: np.ndarray):
+        needed = self.size + len(ts)
+        if needed > len(self.ts):
+            capacity = max(needed, 2 * len(self.ts))
+            for name in ("ts", "level", "msg"):
+                column = getattr(self, name)
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                setattr(self, name, grown)
+        self.ts[self.size:needed] = ts
+        self.level[self.size:needed] = level
+        self.msg[self.size:needed] = msg
+        self.size = needed
+
+
+class LogRows(NamedTuple):
+    """Selected log rows of one merchant, as column arrays."""
+    merchant_id: str
+    ts: np.ndarray
+    level: np.ndarray
+    msg: np.ndarray
+
+    @property
+    def count(self) -> int:
+        return len(self.ts)
+
+
+class MerchantLogStore:
+    """
+    Per-merchant log rows stored column-wise.
+
+    Messages are interned once in a shared table, so repeated lines cost a
+    uint32 id instead of another string. Each row is 13 bytes of column data.
+
+    New rows go to an in-memory tail. When the store is opened on a segment
+    directory, flush() seals the tail into an mmap'd segment file; sealed
+    rows are only paged in when a query touches their merchant. Opening is
+    constant-time: merchants and row counts come from the segment catalog,
+    and persisted messages are interned by hash lookup, never all decoded.
+    Readers take no write lock; flush() swaps the sealed segment in and the
+    tail out under swap_lock, so a reader sees the rows exactly once.
+    """
+
+    def __init__(self, segment_dir: Optional[SegmentDirectory] = None):
+        self.segment_dir = segment_dir
+        self.tail: dict[str, _MerchantColumns] = {}
+        # Messages on disk keep ids [0, disk_count); new ones are appended after
+        self.disk_messages = segment_dir.messages if segment_dir else None
+        self.disk_message_count = len(self.disk_messages) if segment_dir else 0
+        self.messages: list[str] = []
+        self._message_ids: dict[str, int] = {}  # Messages interned since the store was opened
+        self.tail_rows = 0
+        self.version = 0  # Bumped on every append
+        # Serializes writers; readers only ever see fully appended rows
+        self.write_lock = threading.Lock()
+        # Held briefly by readers and by flush() while it moves rows from the tail to a segment
+        self.swap_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, directory: str) -> "MerchantLogStore":
+        """Open a store on a segment directory. Only file names are read up front."""
+        return cls(SegmentDirectory(directory))
+
+    def message(self, msg_id: int) -> str:
+        """Text of an interned message."""
+        with self.swap_lock:
+            disk_count, messages = self.disk_message_count, self.messages
+        if msg_id < disk_count:
+            return self.disk_messages[msg_id]
+        return messages[msg_id - disk_count]
+
+    def _intern(self, message: str) -> int:
+        msg_id = self._message_ids.get(message)
+        if msg_id is None and self.disk_messages is not None:
+            # Persisted before this store was opened: found by hash, without decoding the table
+            msg_id = self.disk_messages.find(message)
+            if msg_id is not None:
+                self._message_ids[message] = msg_id
+        if msg_id is None:
+            msg_id = self.disk_message_count + len(self.messages)
+            self.messages.append(message)
+            self._message_ids[message] = msg_id
+        return msg_id
+
+    def parse_line(self, line: str) -> tuple[int, int, int]:
+        """Parse one raw log line into (timestamp, level code, message id)."""
+        match = LINE_PATTERN.match(line.strip())
+        if not match:
+            return UNPARSED_TS, LEVEL_CODES["INFO"], self._intern(line.strip())
+        ts, level, message = match.groups()
+        code = LEVEL_CODES.get(level.upper(), LEVEL_CODES["INFO"])
+        if ts[10] == "T":
+            code |= T_SEPARATOR
+        if level != LEVELS[code & SEVERITY_MASK]:
+            spelling = SPELLING_CODES.get(level)
+            if spelling is None:
+                spelling, message = RAW_SPELLING, f"{level}: {message}"
+            code |= spelling << SPELLING_SHIFT
+        return parse_timestamp(ts), code, self._intern(message)
+
+    def extend(self, merchant_id: str, lines: Iterable[str]) -> int:
+        """Parse and append raw log lines for a merchant. Returns the number of rows added."""
+        with self.write_lock:
+            return self._extend(merchant_id, lines)
+
+    def extend_batch(self, batch: dict[str, list[str]]) -> int:
+        """Append raw lines for several merchants under a single lock acquisition."""
+        with self.write_lock:
+            return sum(self._extend(merchant_id, lines) for merchant_id, lines in batch.items())
+
+    def _extend(self, merchant_id: str, lines: Iterable[str]) -> int:
+        rows = [self.parse_line(line) for line in lines]
+        if not rows:
+            self.tail.setdefault(merchant_id, _MerchantColumns())
+            return 0
+        ts, level, msg = zip(*rows)
+        self._append_rows(merchant_id, ts, level, msg)
+        return len(rows)
+
+    def _append_rows(self, merchant_id: str, ts, level, msg):
+        """Append already-parsed column values for a merchant (caller holds write_lock)."""
+        columns = self.tail.get(merchant_id)
+        if columns is None:
+            columns = self.tail[merchant_id] = _MerchantColumns()
+        columns.append(
+            np.asarray(ts, dtype=np.int64),
+            np.asarray(level, dtype=np.uint8),
+            np.asarray(msg, dtype=np.uint32),
+        )
+        self.tail_rows += len(ts)
+        self.version += 1
+
+    def merchant_ids(self) -> set[str]:
+        """Every merchant with rows on disk or in memory."""
+        with self.swap_lock:
+            merchants = set(self.tail)
+            if self.segment_dir:
+                merchants.update(self.segment_dir.catalog)
+        return merchants
+
+    def __contains__(self, merchant_id: str) -> bool:
+        with self.swap_lock:
+            return merchant_id in self.tail or (bool(self.segment_dir) and merchant_id in self.segment_dir.catalog)
+
+    def row_count(self, merchant_id: str) -> int:
+        """
+        Rows stored for a merchant. Logs are append-only, so this is the
+        merchant's high-water mark: it changes exactly when new rows arrive.
+        Reads the segment catalog only; no rows are paged in.
+        """
+        with self.swap_lock:
+            count = self.segment_dir.catalog.get(merchant_id, 0) if self.segment_dir else 0
+            columns = self.tail.get(merchant_id)
+            return count + (columns.size if columns is not None else 0)
+
+    def _columns(self, merchant_id: str) -> LogRows:
+        """All rows of a merchant: sealed segment slices first, then the in-memory tail."""
+        with self.swap_lock:
+            segments = self.segment_dir.segments if self.segment_dir else []
+            columns = self.tail.get(merchant_id)
+            n = columns.size if columns is not None else 0
+        parts = []
+        for segment in segments:
+            rows = segment.rows(merchant_id)
+            if rows is not None:
+                parts.append((rows["ts"], rows["level"], rows["msg"]))
+        if n:
+            parts.append((columns.ts[:n], columns.level[:n], columns.msg[:n]))
+
+        if not parts:
+            empty = np.empty(0, dtype=ROW_DTYPE)
+            return LogRows(merchant_id, empty["ts"], empty["level"], empty["msg"])
+        if len(parts) == 1:
+            # Single source: hand out views (zero-copy for mmap'd segments)
+            return LogRows(merchant_id, *parts[0])
+        return LogRows(merchant_id, *(np.concatenate(column) for column in zip(*parts)))
+
+    def select(
+        self,
+        merchant_id: str,
+        levels: Optional[Iterable[str]] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        newest: Optional[int] = None,
+    ) -> LogRows:
+        """
+        Select a merchant's rows with vectorized filters.
+
+        Args:
+            merchant_id: Exact merchant key
+            levels: Only rows with one of these severities (e.g. ["ERROR", "WARN"]; aliases such as "WARNING" match theirs)
+            since: Only rows with timestamp >= since (epoch seconds)
+            until: Only rows with timestamp < until (epoch seconds)
+            newest: Keep only the newest N matching rows
+
+        Returns:
+            Matching rows in chronological (insertion) order
+        """
+        columns = self._columns(merchant_id)
+        if columns.count == 0 or (levels is None and since is None and until is None and newest is None):
+            return columns
+
+        mask = np.ones(columns.count, dtype=bool)
+        if levels is not None:
+            codes = [LEVEL_CODES[level.upper()] for level in levels]
+            mask &= np.isin(columns.level & SEVERITY_MASK, codes)
+        if since is not None:
+            mask &= columns.ts >= since
+        if until is not None:
+            mask &= columns.ts < until
+
+        rows = np.flatnonzero(mask)
+        if newest is not None:
+            rows = rows[-newest:] if newest > 0 else rows[:0]
+        return LogRows(merchant_id, columns.ts[rows], columns.level[rows], columns.msg[rows])
+
+    def format(self, rows: LogRows) -> list[str]:
+        """
+        Render rows back to "YYYY-MM-DD HH:MM:SS LEVEL: message" lines, with
+        the level token and date/time separator each line was ingested with.
+        """
+        lines = []
+        for ts, level, msg in zip(rows.ts.tolist(), rows.level.tolist(), rows.msg.tolist()):
+            message = self.message(msg)
+            if ts == UNPARSED_TS:
+                lines.append(message)
+                continue
+            stamp = format_timestamp(ts)
+            if level & T_SEPARATOR:
+                stamp = stamp.replace(" ", "T", 1)
+            spelling = level >> SPELLING_SHIFT
+            if spelling == RAW_SPELLING:
+                lines.append(f"{stamp} {message}")
+            else:
+                lines.append(f"{stamp} {LEVEL_SPELLINGS[spelling] or LEVELS[level & SEVERITY_MASK]}: {message}")
+        return lines
+
+    def unique_messages(self, rows: LogRows) -> list[str]:
+        """Distinct message texts among the rows, in first-seen order."""
+        msg_ids, first = np.unique(rows.msg, return_index=True)
+        return [self.message(int(msg_id)) for msg_id in msg_ids[np.argsort(first)]]
+
+    def templates(self, rows: LogRows) -> list[LogTemplate]:
+        """
+        Collapse rows into Drain-style templates (see log_templates.py).
+        Identical lines are grouped with array ops first, so the miner only
+        sees each distinct (severity, message) pair once. Templates are
+        summaries, so they name levels canonically.
+        """
+        if rows.count == 0:
+            return []
+        keys = rows.msg.astype(np.int64) * len(LEVELS) + (rows.level & SEVERITY_MASK)
+        unique_keys, first_index, inverse, counts = np.unique(
+            keys, return_index=True, return_inverse=True, return_counts=True
+        )
+        first_ts = np.full(len(unique_keys), np.iinfo(np.int64).max, dtype=np.int64)
+        last_ts = np.full(len(unique_keys), np.iinfo(np.int64).min, dtype=np.int64)
+        np.minimum.at(first_ts, inverse, rows.ts)
+        np.maximum.at(last_ts, inverse, rows.ts)
+
+        order = np.argsort(first_index)
+        entries = [
+            (int(key % len(LEVELS)), self.message(int(key // len(LEVELS))), int(count), int(first), int(last))
+            for key, count, first, last in zip(
+                unique_keys[order], counts[order], first_ts[order], last_ts[order]
+            )
+        ]
+        return mine_templates(entries)
+
+    def format_templates(self, templates: list[LogTemplate]) -> list[str]:
+        """Render templates as log lines with repeat counts and sample parameter values."""
+        lines = []
+        for template in templates:
+            prefix = f"{LEVELS[template.level]}: "
+            if template.first_ts != UNPARSED_TS:
+                prefix = f"{format_timestamp(template.first_ts)} {prefix}"
+
+            if template.count == 1:
+                lines.append(prefix + template.example)
+                continue
+
+            line = f"{prefix}{template.template} [x{template.count}"
+            if template.last_ts != template.first_ts:
+                line += f", last {format_timestamp(template.last_ts)}"
+            line += "]"
+            if template.samples:
+                line += " (e.g. " + "; ".join(", ".join(values) for values in template.samples) + ")"
+            lines.append(line)
+        return lines
+
+    def flush(self) -> int:
+        """
+        Seal the in-memory tail into a new on-disk segment.
+        Returns the number of rows written (0 if the store has no segment directory).
+        """
+        with self.write_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        if not self.segment_dir or not self.tail_rows:
+            return 0
+
+        merchant_rows = {}
+        for merchant_id, columns in self.tail.items():
+            rows = np.empty(columns.size, dtype=ROW_DTYPE)
+            rows["ts"] = columns.ts[:columns.size]
+            rows["level"] = columns.level[:columns.size]
+            rows["msg"] = columns.msg[:columns.size]
+            merchant_rows[merchant_id] = rows
+
+        # Messages first, so a sealed segment never references an unknown id
+        self.disk_messages.append(self.messages)
+        segment = self.segment_dir.write_segment(merchant_rows)
+
+        written = self.tail_rows
+        # Readers see either the tail or the sealed segment, never both
+        with self.swap_lock:
+            self.disk_message_count += len(self.messages)
+            self.messages = []
+            self.segment_dir.add_segment(segment)
+            self.tail = {}
+            self.tail_rows = 0
+        return written
@@ -0,0 +1,117 @@
+# Drain-style log template mining
+# Collapses repeated and parameter-only-different log lines into one template
+# with a count and sample values, so prompts stay bounded on noisy merchants
+
+import re
+from typing import Iterable, Optional
+
+# Wildcard token used in templates
+WILDCARD = "<*>"
+
+# Tokens that are obviously parameters: numbers (with separators/units),
+# ids like #10045 / SKU-12345 / img123.jpg, hex, URLs and quoted values
+PARAM_PATTERN = re.compile(
+    r"^(?:"
+    r"[#$]?\d[\d,.:/%]*(?:ms|s|m|h|mb|gb|kb)?[.,;:)]?"  # 30s, 5,234ms, #10045, $149.99, 1/5
+    r"|\(?\d[\d,.:/%]*\)?"  # (position: 75)
+    r"|0x[0-9a-f]+|[0-9a-f]{12,}"  # hex ids
+    r"|[a-z]+[-_]\d[\w-]*"  # SKU-12345, TSHIRT-001
+    r"|https?://\S+"  # URLs
+    r"|[\"'].*[\"']"  # quoted values
+    r")$",
+    re.IGNORECASE,
+)
+
+# Two messages join the same template when at least this share of tokens match
+DEFAULT_SIMILARITY = 0.5
+# Distinct parameter samples kept per template
+MAX_SAMPLES = 3
+
+
+def is_parameter(token: str) -> bool:
+    return bool(PARAM_PATTERN.match(token))
+
+
+class LogTemplate:
+    """One mined template: the shared tokens plus how often and when it occurred."""
+
+    def __init__(self, level: int, tokens: list[str]):
+        self.level = level
+        self.tokens = tokens
+        self.count = 0
+        self.first_ts: Optional[int] = None
+        self.last_ts: Optional[int] = None
+        self.samples: list[list[str]] = []  # Wildcard values of a few member lines
+
+    @property
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+    @property
+    def example(self) -> str:
+        """The template with its wildcards filled from the first sample (a real line)."""
+        if not self.samples:
+            return self.template
+        values = iter(self.samples[0])
+        return " ".join(next(values, token) if token == WILDCARD else token for token in self.tokens)
+
+    def similarity(self, tokens: list[str]) -> float:
+        """Share of positions where the template token equals the message token (wildcards match)."""
+        same = sum(1 for mine, theirs in zip(self.tokens, tokens) if mine == theirs or mine == WILDCARD)
+        return same / len(tokens) if tokens else 1.0
+
+    def absorb(self, tokens: list[str], count: int, first_ts: int, last_ts: int):
+        """Merge a message into the template, widening differing positions to wildcards."""
+        self.tokens = [mine if mine == theirs else WILDCARD for mine, theirs in zip(self.tokens, tokens)]
+        self.count += count
+        self.first_ts = first_ts if self.first_ts is None else min(self.first_ts, first_ts)
+        self.last_ts = last_ts if self.last_ts is None else max(self.last_ts, last_ts)
+
+        values = [theirs for mine, theirs in zip(self.tokens, tokens) if mine == WILDCARD]
+        if values and values not in self.samples and len(self.samples) < MAX_SAMPLES:
+            self.samples.append(values)
+
+
+class TemplateMiner:
+    """
+    Fixed-depth Drain tree: messages are bucketed by (level, token count,
+    first token) and matched against the templates of their bucket only.
+    """
+
+    def __init__(self, similarity: float = DEFAULT_SIMILARITY):
+        self.similarity = similarity
+        self.buckets: dict[tuple[int, int, str], list[LogTemplate]] = {}
+        self.templates: list[LogTemplate] = []
+
+    def add(self, level: int, message: str, count: int = 1, first_ts: int = 0, last_ts: int = 0) -> LogTemplate:
+        """Add a message (seen `count` times) and return the template it joined."""
+        raw_tokens = message.split()
+        # Match on masked tokens; raw tokens are absorbed so samples keep real values
+        tokens = [WILDCARD if is_parameter(token) else token for token in raw_tokens]
+        key = (level, len(tokens), tokens[0] if tokens else "")
+        bucket = self.buckets.setdefault(key, [])
+
+        best, best_score = None, 0.0
+        for template in bucket:
+            score = template.similarity(tokens)
+            if score > best_score:
+                best, best_score = template, score
+
+        if best is None or best_score < self.similarity:
+            best = LogTemplate(level, tokens)
+            bucket.append(best)
+            self.templates.append(best)
+
+        best.absorb(raw_tokens, count, first_ts, last_ts)
+        return best
+
+
+def mine_templates(entries: Iterable[tuple[int, str, int, int, int]], similarity: float = DEFAULT_SIMILARITY) -> list[LogTemplate]:
+    """
+    Mine templates from (level, message, count, first_ts, last_ts) entries.
+    Returns templates ordered by first occurrence.
+    """
+    miner = TemplateMiner(similarity)
+    for level, message, count, first_ts, last_ts in entries:
+        miner.add(level, message, count, first_ts, last_ts)
+    return sorted(miner.templates, key=lambda t: (t.first_ts, t.level))
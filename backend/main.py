@@ -1,45 +1,52 @@
 # FastAPI backend for ticket system
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from typing import List, Optional
 from datetime import datetime
+from contextlib import asynccontextmanager
 from supabase import create_client
 from dotenv import load_dotenv
 import uuid
 import os
+import json
+import hashlib
+import asyncio
 import random
 
-# Import the agent router
+# Import the agent, log ingestion and job routers
 from router import router as agent_router
-
-# Available merchant IDs (from mock_db - headless e-commerce migration tickets)
-MERCHANT_IDS = [
-    "m_ecom_001",  # Products Not Displaying
-    "m_ecom_002",  # Variants Not Syncing
-    "m_ecom_003",  # Cart Abandonment
-    "m_ecom_004",  # Stripe Webhooks Not Received
-    "m_ecom_005",  # Inventory Mismatch
-    "m_ecom_006",  # Product Import Timeout
-    "m_ecom_007",  # Duplicate Webhooks
-    "m_ecom_008",  # Webhook SSL Failure
-    "m_ecom_009",  # Slow API Response
-    "m_ecom_010",  # CDN Cache Stale
-    "m_ecom_011",  # Login Session Not Persisting
-    "m_ecom_012",  # SSO Broken
-    "m_ecom_013",  # CMS Content Not Rendering
-    "m_ecom_014",  # Broken Image URLs
-    "m_ecom_015",  # Orders Not Syncing to Fulfillment
-    "m_ecom_016",  # Refund Processing Failing
-]
+from log_router import router as log_router
+from jobs_router import router as jobs_router, submit_analysis, submit_speculation, worker_pool
+from job_queue import PRIORITY_INTERACTIVE
+from mock_db import get_merchant_id_for_user, register_user_merchant
+from ticket_store import TicketStore
+from ticket_db import SQLiteTicketBackend
+from ticket_feed import TicketFeed
+from agent import stored_analysis
+from router import to_response
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="CypherCypher Ticket System", version="5.0")
 
-# Include the agent router
+# Start the analysis worker pool and the ticket feed with the app, stop them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ticket_feed.attach(asyncio.get_running_loop())
+    await worker_pool.start()
+    yield
+    await worker_pool.stop()
+    tickets.close()
+
+
+app = FastAPI(title="CypherCypher Ticket System", version="5.0", lifespan=lifespan)
+
+# Include the agent, log ingestion and job routers
 app.include_router(agent_router)
+app.include_router(log_router)
+app.include_router(jobs_router)
 
 # Supabase setup
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -53,10 +60,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Revision", "X-Next-Cursor", "X-Has-More"],
 )
 
-# In-memory storage for tickets
-tickets = []
+# Ticket store, indexed by id, merchant_id, status and email. Persisted to a
+# SQLite file (TICKET_DB_PATH, default ./data/tickets.sqlite3); set it empty to
+# keep tickets in memory only. Created after the Ticket model, below.
+TICKET_DB_PATH = os.getenv("TICKET_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tickets.sqlite3"))
 
 # Login model
 class LoginRequest(BaseModel):
@@ -87,12 +97,30 @@ class Ticket(BaseModel):
     status: str
     created_at: str
 
-# Assign a consistent merchant_id based on user email (so it's always the same for the same user)
-def get_merchant_id_for_user(email: str) -> str:
-    """Assign a merchant_id based on email hash - consistent for the same user."""
-    # Use hash of email to pick a merchant_id deterministically
-    index = hash(email) % len(MERCHANT_IDS)
-    return MERCHANT_IDS[index]
+# Ticket model for bulk imports: historical tickets keep their id, status and created_at when given
+# (created_at must be an ISO 8601 date-time; it is stored in canonical form, see ticket_timestamp)
+class TicketImport(BaseModel):
+    id: Optional[str] = None
+    title: str
+    description: str
+    email: str
+    merchant_id: Optional[str] = None
+    status: str = "open"
+    created_at: Optional[datetime] = None
+
+# created_at as new tickets get it (local time, datetime.isoformat()); listings and
+# cursors compare these strings, so every ticket must use the same form
+def ticket_timestamp(value: datetime) -> str:
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat()
+
+tickets = TicketStore(SQLiteTicketBackend(TICKET_DB_PATH) if TICKET_DB_PATH else None, model=Ticket)
+
+# Change feed: every ticket write is pushed to WebSocket subscribers (WS /tickets/feed)
+ticket_feed = TicketFeed()
+tickets.listeners.append(ticket_feed.publish)
+tickets.batch_listeners.append(ticket_feed.publish_import)
 
 # Login endpoint - checks Supabase for user and password
 @app.post("/login")
@@ -112,6 +140,7 @@ def login(request: LoginRequest):
         
         # Assign consistent merchant_id for this user
         merchant_id = get_merchant_id_for_user(user["email"])
+        register_user_merchant(user["email"], merchant_id)
         
         return {
             "success": True,
@@ -126,11 +155,17 @@ def login(request: LoginRequest):
     else:
         return {"success": False, "error": "User not found"}
 
-# Create a new ticket
+# Ticket text as the agent sees it (same layout as the frontend insight panel)
+def ticket_text_for(ticket: Ticket) -> str:
+    return f"{ticket.title}\n\n{ticket.description}\n\nSubmitted by: {ticket.email}"
+
+# Create a new ticket (and queue its speculative pre-analysis when SPECULATIVE_ANALYSIS is on)
 @app.post("/tickets", response_model=Ticket)
-def create_ticket(ticket: TicketCreate):
+async def create_ticket(ticket: TicketCreate):
     # Use provided merchant_id, or derive from email for consistency
     merchant_id = ticket.merchant_id or get_merchant_id_for_user(ticket.email)
+    if ticket.merchant_id:
+        register_user_merchant(ticket.email, ticket.merchant_id)
     
     new_ticket = Ticket(
         id=str(uuid.uuid4()),
@@ -141,13 +176,206 @@ def create_ticket(ticket: TicketCreate):
         status="open",
         created_at=datetime.now().isoformat()
     )
-    tickets.append(new_ticket)
+    await asyncio.to_thread(tickets.add, new_ticket)  # Returns once the ticket is committed
+    await submit_speculation(ticket_text_for(new_ticket), new_ticket.id, merchant_id=merchant_id, email=new_ticket.email)
     return new_ticket
 
-# Get all tickets
+# Page sizes for GET /tickets
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# List tickets, a page at a time, ordered by created_at
+# - Filters: status, merchant_id, email (served from the store's indexes)
+# - Pagination: pass the X-Next-Cursor response header back as ?cursor= (absent on the last page)
+# - ?since=N returns only tickets created or updated after store revision N (X-Revision header),
+#   oldest change first and at most `limit` of them; when more remain, X-Has-More is set and
+#   X-Revision is the revision to pass as the next ?since=
+# - ETag / If-None-Match: an unchanged store answers 304 without serializing anything
 @app.get("/tickets", response_model=List[Ticket])
-def get_tickets():
-    return tickets
+def get_tickets(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    merchant_id: Optional[str] = None,
+    email: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    since: Optional[int] = None,
+):
+    revision = tickets.get_revision()
+    # A delta's content only depends on the filters and the current revision, not on since=
+    params = sorted((k, v) for k, v in request.query_params.multi_items() if since is None or k != "since")
+    query = hashlib.sha1(str(params).encode()).hexdigest()[:12]
+    etag = f'W/"{revision}-{query}"'
+    headers = {"ETag": etag, "X-Revision": str(revision)}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    
+    if since is not None:
+        changed, resume = tickets.changes_since(since, limit, status=status, merchant_id=merchant_id, email=email)
+        if resume is not None:
+            # Partial delta: no ETag, since the client is not caught up with this revision yet
+            del response.headers["ETag"]
+            response.headers["X-Revision"] = str(resume)
+            response.headers["X-Has-More"] = "true"
+        return changed
+    try:
+        page, next_cursor = tickets.page(
+            cursor, limit, descending=order == "desc", status=status, merchant_id=merchant_id, email=email
+        )
+    except KeyError:
+        raise HTTPException(status_code=400, detail="Unknown cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return page
+
+# Live ticket changes over a WebSocket, instead of polling GET /tickets
+# - Filters: ?merchant_id= and/or ?status= (a ticket that leaves the filter is sent once more, with its new values)
+# - First message: {"type": "hello", "revision": N, "tickets": [...]}, where tickets are the
+#   changes after ?since= (empty without it); more than MAX_PAGE_SIZE changes send
+#   "resync": true and no tickets instead, and the client reloads the list
+# - Then {"type": "changes", "revision": N, "changes": [{"op": "create" | "update", "id", "revision", "fields"}]};
+#   creates carry the whole ticket, updates only the changed fields (the whole ticket when it
+#   just entered the filter); writes that land within ~100ms of each other arrive together,
+#   one entry per ticket
+# - A bulk import (POST /tickets/import) sends {"type": "import", "revision": N} instead of its
+#   tickets; the client fetches GET /tickets?since=<its last revision> to pick them up
+@app.websocket("/tickets/feed")
+async def ticket_feed_socket(
+    websocket: WebSocket,
+    merchant_id: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[int] = None,
+):
+    await websocket.accept()
+    # Subscribe before reading the backlog, so nothing falls between the two
+    subscriber = ticket_feed.subscribe(merchant_id=merchant_id, status=status)
+
+    async def push():
+        revision = await asyncio.to_thread(tickets.get_revision)
+        backlog, resume = ([], None) if since is None else await asyncio.to_thread(
+            tickets.changes_since, since, MAX_PAGE_SIZE, merchant_id=merchant_id, status=status
+        )
+        hello = {"type": "hello", "revision": revision, "tickets": [t.model_dump() for t in backlog]}
+        if resume is not None:
+            hello.update(tickets=[], resync=True)
+        await websocket.send_json(hello)
+        while True:
+            await websocket.send_json(await subscriber.next_message(ticket_feed.coalesce_seconds))
+
+    async def listen():
+        # Clients never need to send anything; reading only notices when they disconnect
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(push()), asyncio.create_task(listen())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                print(f"[Feed] Connection closed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        ticket_feed.unsubscribe(subscriber)
+
+# Bulk import/export sizes
+IMPORT_BATCH_SIZE = 5000
+EXPORT_BATCH_SIZE = 1000
+MAX_IMPORT_ERRORS = 20
+import_batch_adapter = TypeAdapter(List[TicketImport])
+
+# Validate one batch of NDJSON lines into tickets; returns (tickets, errors)
+def prepare_import_batch(lines: list[tuple[int, bytes]]) -> tuple[list[Ticket], list[dict]]:
+    errors = []
+    try:
+        # Fast path: the whole batch as one JSON array, validated in one call
+        parsed = import_batch_adapter.validate_json(b"[" + b",".join(raw for _, raw in lines) + b"]")
+        if len(parsed) != len(lines):
+            raise ValueError("Line count mismatch")
+    except (ValidationError, ValueError):
+        # Some line is bad: validate one by one to report it and keep the rest
+        parsed = []
+        for number, raw in lines:
+            try:
+                parsed.append(TicketImport.model_validate_json(raw))
+            except ValidationError as e:
+                errors.append({"line": number, "error": str(e.errors(include_url=False)[0]["msg"])})
+
+    now = datetime.now().isoformat()
+    batch = [
+        Ticket(
+            id=item.id or str(uuid.uuid4()),
+            title=item.title,
+            description=item.description,
+            email=item.email,
+            merchant_id=item.merchant_id or get_merchant_id_for_user(item.email),
+            status=item.status,
+            created_at=ticket_timestamp(item.created_at) if item.created_at else now,
+        )
+        for item in parsed
+    ]
+    return batch, errors
+
+# Bulk import tickets from an NDJSON body (one ticket object per line)
+# - The body is parsed as it arrives and inserted in batches, so memory stays bounded
+# - The next batch is validated while the previous one commits; batches are inserted in order
+# - A ticket with an existing id replaces it, so re-running an import is safe
+# - Bad lines are skipped and reported by line number; imported tickets are not pre-analyzed
+@app.post("/tickets/import")
+async def import_tickets(request: Request):
+    imported = 0
+    errors = []
+    lines: list[tuple[int, bytes]] = []
+    line_number = 0
+    buffer = b""
+    inserting = None  # Insert of the previous batch, still committing
+
+    async def flush():
+        nonlocal imported, inserting, lines
+        batch, batch_errors = await asyncio.to_thread(prepare_import_batch, lines)
+        lines = []
+        errors.extend(batch_errors)
+        if inserting is not None:
+            await inserting
+        inserting = asyncio.ensure_future(asyncio.to_thread(tickets.add_many, batch, keep_bodies=False))
+        imported += len(batch)
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for raw in complete:
+            line_number += 1
+            if raw.strip():
+                lines.append((line_number, raw))
+        if len(lines) >= IMPORT_BATCH_SIZE:
+            await flush()
+    if buffer.strip():
+        lines.append((line_number + 1, buffer))
+    if lines:
+        await flush()
+    if inserting is not None:
+        await inserting
+
+    print(f"[Tickets] Imported {imported} tickets ({len(errors)} bad lines)")
+    return {
+        "imported": imported,
+        "failed": len(errors),
+        "errors": errors[:MAX_IMPORT_ERRORS],
+        "revision": tickets.get_revision(),
+    }
+
+# Export tickets as NDJSON, streamed a batch at a time (same filters as GET /tickets)
+@app.get("/tickets/export")
+def export_tickets(status: Optional[str] = None, merchant_id: Optional[str] = None, email: Optional[str] = None):
+    def lines():
+        for rows in tickets.export(EXPORT_BATCH_SIZE, status=status, merchant_id=merchant_id, email=email):
+            yield "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 # Model for updating ticket status
 class TicketUpdate(BaseModel):
@@ -156,37 +384,44 @@ class TicketUpdate(BaseModel):
 # Update ticket status
 @app.patch("/tickets/{ticket_id}")
 def update_ticket(ticket_id: str, update: TicketUpdate):
-    for i, ticket in enumerate(tickets):
-        if ticket.id == ticket_id:
-            # Create updated ticket with new status
-            updated = Ticket(
-                id=ticket.id,
-                title=ticket.title,
-                description=ticket.description,
-                email=ticket.email,
-                merchant_id=ticket.merchant_id,
-                status=update.status,
-                created_at=ticket.created_at
-            )
-            tickets[i] = updated
-            return updated
-    return {"error": "Ticket not found"}
-
-# Ask AI endpoint - receives ticket data
-@app.post("/ask-ai/{ticket_id}")
-def ask_ai(ticket_id: str):
+    updated = tickets.update(ticket_id, status=update.status)
+    if updated is None:
+        return {"error": "Ticket not found"}
+    return updated
+
+# Ask AI endpoint - answers from the ticket's stored analysis while it is current;
+# otherwise queues an analysis job and returns at once (poll GET /jobs/{job_id}?wait=20)
+@app.post("/ask-ai/{ticket_id}", status_code=202)
+async def ask_ai(ticket_id: str, response: Response):
     # Find the ticket
-    for ticket in tickets:
-        if ticket.id == ticket_id:
-            # Return ticket data (you can add AI integration here later)
-            return {
-                "ticket_id": ticket.id,
-                "title": ticket.title,
-                "description": ticket.description,
-                "status": ticket.status,
-                "message": "Ticket data received by AI endpoint"
-            }
-    return {"error": "Ticket not found"}
+    ticket = await asyncio.to_thread(tickets.get, ticket_id)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+
+    stored = await asyncio.to_thread(
+        stored_analysis, ticket.id, ticket_text_for(ticket), ticket.merchant_id, ticket.email
+    )
+    if stored is not None:
+        response.status_code = 200
+        return {
+            "ticket_id": ticket.id,
+            "status": "done",
+            "result": to_response(stored).model_dump(),
+            "message": "Served from stored analysis"
+        }
+    job_id = await submit_analysis(
+        ticket_text_for(ticket),
+        merchant_id=ticket.merchant_id,
+        email=ticket.email,
+        ticket_id=ticket.id,
+        priority=PRIORITY_INTERACTIVE,
+    )
+    return {
+        "ticket_id": ticket.id,
+        "job_id": job_id,
+        "status": "queued",
+        "message": "Analysis queued"
+    }
 
 # Health check
 @app.get("/")
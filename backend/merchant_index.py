@@ -0,0 +1,142 @@
+# Merchant ID alias index
+# Resolves loosely formatted merchant IDs ("123", "M-ECOM-7", "ecom_007")
+# to known merchant keys with hash lookups built once at load time, and
+# extracts merchant ID candidates from ticket text in one regex pass
+
+import re
+from typing import NamedTuple, Optional
+
+# Runs of digits, used to drop leading zeros ("007" -> "7")
+DIGITS_PATTERN = re.compile(r"\d+")
+SEPARATOR_PATTERN = re.compile(r"[\s\-]+")
+
+# All ways a merchant ID shows up in a ticket, as one alternation.
+# Group order is also rank order: a literal m_XXX beats "merchant: XXX",
+# which beats a generic "id/account/customer: XXX". The leading lookahead
+# on the possible first letters lets the regex engine skip most positions
+# without trying the three branches. The separator is captured to tell an
+# explicit label ("merchant: acme") from prose ("merchant is down").
+EXTRACT_PATTERN = re.compile(
+    r"(?=[maci])(?:"
+    r"\b(?P<direct>m_(?:[a-z]+_)?\d+)\b"
+    r"|\bmerchant\s*(?:id)?(?P<labelled_sep>[:\s#]+)(?P<labelled>[a-z0-9_-]+)"
+    r"|\b(?:id|account|customer)(?P<generic_sep>[:\s=#]+)(?P<generic>[a-z0-9_-]+)"
+    r")",
+    re.IGNORECASE,
+)
+STRATEGY_RANK = {"direct": 0, "labelled": 1, "generic": 2}
+
+
+def canonical_merchant_id(raw_id: str) -> str:
+    """
+    Normalize a merchant ID for alias matching.
+    Lowercases, turns '-' and spaces into '_', drops the "m_" prefix and
+    strips leading zeros from numeric parts: "M-ECOM-007" -> "ecom_7".
+    """
+    value = raw_id.strip().strip("\"'`").lower()
+    value = SEPARATOR_PATTERN.sub("_", value)
+    if value.startswith("m_"):
+        value = value[2:]
+    if "0" not in value:
+        return value  # No leading zeros to strip
+    return DIGITS_PATTERN.sub(lambda m: str(int(m.group())), value)
+
+
+class MerchantMatch(NamedTuple):
+    """Result of resolving a merchant ID against the alias index."""
+    merchant_id: Optional[str]  # Resolved key, None if not found or ambiguous
+    candidates: list[str]  # Every key the input could refer to
+
+    @property
+    def ambiguous(self) -> bool:
+        return len(self.candidates) > 1
+
+
+class MerchantIdIndex:
+    """
+    Hash maps from merchant ID aliases to known merchant keys.
+
+    Every key is registered under its exact form and under the canonical
+    form of each of its '_'-separated suffixes, so "m_ecom_007" answers to
+    "ecom_007", "ecom_7", "007" and "7". Lookups cost O(len(id)).
+    """
+
+    def __init__(self, merchant_ids=()):
+        self.exact: set[str] = set()
+        self.aliases: dict[str, list[str]] = {}
+        for merchant_id in merchant_ids:
+            self.add(merchant_id)
+
+    def add(self, merchant_id: str):
+        """Register a merchant key and all of its aliases."""
+        if merchant_id in self.exact:
+            return
+        self.exact.add(merchant_id)
+
+        parts = canonical_merchant_id(merchant_id).split("_")
+        for start in range(len(parts)):
+            alias = "_".join(parts[start:])
+            self.aliases.setdefault(alias, []).append(merchant_id)
+
+    def resolve(self, raw_id: str) -> MerchantMatch:
+        """Resolve a raw merchant ID. Ambiguous aliases return every candidate and no match."""
+        if not raw_id or not raw_id.strip():
+            return MerchantMatch(None, [])
+
+        normalized = raw_id.strip().lower()
+        if normalized in self.exact:
+            return MerchantMatch(normalized, [normalized])
+
+        candidates = self.aliases.get(canonical_merchant_id(raw_id), [])
+        if len(candidates) == 1:
+            return MerchantMatch(candidates[0], list(candidates))
+        return MerchantMatch(None, sorted(candidates))
+
+
+class ExtractedId(NamedTuple):
+    """A merchant ID found in ticket text."""
+    merchant_id: str  # Known key when validated, else the normalized raw value
+    raw: str  # Text as it appeared in the ticket
+    strategy: str  # "direct", "labelled" or "generic"
+    known: bool  # Resolved to a known merchant
+
+    @property
+    def plausible(self) -> bool:
+        """Known, or shaped like an ID (has a digit); an unknown bare word is only a hint."""
+        return self.known or any(ch.isdigit() for ch in self.merchant_id)
+
+
+def extract_merchant_ids(text: str, index: MerchantIdIndex) -> list[ExtractedId]:
+    """
+    Find merchant ID candidates in one pass over the text, ranked best first.
+
+    A literal m_XXX comes first, known or not: the ticket names that ID
+    outright, so an alias like "id: 7" must not override it. Then known
+    merchants, then unknown values with digits, then unknown values without
+    digits (see ExtractedId.plausible), each by strategy (labelled >
+    generic) and position. A labelled/generic value without digits is only
+    kept after an explicit ':', '#' or '=' label, so "merchant is down"
+    does not yield "is".
+    """
+    ranked = []
+    seen = set()
+    for position, match in enumerate(EXTRACT_PATTERN.finditer(text)):
+        strategy = match.lastgroup
+        raw = match.group(strategy)
+        resolved = index.resolve(raw)
+        has_digit = any(ch.isdigit() for ch in raw)
+        if resolved.merchant_id:
+            merchant_id, known = resolved.merchant_id, True
+        elif strategy == "direct" or has_digit or any(ch in ":#=" for ch in match.group(f"{strategy}_sep")):
+            merchant_id, known = (f"m_{raw}" if raw.isdigit() else raw.lower()), False
+        else:
+            continue
+        if merchant_id in seen:
+            continue
+        seen.add(merchant_id)
+        rank = (strategy != "direct", not known, not has_digit, STRATEGY_RANK[strategy], position)
+        ranked.append((rank, ExtractedId(merchant_id, raw, strategy, known)))
+
+    if len(ranked) > 1:
+        ranked.sort(key=lambda item: item[0])
+    return [candidate for _, candidate in ranked]
@@ -0,0 +1,222 @@
+# Local fuzzy merchant resolver
+# Fallback for tickets where the regex extractor finds no merchant ID.
+# Combines the submitter's email mapping, edit distance to known IDs and
+# n-gram overlap with each merchant's log vocabulary, so the LLM is only
+# asked when none of these is confident enough. Scoring is CPU-bound: async
+# callers run it in a worker thread.
+
+import re
+import math
+import threading
+from typing import Callable, NamedTuple, Optional
+
+from doc_index import STOPWORDS, tokenize
+from merchant_index import MerchantIdIndex, canonical_merchant_id
+
+# Below this confidence the agent escalates to the LLM
+LOCAL_CONFIDENCE_THRESHOLD = 0.6
+
+# Confidence given to a known submitter -> merchant account mapping
+EMAIL_CONFIDENCE = 0.9
+# Max edits between a ticket token and a known ID to count as a typo
+MAX_EDIT_DISTANCE = 2
+
+# Ticket tokens that could be a mistyped ID: contain a digit, 2+ chars
+ID_LIKE_PATTERN = re.compile(r"\b[a-z_-]*\d[\w-]*\b", re.IGNORECASE)
+
+# Submitter email embedded in ticket text ("Submitted by: jane@shop.com"); other
+# addresses in the text (customers, CCs) say nothing about whose account it is
+SUBMITTER_PATTERN = re.compile(r"Submitted by:\s*([\w.+-]+@[\w-]+\.[\w.-]+)", re.IGNORECASE)
+
+
+class LocalResolution(NamedTuple):
+    """Best local guess for a ticket's merchant."""
+    merchant_id: Optional[str]
+    confidence: float
+    method: str  # "email", "edit_distance", "log_vocabulary" or "none"
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up (returns limit + 1) once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def ngrams(text: str) -> set[str]:
+    """Word unigrams and bigrams, minus stopwords and bare numbers."""
+    words = [w for w in tokenize(text) if w not in STOPWORDS and not w.isdigit()]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+class LocalMerchantResolver:
+    """
+    Resolves a ticket to a merchant without calling the LLM.
+
+    The log vocabulary (n-grams of each merchant's distinct log messages) is
+    cached per merchant; when the log store's version changes, only merchants
+    whose log high-water mark moved are re-read. email_lookup must return a
+    merchant only for a known user -> merchant mapping (None otherwise).
+    Counters for local hits vs LLM escalations are kept for /agent/stats.
+    """
+
+    def __init__(
+        self,
+        merchant_index: MerchantIdIndex,
+        merchant_messages: Callable[[str], list[str]],
+        store_version: Callable[[], int],
+        email_lookup: Optional[Callable[[str], Optional[str]]] = None,
+        threshold: float = LOCAL_CONFIDENCE_THRESHOLD,
+        merchant_version: Optional[Callable[[str], int]] = None,
+    ):
+        self.merchant_index = merchant_index
+        self.merchant_messages = merchant_messages
+        self.store_version = store_version
+        self.email_lookup = email_lookup
+        self.threshold = threshold
+        self.merchant_version = merchant_version
+
+        self._vocab_lock = threading.Lock()
+        self._vocab_version = None
+        self._vocab: dict[str, set[str]] = {}
+        self._merchant_versions: dict[str, int] = {}  # merchant -> high-water mark its vocabulary was built at
+        self._df: dict[str, int] = {}  # n-gram -> merchants whose logs contain it
+        self._idf: dict[str, float] = {}
+        self._known: list[tuple[str, str]] = []  # (canonical ID, merchant ID), for edit distance
+
+        self.local_resolved = 0
+        self.llm_escalations = 0
+
+    def _refresh_vocabulary(self):
+        version = self.store_version()
+        if version == self._vocab_version:
+            return
+        with self._vocab_lock:
+            if version == self._vocab_version:
+                return
+            # Copy-on-write, so scoring threads keep a consistent snapshot
+            vocab = dict(self._vocab)
+            changed = False
+            for merchant_id in sorted(self.merchant_index.exact):
+                merchant_version = self.merchant_version(merchant_id) if self.merchant_version else version
+                if self._merchant_versions.get(merchant_id) == merchant_version:
+                    continue
+                grams = ngrams("\n".join(self.merchant_messages(merchant_id)))
+                for gram in vocab.get(merchant_id, ()):
+                    self._df[gram] -= 1
+                    if not self._df[gram]:
+                        del self._df[gram]
+                for gram in grams:
+                    self._df[gram] = self._df.get(gram, 0) + 1
+                vocab[merchant_id] = grams
+                self._merchant_versions[merchant_id] = merchant_version
+                changed = True
+            if changed:
+                n = max(len(vocab), 1)
+                self._vocab, self._idf = vocab, {gram: math.log(1 + n / count) for gram, count in self._df.items()}
+            self._vocab_version = version
+
+    def _known_ids(self) -> list[tuple[str, str]]:
+        """Canonical forms of the known IDs, recomputed only when merchants are added."""
+        if len(self._known) != len(self.merchant_index.exact):
+            self._known = [(canonical_merchant_id(m), m) for m in sorted(self.merchant_index.exact)]
+        return self._known
+
+    def by_email(self, email: Optional[str], ticket_text: str = "") -> LocalResolution:
+        """
+        Merchant account of the submitter: the given email, else the ticket's
+        "Submitted by:" address. Only a known user -> merchant mapping counts.
+        """
+        if not email:
+            found = SUBMITTER_PATTERN.search(ticket_text)
+            email = found.group(1) if found else None
+        merchant_id = self.email_lookup(email) if email and self.email_lookup else None
+        if merchant_id and merchant_id in self.merchant_index.exact:
+            return LocalResolution(merchant_id, EMAIL_CONFIDENCE, "email")
+        return LocalResolution(None, 0.0, "none")
+
+    def by_edit_distance(self, ticket_text: str) -> LocalResolution:
+        """Match ID-like tokens against known IDs, tolerating a couple of typos."""
+        best = LocalResolution(None, 0.0, "none")
+        known_ids = self._known_ids()
+        for token in set(ID_LIKE_PATTERN.findall(ticket_text)):
+            candidate = canonical_merchant_id(token)
+            if len(candidate) < 3:
+                continue
+            scored = []
+            for known, merchant_id in known_ids:
+                if abs(len(known) - len(candidate)) > MAX_EDIT_DISTANCE:
+                    continue
+                distance = edit_distance(candidate, known, MAX_EDIT_DISTANCE)
+                if distance <= MAX_EDIT_DISTANCE:
+                    scored.append((distance, merchant_id, known))
+            if not scored:
+                continue
+            scored.sort()
+            distance, merchant_id, known = scored[0]
+            if len(scored) > 1 and scored[1][0] == distance:
+                continue  # Tie between two known IDs: not a usable signal
+            confidence = 1 - distance / max(len(known), len(candidate))
+            if confidence > best.confidence:
+                best = LocalResolution(merchant_id, confidence, "edit_distance")
+        return best
+
+    def by_log_vocabulary(self, ticket_text: str) -> LocalResolution:
+        """
+        Score each merchant by the IDF-weighted share of the ticket's n-grams
+        that also appear in its logs. Confidence is the best share, discounted
+        by how close the runner-up is.
+        """
+        self._refresh_vocabulary()
+        vocabulary, idf = self._vocab, self._idf
+        grams = ngrams(ticket_text)
+        # N-grams no merchant logs get the highest IDF, so off-topic text dilutes the share
+        unseen_idf = math.log(1 + max(len(vocabulary), 1))
+        total = sum(idf.get(g, unseen_idf) for g in grams)
+        grams = {g for g in grams if g in idf}
+        if not grams:
+            return LocalResolution(None, 0.0, "none")
+
+        scores = sorted(
+            ((sum(idf[g] for g in grams & vocab) / total, merchant_id) for merchant_id, vocab in vocabulary.items()),
+            reverse=True,
+        )
+        best_score, merchant_id = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else 0.0
+        if best_score <= 0:
+            return LocalResolution(None, 0.0, "none")
+        # Full share with no competitor -> 1.0; a close runner-up drags it down
+        confidence = min(1.0, 2 * best_score) * (1 - runner_up / best_score)
+        return LocalResolution(merchant_id, confidence, "log_vocabulary")
+
+    def resolve(self, ticket_text: str, email: Optional[str] = None) -> LocalResolution:
+        """Best local resolution across all methods (not yet counted in stats)."""
+        best = LocalResolution(None, 0.0, "none")
+        for resolution in (self.by_email(email, ticket_text), self.by_edit_distance(ticket_text), self.by_log_vocabulary(ticket_text)):
+            if resolution.confidence > best.confidence:
+                best = resolution
+            if best.confidence >= EMAIL_CONFIDENCE:
+                break
+        return best
+
+    def record(self, escalated: bool):
+        if escalated:
+            self.llm_escalations += 1
+        else:
+            self.local_resolved += 1
+
+    def get_stats(self) -> dict:
+        attempts = self.local_resolved + self.llm_escalations
+        return {
+            "local_resolved": self.local_resolved,
+            "llm_escalations": self.llm_escalations,
+            "llm_skip_rate": f"{(self.local_resolved / attempts * 100):.1f}%" if attempts > 0 else "N/A",
+        }
@@ -2,6 +2,16 @@
 # Contains simulated merchant logs and documentation snippets
 # Context: E-commerce platform transitioning from fully-hosted to headless architecture
 
+import os
+import hashlib
+from typing import Optional
+
+from doc_index import DocIndex, chunk_document
+from merchant_index import ExtractedId, MerchantIdIndex, MerchantMatch, extract_merchant_ids
+from log_store import MerchantLogStore
+from log_templates import LogTemplate
+from merchant_resolver import LocalMerchantResolver
+
 # Merchant logs keyed by merchant_id
 # Simulates real-world error logs from merchants migrating to headless e-commerce
 logs = {
@@ -167,6 +177,45 @@ logs = {
     ],
 }
 
+# Merchant IDs assigned to user accounts (headless e-commerce migration tickets)
+MERCHANT_IDS = [
+    "m_ecom_001",  # Products Not Displaying
+    "m_ecom_002",  # Variants Not Syncing
+    "m_ecom_003",  # Cart Abandonment
+    "m_ecom_004",  # Stripe Webhooks Not Received
+    "m_ecom_005",  # Inventory Mismatch
+    "m_ecom_006",  # Product Import Timeout
+    "m_ecom_007",  # Duplicate Webhooks
+    "m_ecom_008",  # Webhook SSL Failure
+    "m_ecom_009",  # Slow API Response
+    "m_ecom_010",  # CDN Cache Stale
+    "m_ecom_011",  # Login Session Not Persisting
+    "m_ecom_012",  # SSO Broken
+    "m_ecom_013",  # CMS Content Not Rendering
+    "m_ecom_014",  # Broken Image URLs
+    "m_ecom_015",  # Orders Not Syncing to Fulfillment
+    "m_ecom_016",  # Refund Processing Failing
+]
+
+# Assign a consistent merchant_id based on user email (so it's always the same for the same user)
+def get_merchant_id_for_user(email: str) -> str:
+    """Assign a merchant_id based on email hash - consistent for the same user."""
+    # Stable digest (not the per-process salted hash()) so every worker and restart agrees
+    index = int(hashlib.sha256(email.lower().encode()).hexdigest(), 16) % len(MERCHANT_IDS)
+    return MERCHANT_IDS[index]
+
+# Known user -> merchant accounts (recorded at login and when a ticket names its
+# merchant); the only email mappings the local merchant resolver trusts
+user_merchants: dict[str, str] = {}
+
+def register_user_merchant(email: str, merchant_id: str):
+    """Record the merchant account a user belongs to."""
+    user_merchants[email.lower()] = merchant_id
+
+def lookup_user_merchant(email: str) -> Optional[str]:
+    """Merchant account of a known user, or None."""
+    return user_merchants.get(email.lower())
+
 # Documentation snippets for RAG-style search
 # These simulate internal knowledge base articles for headless e-commerce migration
 docs = [
@@ -588,45 +637,141 @@ docs = [
     Stripe migration guide: https://stripe.com/docs/payments/payment-intents/migration""",
 ]
 
+# Columnar log store. With LOG_SEGMENTS_DIR set, logs live in mmap'd segment
+# files on disk (seeded from the dict above on first run); otherwise the seed
+# lines are parsed into memory exactly once at load time.
+LOG_SEGMENTS_DIR = os.getenv("LOG_SEGMENTS_DIR")
+if LOG_SEGMENTS_DIR:
+    log_store = MerchantLogStore.open(LOG_SEGMENTS_DIR)
+    if not log_store.segment_dir.segments:
+        for _merchant_id, _lines in logs.items():
+            log_store.extend(_merchant_id, _lines)
+        log_store.flush()
+else:
+    log_store = MerchantLogStore()
+    for _merchant_id, _lines in logs.items():
+        log_store.extend(_merchant_id, _lines)
+
+# Alias index over merchant IDs, built once at load time
+merchant_index = MerchantIdIndex(log_store.merchant_ids())
+
+# Helper function to resolve a loosely formatted merchant ID
+def resolve_merchant_id(merchant_id: str) -> MerchantMatch:
+    """Resolve a merchant ID ("123", "M-ECOM-7", ...) to a known key, reporting ambiguity."""
+    return merchant_index.resolve(merchant_id)
+
+# Helper function to pull merchant IDs out of ticket text
+def extract_merchant_id(text: str) -> Optional[ExtractedId]:
+    """Best merchant ID candidate in the text (literal m_ IDs, then known merchants), or None."""
+    candidates = extract_merchant_ids(text, merchant_index)
+    return candidates[0] if candidates else None
+
 # Helper function to get logs for a merchant
-def get_merchant_logs(merchant_id: str) -> list[str]:
-    """Retrieve logs for a specific merchant ID. Handles various ID formats."""
+def get_merchant_logs(
+    merchant_id: str,
+    levels: Optional[list[str]] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    newest: Optional[int] = None,
+    collapse: bool = False,
+) -> list[str]:
+    """
+    Retrieve logs for a specific merchant ID. Handles various ID formats.
+    Optional filters: levels (e.g. ["ERROR", "WARN"]), since/until (epoch
+    seconds) and newest (keep only the newest N lines). With collapse=True,
+    repeated and parameter-only-different lines come back as one template
+    line each, with a repeat count and sample values.
+    """
     if not merchant_id:
         return []
     
-    # Normalize the merchant ID
-    merchant_id = merchant_id.strip().lower()
-    
-    # Direct match
-    if merchant_id in logs:
-        return logs[merchant_id]
-    
-    # Try with m_ prefix if not present
-    if not merchant_id.startswith("m_"):
-        prefixed_id = f"m_{merchant_id}"
-        if prefixed_id in logs:
-            return logs[prefixed_id]
-    
-    # Try without m_ prefix if present
-    if merchant_id.startswith("m_"):
-        unprefixed_id = merchant_id[2:]
-        for key in logs:
-            if key.endswith(unprefixed_id):
-                return logs[key]
-    
-    # Partial match (e.g., "123" matches "m_123")
-    for key in logs:
-        if merchant_id in key or key in merchant_id:
-            return logs[key]
-    
-    return []
+    match = merchant_index.resolve(merchant_id)
+    if match.merchant_id is None:
+        return []
+    rows = log_store.select(match.merchant_id, levels=levels, since=since, until=until, newest=newest)
+    if collapse:
+        return log_store.format_templates(log_store.templates(rows))
+    return log_store.format(rows)
+
+# Helper function to mine log templates for a merchant
+def get_merchant_log_templates(merchant_id: str, levels: Optional[list[str]] = None) -> list[LogTemplate]:
+    """Drain-style templates of a merchant's logs, ordered by first occurrence."""
+    match = merchant_index.resolve(merchant_id) if merchant_id else None
+    if not match or match.merchant_id is None:
+        return []
+    return log_store.templates(log_store.select(match.merchant_id, levels=levels))
+
+# Seal the in-memory tail to a segment once it holds this many rows (LOG_SEGMENTS_DIR only)
+LOG_FLUSH_ROWS = int(os.getenv("LOG_FLUSH_ROWS", "50000"))
+
+# Helper function to append freshly ingested log lines
+def append_merchant_logs(batch: dict[str, list[str]]) -> int:
+    """
+    Append raw log lines for one or more merchants to the log store.
+    New merchants become resolvable immediately. Returns the number of rows added.
+    """
+    added = log_store.extend_batch(batch)
+    for merchant_id in batch:
+        merchant_index.add(merchant_id)
+    if log_store.segment_dir and log_store.tail_rows >= LOG_FLUSH_ROWS:
+        log_store.flush()
+    return added
+
+# Helper function to get the distinct log messages of a merchant
+def get_merchant_log_messages(merchant_id: str, levels: Optional[list[str]] = None) -> list[str]:
+    """Distinct messages (no timestamp/level) in a merchant's logs, optionally filtered by level."""
+    match = merchant_index.resolve(merchant_id) if merchant_id else None
+    if not match or match.merchant_id is None:
+        return []
+    rows = log_store.select(match.merchant_id, levels=levels)
+    return log_store.unique_messages(rows)
+
+# Helper function to get a merchant's log high-water mark
+def get_merchant_log_high_water(merchant_id: Optional[str]) -> int:
+    """Number of log rows stored for a merchant (0 if unknown); grows whenever logs are appended."""
+    match = merchant_index.resolve(merchant_id) if merchant_id else None
+    if not match or match.merchant_id is None:
+        return 0
+    return log_store.row_count(match.merchant_id)
+
+# Local fallback for tickets without a usable merchant ID (email, typo and log
+# vocabulary matching); the agent only asks the LLM when this is not confident
+merchant_resolver = LocalMerchantResolver(
+    merchant_index,
+    get_merchant_log_messages,
+    lambda: log_store.version,
+    lookup_user_merchant,
+    merchant_version=get_merchant_log_high_water,
+)
+
+# Inverted index over the docs, built once at load time
+doc_index = DocIndex(docs)
+
+# Content hash of the doc corpus; stored analyses record it and are refreshed when it changes
+docs_version = hashlib.sha256("\x1f".join(docs).encode("utf-8")).hexdigest()[:16]
+
+# Section-level passages of every doc, indexed separately so prompts only carry
+# the parts of an article that match the ticket. passage_doc_ids maps back to docs.
+passages: list[str] = []
+passage_doc_ids: list[int] = []
+for _doc_id, _doc in enumerate(docs):
+    for _passage in chunk_document(_doc):
+        passages.append(_passage)
+        passage_doc_ids.append(_doc_id)
+passage_index = DocIndex(passages)
 
 # Helper function to search docs by keyword
 def search_docs(query: str) -> list[str]:
-    """Simple keyword-based document search."""
-    query_lower = query.lower()
-    results = []
-    for doc in docs:
-        if query_lower in doc.lower():
-            results.append(doc)
-    return results
+    """Keyword search: docs containing the query (case-insensitive substring), served from the index."""
+    return [docs[doc_id] for doc_id in doc_index.find_substring(query)]
+
+# Helper function to turn text into passage-index term counts, so partial queries
+# (ticket text, log lines) can be counted separately and ranked together later
+def passage_term_counts(text: str):
+    """Query term counts of the text over the passage index vocabulary (NumPy vector)."""
+    return passage_index.term_counts(text)
+
+# Helper function to rank doc passages from summed term counts
+def rank_passages_by_counts(counts, top_k: int = 5) -> list[tuple[str, float]]:
+    """BM25 ranking of every doc section from passage_term_counts() vectors. Returns (passage, score) pairs."""
+    return [(passages[pid], score) for pid, score in passage_index.rank_counts(counts, top_k=top_k)]
@@ -1,13 +1,18 @@
 # FastAPI Router for Agent Insight Engine
 # Provides the /analyze endpoint for ticket analysis
 
+import os
+import json
+import time
 import traceback
 import subprocess
 from datetime import datetime
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
-from agent import analyze_ticket
+from agent import analyze_ticket, analyze_batch, stream_analysis, response_cache, duplicate_index, analysis_store
+from mock_db import merchant_resolver
 
 # Create router instance
 router = APIRouter(prefix="/agent", tags=["Agent Insight Engine"])
@@ -60,6 +65,8 @@ class AnalyzeRequest(BaseModel):
     """Request model for ticket analysis."""
     ticket_text: str
     merchant_id: Optional[str] = None  # Optional: can be passed from ticket metadata
+    email: Optional[str] = None  # Optional: submitter email, helps resolve the merchant locally
+    ticket_id: Optional[str] = None  # Optional: serves/refreshes the ticket's stored analysis
 
 
 class AnalyzeResponse(BaseModel):
@@ -74,6 +81,46 @@ class AnalyzeResponse(BaseModel):
     steps_log: list[str]
 
 
+# Default cap on concurrent Gemini calls for a batch, the most a request may
+# ask for, and the largest batch accepted
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+MAX_BATCH_LLM_CONCURRENCY = int(os.getenv("MAX_BATCH_LLM_CONCURRENCY", "16"))
+MAX_BATCH_TICKETS = 500
+
+
+class BatchTicket(BaseModel):
+    """One ticket of a batch analysis."""
+    id: Optional[str] = None  # Echoed back so results can be matched to tickets
+    ticket_text: str
+    merchant_id: Optional[str] = None
+    email: Optional[str] = None
+
+
+class BatchAnalyzeRequest(BaseModel):
+    """Request model for batch analysis."""
+    tickets: list[BatchTicket]
+    concurrency: Optional[int] = None  # Max concurrent Gemini calls (default BATCH_LLM_CONCURRENCY, capped at MAX_BATCH_LLM_CONCURRENCY)
+
+
+def to_response(result: dict) -> AnalyzeResponse:
+    """Build the API response from the agent's final state."""
+    return AnalyzeResponse(
+        ticket_text=result["ticket_text"],
+        merchant_id=result.get("merchant_id"),
+        logs_found=result.get("logs_found", []),
+        relevant_docs=result.get("relevant_docs", []),
+        diagnosis=result.get("diagnosis", ""),
+        confidence_score=result.get("confidence_score", 0.0),
+        recommended_action=result.get("recommended_action", ""),
+        steps_log=result.get("steps_log", [])
+    )
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @router.post("/analyze", response_model=AnalyzeResponse)
 async def analyze(request: AnalyzeRequest):
     """
@@ -88,7 +135,6 @@ async def analyze(request: AnalyzeRequest):
     The steps_log field contains a chronological list of actions
     taken by the agent, suitable for displaying in a UI timeline.
     """
-    import time
     start_time = time.time()
     
     if not request.ticket_text.strip():
@@ -102,22 +148,14 @@ async def analyze(request: AnalyzeRequest):
     
     try:
         # Run the agent analysis (pass merchant_id if provided)
-        result = analyze_ticket(request.ticket_text, merchant_id=request.merchant_id)
+        result = await analyze_ticket(request.ticket_text, merchant_id=request.merchant_id, email=request.email,
+                                      ticket_id=request.ticket_id)
         
         # Log successful request
         duration_ms = (time.time() - start_time) * 1000
         request_log.log_request(request.ticket_text, success=True, duration_ms=duration_ms)
         
-        return AnalyzeResponse(
-            ticket_text=result["ticket_text"],
-            merchant_id=result.get("merchant_id"),
-            logs_found=result.get("logs_found", []),
-            relevant_docs=result.get("relevant_docs", []),
-            diagnosis=result.get("diagnosis", ""),
-            confidence_score=result.get("confidence_score", 0.0),
-            recommended_action=result.get("recommended_action", ""),
-            steps_log=result.get("steps_log", [])
-        )
+        return to_response(result)
     except Exception as e:
         # Log failed request
         duration_ms = (time.time() - start_time) * 1000
@@ -135,6 +173,118 @@ async def analyze(request: AnalyzeRequest):
         )
 
 
+@router.post("/analyze/stream")
+async def analyze_stream(request: AnalyzeRequest):
+    """
+    Streaming variant of /analyze using Server-Sent Events.
+    
+    Events (data is JSON):
+    - step:   {"step": "..."} each steps_log entry as its node completes
+    - token:  {"text": "..."} recommended_action text as Gemini generates it
+    - reset:  {} a rate-limit retry restarted the answer; clear streamed tokens
+    - result: the full AnalyzeResponse, last
+    - error:  {"detail": "..."} if the analysis failed
+    """
+    if not request.ticket_text.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="ticket_text cannot be empty"
+        )
+    
+    print(f"[Analyze/Stream] Received merchant_id: {request.merchant_id}")
+    
+    async def events():
+        start_time = time.time()
+        try:
+            async for event, payload in stream_analysis(request.ticket_text, merchant_id=request.merchant_id,
+                                                        email=request.email, ticket_id=request.ticket_id):
+                if event == "step":
+                    yield sse_event("step", {"step": payload})
+                elif event == "token":
+                    yield sse_event("token", {"text": payload})
+                elif event == "reset":
+                    yield sse_event("reset", {})
+                else:
+                    yield sse_event("result", to_response(payload).model_dump())
+            request_log.log_request(request.ticket_text, success=True, duration_ms=(time.time() - start_time) * 1000)
+        except Exception as e:
+            request_log.log_request(request.ticket_text, success=False, duration_ms=(time.time() - start_time) * 1000)
+            print("=" * 50)
+            print("AGENT ANALYSIS ERROR:")
+            print("=" * 50)
+            traceback.print_exc()
+            print("=" * 50)
+            yield sse_event("error", {"detail": f"Analysis failed: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/analyze/batch")
+async def analyze_batch_endpoint(request: BatchAnalyzeRequest):
+    """
+    Analyze many tickets in one request, streaming NDJSON as each completes.
+    
+    Lines (in completion order):
+    - {"index", "id", "result": AnalyzeResponse}
+    - {"index", "id", "error": "..."} for a failed or empty ticket
+    - {"summary": {...}} last: counts, duration and shared-work reuse
+    
+    Merchant log lookups and doc retrieval pieces are shared across the batch;
+    Gemini calls are capped at `concurrency` (at most MAX_BATCH_LLM_CONCURRENCY).
+    """
+    if not request.tickets:
+        raise HTTPException(status_code=400, detail="tickets cannot be empty")
+    if len(request.tickets) > MAX_BATCH_TICKETS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_TICKETS} tickets per batch")
+    concurrency = request.concurrency or BATCH_LLM_CONCURRENCY
+    if concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency must be at least 1")
+    concurrency = min(concurrency, MAX_BATCH_LLM_CONCURRENCY)
+    
+    print(f"[Analyze/Batch] {len(request.tickets)} tickets, LLM concurrency {concurrency}")
+    
+    async def lines():
+        start_time = time.time()
+        succeeded = failed = 0
+        runnable = []
+        for index, ticket in enumerate(request.tickets):
+            if ticket.ticket_text.strip():
+                runnable.append((index, ticket))
+            else:
+                failed += 1
+                yield json.dumps({"index": index, "id": ticket.id, "error": "ticket_text cannot be empty"}) + "\n"
+        
+        summary = {}
+        async for index, outcome, duration_ms in analyze_batch([t.model_dump() for _, t in runnable], concurrency):
+            if index == "summary":
+                summary = outcome
+                continue
+            original_index, ticket = runnable[index]
+            line = {"index": original_index, "id": ticket.id}
+            if isinstance(outcome, Exception):
+                failed += 1
+                line["error"] = f"Analysis failed: {str(outcome)}"
+            else:
+                succeeded += 1
+                line["result"] = to_response(outcome).model_dump()
+            request_log.log_request(ticket.ticket_text, success="result" in line, duration_ms=duration_ms)
+            yield json.dumps(line) + "\n"
+        
+        yield json.dumps({"summary": {
+            "tickets": len(request.tickets),
+            "succeeded": succeeded,
+            "failed": failed,
+            "duration_ms": round((time.time() - start_time) * 1000, 1),
+            "shared_work": summary,
+        }}) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.get("/health")
 async def agent_health():
     """Health check for the agent service."""
@@ -146,7 +296,11 @@ async def get_stats():
     """Get request statistics for the agent."""
     return {
         "service": "Agent Insight Engine",
-        **request_log.get_stats()
+        **request_log.get_stats(),
+        "merchant_resolution": merchant_resolver.get_stats(),
+        "llm_cache": response_cache.get_stats(),
+        "near_duplicates": duplicate_index.get_stats(),
+        "analysis_store": analysis_store.get_stats(),
     }
 
 
@@ -0,0 +1,45 @@
+# Shared per-batch work
+# Memoizes merchant log lookups and doc retrieval pieces across the tickets
+# of one batch analysis, so N tickets for the same merchant pay for one
+# lookup. Passed to the agent graph via config["configurable"]["shared_work"].
+
+import asyncio
+from typing import Any, Callable, Hashable
+
+
+class SharedWork:
+    """
+    Compute-once memo for the graph nodes of one batch, on its event loop.
+    Each key is computed once in a worker thread (asyncio.to_thread);
+    concurrent callers of the same key await that one task instead of
+    repeating it. A failed computation is not kept, so a later caller retries.
+    """
+
+    def __init__(self):
+        self.results: dict[Hashable, Any] = {}
+        self.pending: dict[Hashable, asyncio.Task] = {}
+
+        self.computed = 0
+        self.reused = 0
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        if key in self.results:
+            self.reused += 1
+            return self.results[key]
+        task = self.pending.get(key)
+        if task is None:
+            task = self.pending[key] = asyncio.ensure_future(asyncio.to_thread(compute))
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.reused += 1
+        # Shielded: one caller being cancelled must not cancel the others' result
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        del self.pending[key]
+        if not task.cancelled() and task.exception() is None:
+            self.results[key] = task.result()
+            self.computed += 1
+
+    def get_stats(self) -> dict:
+        return {"computed": self.computed, "reused": self.reused}
@@ -0,0 +1,79 @@
+# Error signature catalog
+# One declarative list of known error signatures, compiled once into a single
+# alternation regex so ticket text and logs are classified in one linear pass
+
+import re
+from typing import NamedTuple, Optional
+
+
+class Signature(NamedTuple):
+    """A known error pattern and what it means for diagnosis and doc search."""
+    name: str  # Regex group name, unique
+    pattern: str  # Case-insensitive regex fragment (no capture groups)
+    error_type: Optional[str]  # Label shown as a detected error, None for context-only signatures
+    doc_terms: tuple[str, ...]  # Extra doc search terms to boost
+
+
+SIGNATURES = [
+    # === Generic API errors ===
+    Signature("forbidden", r"\b403\b|forbidden|api[ _-]?key invalid|access denied", "403 Forbidden", ("API Key",)),
+    Signature("rate_limit", r"\b429\b|rate[ _-]?limit|too many requests", "429 Rate Limited", ("Rate Limit",)),
+    Signature("server_error", r"\b500\b|internal server error|database|connection pool", "500 Server Error", ("Database",)),
+    Signature("ssl", r"\bssl\b|certificate|handshake failed", "SSL Certificate Issue", ("SSL",)),
+    Signature("json", r"\bjson\b|unexpected token|invalid payload", "JSON Parsing Error", ("JSON",)),
+    Signature("not_found", r"\b404\b|endpoint not found|endpoint unreachable", "404 / Endpoint Not Found", ("endpoint",)),
+    Signature("timeout", r"timeout|timed out", "Timeout", ()),
+    Signature("migration", r"migrat\w*|\bv2\b|api version|deprecated", None, ("Migration",)),
+
+    # === Headless migration errors ===
+    Signature("webhook_signature", r"signature verification failed|webhook signature|signing secret", "Webhook Signature Failure", ("Stripe", "webhook signature")),
+    Signature("duplicate_webhook", r"idempoten\w*|\(duplicate\)|duplicate (?:webhook|fulfillment|order)s?", "Duplicate Webhooks", ("idempotency", "duplicate webhook")),
+    Signature("oauth_redirect", r"redirect_uri|oauth redirect|\bsso\b", "OAuth Redirect Mismatch", ("OAuth redirect_uri", "SSO")),
+    Signature("oauth_token", r"oauth token expired|token expired", "Expired OAuth Token", ("OAuth token", "re-authenticate")),
+    Signature("csp", r"\bcsp\b|content security policy|dangerouslysetinnerhtml", "CSP Violation", ("Content Security Policy", "CSP")),
+    Signature("cors", r"\bcors\b|preflight|cross-origin", "CORS / Cross-Origin Block", ("CORS",)),
+    Signature("checkout_session", r"samesite|cart_token|checkout session|session expired", "Checkout Session Expired", ("checkout session", "SameSite cookie")),
+    Signature("auth_token", r"\bjwt\b|authorization header missing|token not provided|localstorage", "Auth Token Missing", ("Authorization token", "localStorage")),
+    Signature("storefront_scope", r"scope insufficient|read_products|storefront channel", "Storefront Token Scope", ("Storefront API scopes",)),
+    Signature("variant_sync", r"variant|parent sku|metafield", "Variant Sync Failure", ("variant sync", "metafield")),
+    Signature("inventory_sync", r"inventory|out of sync|\berp\b", "Inventory Sync Drift", ("inventory sync",)),
+    Signature("import_timeout", r"import job|product import|memory usage exceeded", "Import Timeout", ("import", "batch")),
+    Signature("stale_cache", r"stale content|revalidation|cdn purge|cache invalidation", "Stale CDN Cache", ("CDN cache invalidation", "revalidate")),
+    Signature("slow_api", r"latency|cache miss|query complexity", "Slow API Response", ("performance", "caching")),
+    Signature("broken_images", r"image fetch failed|image url|cdn\.shopify\.com", "Broken Image URLs", ("image migration",)),
+    Signature("fulfillment", r"fulfillment api|shipstation", "Fulfillment Integration Failure", ("fulfillment", "ShipStation")),
+    Signature("refund", r"refund|charge id|version mismatch", "Refund / Payment API Mismatch", ("refund", "payment intent")),
+]
+
+# Every signature as a named alternative of one regex, compiled once
+SIGNATURE_PATTERN = re.compile(
+    "|".join(f"(?P<{sig.name}>{sig.pattern})" for sig in SIGNATURES),
+    re.IGNORECASE,
+)
+SIGNATURES_BY_NAME = {sig.name: sig for sig in SIGNATURES}
+
+
+def scan_sections(sections: list[str]) -> list[list[Signature]]:
+    """
+    Classify several text sections in a single regex pass.
+
+    The sections are joined and scanned once; each match is attributed back
+    to its section by offset. Returns, per section, the distinct signatures
+    found, in first-seen order.
+    """
+    text = "\n".join(sections)
+    bounds = []
+    offset = 0
+    for section in sections:
+        offset += len(section) + 1
+        bounds.append(offset)
+
+    found: list[list[Signature]] = [[] for _ in sections]
+    section = 0
+    for match in SIGNATURE_PATTERN.finditer(text):
+        while match.start() >= bounds[section]:
+            section += 1
+        signature = SIGNATURES_BY_NAME[match.lastgroup]
+        if signature not in found[section]:
+            found[section].append(signature)
+    return found
@@ -0,0 +1,37 @@
+# Test setup: keep every store in memory (or in a temp dir) and never call Gemini
+# Env vars are set before any backend module is imported
+
+import os
+import random
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ["GOOGLE_API_KEY"] = "test"
+os.environ["LLM_CACHE_PATH"] = ""
+os.environ["ANALYSIS_STORE_PATH"] = ""
+os.environ["TICKET_DB_PATH"] = ""
+os.environ["JOB_QUEUE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="jobs-"), "jobs.sqlite3")
+os.environ.pop("LOG_SEGMENTS_DIR", None)
+os.environ.pop("SPECULATIVE_ANALYSIS", None)
+
+from ticket_helpers import make_ticket
+
+
+@pytest.fixture
+def tickets():
+    """120 tickets with mixed merchants, statuses, emails and creation times."""
+    return [make_ticket(n) for n in random.Random(7).sample(range(200), 120)]
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Test client for the app; no `with`, so its lifespan (job workers, feed) does not start."""
+    from fastapi.testclient import TestClient
+
+    import main
+    return TestClient(main.app)
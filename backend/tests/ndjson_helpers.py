@@ -0,0 +1,7 @@
+# NDJSON request bodies for the bulk endpoint tests
+
+import json
+
+
+def ndjson(*records) -> bytes:
+    return b"\n".join(record if isinstance(record, bytes) else json.dumps(record).encode() for record in records)
@@ -0,0 +1,101 @@
+# plan_analysis: which part of the graph re-runs for a ticket with a stored analysis
+
+import uuid
+
+import pytest
+
+import agent
+from agent import AGENT_NODES, downstream_of, graph_for, plan_analysis, store_analysis
+from insights import AnalysisStore
+from mock_db import append_merchant_logs, get_merchant_log_high_water
+
+TICKET_TEXT = "Checkout returns 403 since we moved to the headless storefront"
+
+
+@pytest.fixture
+def merchant_id():
+    merchant_id = f"m_plan_{uuid.uuid4().hex[:8]}"
+    append_merchant_logs({merchant_id: ["2024-01-15 10:23:45 ERROR: 403 Forbidden - API Key Invalid"]})
+    return merchant_id
+
+
+@pytest.fixture
+def ticket_id():
+    return f"t-{uuid.uuid4().hex}"
+
+
+def store(ticket_id, merchant_id, llm_error=None, complete=True):
+    final_state = {
+        **agent.build_initial_state(TICKET_TEXT, merchant_id),
+        "log_hwm": get_merchant_log_high_water(merchant_id),
+        "diagnosis": "Storefront token lacks a scope",
+        "llm_error": llm_error,
+        "steps_log": ["✅ Analysis complete"],
+    }
+    store_analysis(ticket_id, TICKET_TEXT, merchant_id, final_state, complete=complete)
+
+
+def test_without_stored_analysis_runs_full_graph(ticket_id, merchant_id):
+    graph, state, outcome = plan_analysis(TICKET_TEXT, merchant_id, ticket_id=ticket_id)
+    assert outcome == "full" and graph is agent.agent
+    assert state["ticket_text"] == TICKET_TEXT and state["merchant_id"] == merchant_id
+
+
+def test_unchanged_inputs_serve_stored_state(ticket_id, merchant_id):
+    store(ticket_id, merchant_id)
+    graph, state, outcome = plan_analysis(TICKET_TEXT, merchant_id, ticket_id=ticket_id)
+    assert outcome == "served" and graph is None
+    assert state["diagnosis"] == "Storefront token lacks a scope"
+    assert state["steps_log"][-1].startswith("⚡ Served stored analysis")
+
+
+def test_changed_ticket_runs_full_graph(ticket_id, merchant_id):
+    store(ticket_id, merchant_id)
+    _, _, outcome = plan_analysis(TICKET_TEXT + " and on mobile", merchant_id, ticket_id=ticket_id)
+    assert outcome == "full"
+    _, _, outcome = plan_analysis(TICKET_TEXT, "m_other", ticket_id=ticket_id)
+    assert outcome == "full"
+
+
+def test_new_merchant_logs_rerun_from_check_logs(ticket_id, merchant_id):
+    store(ticket_id, merchant_id)
+    append_merchant_logs({merchant_id: ["2024-01-15 10:24:00 ERROR: 500 Internal Server Error"]})
+    graph, state, outcome = plan_analysis(TICKET_TEXT, merchant_id, ticket_id=ticket_id)
+    assert outcome == "partial"
+    assert graph is graph_for({"check_logs", "search_docs", "generate_solution"})
+    assert "new merchant logs" in state["steps_log"][-1]
+
+
+def test_new_docs_rerun_from_ticket_docs(ticket_id, merchant_id, monkeypatch):
+    store(ticket_id, merchant_id)
+    monkeypatch.setattr(agent, "docs_version", "changed")
+    graph, state, outcome = plan_analysis(TICKET_TEXT, merchant_id, ticket_id=ticket_id)
+    assert outcome == "partial"
+    assert graph is graph_for(downstream_of(["search_ticket_docs"]))
+    assert "docs updated" in state["steps_log"][-1]
+
+
+@pytest.mark.parametrize("stored", [{"llm_error": "quota exceeded"}, {"complete": False}])
+def test_missing_diagnosis_reruns_only_generate_solution(ticket_id, merchant_id, stored):
+    store(ticket_id, merchant_id, **stored)
+    graph, state, outcome = plan_analysis(TICKET_TEXT, merchant_id, ticket_id=ticket_id)
+    assert outcome == "partial"
+    assert graph is graph_for({"generate_solution"})
+    # Retrieval steps are kept; the diagnosis adds its own
+    assert state["steps_log"][0] == "✅ Analysis complete"
+
+
+def test_every_stale_input_is_rerun_together(ticket_id, merchant_id, monkeypatch):
+    store(ticket_id, merchant_id, llm_error="timeout")
+    append_merchant_logs({merchant_id: ["2024-01-15 10:25:00 WARN: slow"]})
+    monkeypatch.setattr(agent, "docs_version", "changed")
+    graph, _, outcome = plan_analysis(TICKET_TEXT, merchant_id, ticket_id=ticket_id)
+    assert outcome == "partial"
+    assert graph is graph_for(set(AGENT_NODES) - {"extract_metadata"})
+
+
+def test_store_creates_its_directory(tmp_path):
+    path = tmp_path / "fresh" / "data" / "analyses.sqlite3"
+    store = AnalysisStore(str(path))
+    store.put("t1", "hash", "m_1", 3, "docs", True, {"diagnosis": "ok"})
+    assert AnalysisStore(str(path)).get("t1")["state"] == {"diagnosis": "ok"}
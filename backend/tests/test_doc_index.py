@@ -0,0 +1,116 @@
+# DocIndex: substring search from the postings, BM25 ranking and passage chunking
+
+import math
+import random
+
+import pytest
+
+from doc_index import BM25_B, BM25_K1, DocIndex, chunk_document, tokenize
+
+DOCS = [
+    "## API Keys\nRotate your API key from the dashboard. Invalid keys return 403.",
+    "## Webhooks\nStripe webhook signature verification needs the signing secret.",
+    "## Rate limits\nToo many requests return 429; back off and retry.",
+    "## Headless checkout\nThe checkout session cookie needs SameSite=None.",
+    "Plain text, no header: api-key rotation for the storefront.",
+]
+
+
+def scan(docs, query):
+    return [doc_id for doc_id, doc in enumerate(docs) if query.lower() in doc.lower()]
+
+
+@pytest.mark.parametrize("query", [
+    "api key", "API KEY", "pi ke", "webhook", "hook sig", "signing secret.", "429;", "samesite=none",
+    "api-key", "y from the dash", "", " ", "403", "no such phrase", "##", "e",
+])
+def test_find_substring_matches_a_linear_scan(query):
+    assert DocIndex(DOCS).find_substring(query) == scan(DOCS, query)
+
+
+def test_find_substring_on_random_slices():
+    index = DocIndex(DOCS)
+    rng = random.Random(5)
+    for _ in range(500):
+        doc = rng.choice(DOCS)
+        start = rng.randrange(len(doc))
+        query = doc[start:start + rng.randrange(1, 20)]
+        assert index.find_substring(query) == scan(DOCS, query)
+
+
+def reference_bm25(docs, query):
+    """Textbook BM25 with log1p-damped query counts, one doc at a time."""
+    tokenized = [tokenize(doc) for doc in docs]
+    avg_length = sum(map(len, tokenized)) / len(docs)
+    query_counts = {}
+    for term in tokenize(query):
+        query_counts[term] = query_counts.get(term, 0) + 1
+    scores = []
+    for tokens in tokenized:
+        score = 0.0
+        for term, count in query_counts.items():
+            tf = tokens.count(term)
+            if not tf:
+                continue
+            df = sum(term in other for other in tokenized)
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / avg_length)
+            score += math.log1p(count) * idf * tf * (BM25_K1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+@pytest.mark.parametrize("query", ["api key", "webhook signing secret", "retry retry 429", "checkout api"])
+def test_rank_counts_matches_reference_bm25(query):
+    index = DocIndex(DOCS)
+    expected = reference_bm25(DOCS, query)
+    ranked = index.rank_counts(index.term_counts(query), top_k=len(DOCS))
+    assert [doc_id for doc_id, _ in ranked] == sorted(
+        (doc_id for doc_id, score in enumerate(expected) if score > 0), key=lambda doc_id: (-expected[doc_id], doc_id)
+    )
+    for doc_id, score in ranked:
+        assert score == pytest.approx(expected[doc_id])
+
+
+def test_rank_counts_top_k_and_empty_queries():
+    index = DocIndex(DOCS)
+    assert len(index.rank_counts(index.term_counts("api key checkout webhook"), top_k=2)) == 2
+    assert index.rank_counts(index.term_counts("the and of"), top_k=5) == []  # Stopwords only
+    assert index.rank_counts(index.term_counts("unknownterm"), top_k=5) == []
+    assert index.rank_counts(index.term_counts("api"), top_k=0) == []
+
+
+def test_rank_counts_breaks_ties_on_lower_doc_id():
+    index = DocIndex(["same words here", "other text", "same words here"])
+    assert [doc_id for doc_id, _ in index.rank_counts(index.term_counts("same words"))] == [0, 2]
+
+
+def test_term_counts_can_be_summed():
+    index = DocIndex(DOCS)
+    both = index.term_counts("api key") + index.term_counts("webhook")
+    assert index.rank_counts(both, top_k=5) == index.rank_counts(index.term_counts("api key webhook"), top_k=5)
+
+
+def test_chunk_document_splits_on_headers_outside_code():
+    # Articles are indented string literals, as in mock_db.docs
+    article = """## Webhooks Guide
+    Intro paragraph.
+
+    ### Signatures
+    Verify every payload.
+
+    ```
+    ## not a header inside a fence
+    ```
+
+    **Retries:** we retry 3 times."""
+    assert chunk_document(article) == [
+        "## Webhooks Guide\nIntro paragraph.",
+        "## Webhooks Guide\n### Signatures\nVerify every payload.\n\n```\n## not a header inside a fence\n```",
+        "## Webhooks Guide\n**Retries:** we retry 3 times.",
+    ]
+
+
+def test_chunk_document_without_title_or_headers():
+    assert chunk_document("Just one paragraph.\n  Second line.") == ["Just one paragraph.\nSecond line."]
+    assert chunk_document("") == []
@@ -0,0 +1,117 @@
+# JobQueue: claim order, retry with backoff, dead-lettering, manual retry and the worker pool
+
+import asyncio
+
+import pytest
+
+import job_queue
+from job_queue import DEAD, DONE, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, QUEUED, RUNNING, JobQueue, WorkerPool
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "RETRY_BASE_SECONDS", 0.0)
+    return JobQueue(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_claims_highest_priority_first(queue):
+    low = queue.enqueue("analyze", {"n": 1}, priority=PRIORITY_BACKGROUND)
+    normal = queue.enqueue("analyze", {"n": 2})
+    high = queue.enqueue("analyze", {"n": 3}, priority=PRIORITY_INTERACTIVE)
+    assert [queue.claim()["id"] for _ in range(3)] == [high, normal, low]
+    assert queue.claim() is None
+
+
+def test_min_priority_skips_background_jobs(queue):
+    queue.enqueue("speculate", {}, priority=PRIORITY_BACKGROUND)
+    assert queue.claim(min_priority=0) is None
+    assert queue.claim()["kind"] == "speculate"
+
+
+def test_failed_attempt_is_requeued_with_backoff(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "RETRY_BASE_SECONDS", 60.0)
+    job_id = queue.enqueue("analyze", {}, max_attempts=3)
+    job = queue.claim()
+    assert job["status"] == RUNNING and job["attempts"] == 1
+    assert queue.fail(job_id, "quota exceeded") == QUEUED
+    requeued = queue.get(job_id)
+    assert requeued["error"] == "quota exceeded"
+    assert requeued["available_at"] >= requeued["started_at"] + 60
+    # Not claimable until the backoff runs out
+    assert queue.claim() is None
+
+
+def test_job_is_dead_lettered_after_max_attempts(queue):
+    job_id = queue.enqueue("analyze", {"ticket_id": "t1"}, max_attempts=3)
+    statuses = []
+    for _ in range(3):
+        assert queue.claim()["id"] == job_id
+        statuses.append(queue.fail(job_id, "boom"))
+    assert statuses == [QUEUED, QUEUED, DEAD]
+    assert queue.claim() is None
+    dead = queue.list(DEAD)
+    assert [job["id"] for job in dead] == [job_id]
+    assert dead[0]["attempts"] == 3 and dead[0]["finished_at"] is not None
+    assert queue.metrics()["dead_letter"] == 1
+
+
+def test_retry_requeues_only_dead_jobs(queue):
+    job_id = queue.enqueue("analyze", {}, max_attempts=1)
+    assert not queue.retry(job_id)  # Still queued
+    queue.claim()
+    assert queue.fail(job_id, "boom") == DEAD
+    assert queue.retry(job_id)
+    job = queue.get(job_id)
+    assert job["status"] == QUEUED and job["attempts"] == 0 and job["finished_at"] is None
+    assert queue.claim()["id"] == job_id
+
+
+def test_recover_requeues_interrupted_jobs(queue):
+    job_id = queue.enqueue("analyze", {})
+    queue.claim()
+    assert queue.recover() == 1
+    assert queue.get(job_id)["status"] == QUEUED
+
+
+def test_complete_stores_result(queue):
+    job_id = queue.enqueue("analyze", {})
+    queue.claim()
+    queue.complete(job_id, {"diagnosis": "ok"})
+    job = queue.get(job_id)
+    assert job["status"] == DONE and job["result"] == {"diagnosis": "ok"} and job["error"] is None
+
+
+def test_worker_pool_retries_then_dead_letters(queue):
+    attempts = {}
+
+    async def flaky(payload):
+        attempts[payload["n"]] = attempts.get(payload["n"], 0) + 1
+        if payload["n"] == 1 and attempts[1] < 3:
+            raise RuntimeError("transient")
+        if payload["n"] == 2:
+            raise RuntimeError("permanent")
+        return {"n": payload["n"]}
+
+    async def run():
+        pool = WorkerPool(queue, {"analyze": flaky}, size=2)
+        await pool.start()
+        try:
+            recovers = await queue.submit("analyze", {"n": 1}, max_attempts=3)
+            fails = await queue.submit("analyze", {"n": 2}, max_attempts=2)
+            unknown = await queue.submit("nope", {}, max_attempts=1)
+            jobs = [await queue.wait(job_id, 5) for job_id in (recovers, fails, unknown)]
+        finally:
+            await pool.stop()
+        return jobs, pool
+
+    (recovered, failed, unknown), pool = asyncio.run(run())
+    assert recovered["status"] == DONE and recovered["result"] == {"n": 1} and recovered["attempts"] == 3
+    assert failed["status"] == DEAD and failed["attempts"] == 2 and failed["error"] == "permanent"
+    assert unknown["status"] == DEAD and "No handler" in unknown["error"]
+    assert pool.processed == 1 and pool.failed_attempts == 5
+
+
+def test_ask_ai_unknown_ticket_is_404(client):
+    response = client.post("/ask-ai/no-such-ticket")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Ticket not found"}
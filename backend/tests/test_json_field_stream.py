@@ -0,0 +1,58 @@
+# JsonFieldStream: a string field decodes the same however the JSON arrives in chunks
+
+import json
+import random
+
+import pytest
+
+from agent import JsonFieldStream
+
+VALUES = [
+    "Rotate the API key in Dashboard > Settings",
+    'Set "SameSite=None" on the cart cookie',
+    "Line one\nLine two\ttabbed \\ backslash / slash",
+    "Café — non-ASCII",
+    "Emoji outside the BMP: \U0001F600",
+    "",
+]
+
+
+def stream(text: str, sizes: list[int], field: str = "recommended_action") -> str:
+    decoder = JsonFieldStream(field)
+    out, start = [], 0
+    for size in sizes:
+        out.append(decoder.feed(text[start:start + size]))
+        start += size
+    out.append(decoder.feed(text[start:]))
+    return "".join(out)
+
+
+@pytest.mark.parametrize("value", VALUES)
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_every_split_decodes_like_json_loads(value, ensure_ascii):
+    text = json.dumps({"diagnosis": "ignored \"recommended_action\": \"no\"", "recommended_action": value,
+                       "confidence_score": 0.9}, ensure_ascii=ensure_ascii)
+    # Whole, one character at a time, and every single split point
+    assert stream(text, []) == value
+    assert stream(text, [1] * len(text)) == value
+    for cut in range(len(text)):
+        assert stream(text, [cut]) == value
+
+
+def test_random_chunkings():
+    rng = random.Random(3)
+    for _ in range(200):
+        value = rng.choice(VALUES)
+        text = json.dumps({"recommended_action": value}, ensure_ascii=rng.random() < 0.5)
+        assert stream(text, [rng.randrange(1, 8) for _ in range(len(text))]) == value
+
+
+def test_stops_at_the_closing_quote():
+    decoder = JsonFieldStream("recommended_action")
+    assert decoder.feed('{"recommended_action": "Retry') == "Retry"
+    assert decoder.feed(' later", "other": "x"}') == " later"
+    assert decoder.done and decoder.feed("more") == ""
+
+
+def test_missing_field_yields_nothing():
+    assert stream('{"diagnosis": "only this"}', [5, 5]) == ""
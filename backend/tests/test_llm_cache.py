@@ -0,0 +1,68 @@
+# ResponseCache: whitespace-insensitive keys, memory and disk tiers, TTL and LRU eviction
+
+import pytest
+
+import llm_cache
+from llm_cache import ResponseCache, cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_cache_key_ignores_formatting_only():
+    assert cache_key("ticket  text\n", "logs") == cache_key("ticket text", " logs ")
+    assert cache_key("ticket text", "logs") != cache_key("ticket", "text logs")
+    assert cache_key(None, "") == cache_key("", "")
+
+
+def test_disk_hit_survives_a_restart_and_is_promoted(tmp_path, clock):
+    path = str(tmp_path / "cache" / "llm.sqlite3")
+    ResponseCache(path).put("k", {"diagnosis": "rotate the key"})
+
+    cache = ResponseCache(path)
+    assert cache.get("k") == ({"diagnosis": "rotate the key"}, "disk")
+    assert cache.get("k") == ({"diagnosis": "rotate the key"}, "memory")
+    assert cache.get("missing") == (None, None)
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 1, "66.7%")
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "llm.sqlite3"), ttl_seconds=60)
+    cache.put("k", {"n": 1})
+    clock[0] += 59
+    assert cache.get("k")[1] == "memory"
+    clock[0] += 2
+    assert cache.get("k") == (None, None)
+    assert cache.get_stats()["disk_entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "llm.sqlite3"), max_memory_entries=2, max_disk_entries=3)
+    for n in range(3):
+        clock[0] += 1
+        cache.put(f"k{n}", {"n": n})
+    assert list(cache.memory) == ["k1", "k2"]
+    clock[0] += 1
+    assert cache.get("k0")[1] == "disk"  # Touches k0 on disk and promotes it, pushing k1 out of memory
+    clock[0] += 1
+    cache.put("k3", {"n": 3})
+    assert list(cache.memory) == ["k0", "k3"]
+    # Disk keeps the 3 most recently accessed: k0 was read back, k1 was not
+    assert cache.get_stats()["disk_entries"] == 3
+    assert cache.get("k1") == (None, None)
+    assert cache.get("k2")[1] == "disk"
+
+
+def test_memory_only_cache(clock):
+    cache = ResponseCache(max_memory_entries=1)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") == (None, None) and cache.get("b") == ({"n": 2}, "memory")
+    assert cache.get_stats()["disk_entries"] is None
+    cache.clear()
+    assert cache.get("b") == (None, None)
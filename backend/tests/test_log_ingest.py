@@ -0,0 +1,51 @@
+# NDJSON log ingest keeps good lines and reports bad ones
+
+import uuid
+
+import pytest
+
+from mock_db import get_merchant_logs
+from ndjson_helpers import ndjson
+
+
+def test_ingest_keeps_good_lines_and_reports_bad_ones(client):
+    merchant_id = f"m_test_{uuid.uuid4().hex[:8]}"
+    body = ndjson(
+        {"merchant_id": merchant_id, "line": "2024-01-15 10:23:45 ERROR: 403 Forbidden"},
+        b"{not json",
+        {"merchant_id": merchant_id, "timestamp": "2024-02-30 10:00:00", "level": "ERROR", "message": "bad date"},
+        {"line": "2024-01-15 10:23:46 INFO: no merchant"},
+        [1, 2, 3],
+        {"merchant_id": merchant_id, "timestamp": "2024-01-15 10:23:47", "level": "warn", "message": "slow"},
+        {"merchant_id": merchant_id},
+        b"",
+        {"merchant_id": merchant_id, "line": "2024-01-15T10:23:48 WARNING: retrying"},
+    )
+    response = client.post("/logs/ingest", content=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["accepted"] == 3
+    assert result["rejected"] == 5
+    assert [error["line"] for error in result["errors"]] == [2, 3, 4, 5, 7]
+    assert "invalid timestamp '2024-02-30 10:00:00'" in result["errors"][1]["error"]
+    assert result["errors"][2]["error"] == "missing merchant_id"
+    assert get_merchant_logs(merchant_id) == [
+        "2024-01-15 10:23:45 ERROR: 403 Forbidden",
+        "2024-01-15 10:23:47 WARN: slow",
+        "2024-01-15T10:23:48 WARNING: retrying",
+    ]
+
+
+@pytest.mark.parametrize("timestamp", [
+    "2024-01-15T10:23:45Z", "2024-01-15", "2024-01-15 10:23:45.123", "2024-01-15 10:23:45+05:00",
+])
+def test_ingest_rejects_timestamps_the_store_cannot_keep(client, timestamp):
+    merchant_id = f"m_test_{uuid.uuid4().hex[:8]}"
+    body = ndjson(
+        {"merchant_id": merchant_id, "timestamp": timestamp, "level": "ERROR", "message": "boom"},
+        {"merchant_id": merchant_id, "line": f"{timestamp} ERROR: boom"},
+        {"merchant_id": merchant_id, "line": "free-form line without a date"},
+    )
+    result = client.post("/logs/ingest", content=body).json()
+    assert (result["accepted"], result["rejected"]) == (1, 2)
+    assert get_merchant_logs(merchant_id) == ["free-form line without a date"]
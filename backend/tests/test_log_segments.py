@@ -0,0 +1,63 @@
+# Log segments: message table and sealed segments survive a reopen, flush shows rows exactly once
+
+import os
+
+import numpy as np
+
+from log_segments import CATALOG, ROW_DTYPE, MessageTable, SegmentDirectory
+from log_store import MerchantLogStore
+
+LINES = [
+    "2024-01-15 10:23:45 ERROR: Payment declined: card expired",
+    "2024-01-15 10:23:46 warning: Retrying webhook delivery",
+    "2024-01-15T10:23:47 INFO: Checkout completed — €12.50",
+    "2024-01-15 10:23:48 NOTICE: Unknown level keeps its token",
+    "free-form line without a timestamp",
+    "2024-01-15 10:23:45 ERROR: Payment declined: card expired",
+]
+
+
+def test_message_table_round_trip(tmp_path):
+    table = MessageTable(str(tmp_path))
+    assert len(table) == 0 and table.find("anything") is None
+    table.append(["alpha", "", "ünïcode ✓"])
+    table.append(["beta"])
+
+    reopened = MessageTable(str(tmp_path))
+    assert [reopened[i] for i in range(len(reopened))] == ["alpha", "", "ünïcode ✓", "beta"]
+    assert reopened.find("ünïcode ✓") == 2
+    assert reopened.find("beta") == 3
+    assert reopened.find("gamma") is None
+
+
+def test_store_round_trips_lines_through_a_segment(tmp_path):
+    store = MerchantLogStore.open(str(tmp_path))
+    store.extend("m_1", LINES)
+    store.extend("m_2", LINES[:2])
+    before = store.format(store.select("m_1"))
+    assert before == LINES
+
+    assert store.flush() == len(LINES) + 2
+    # The sealed rows replace the tail, they are not added on top of it
+    assert store.format(store.select("m_1")) == LINES
+    store.extend("m_1", ["2024-01-16 08:00:00 ERROR: After the flush"])
+
+    reopened = MerchantLogStore.open(str(tmp_path))
+    assert reopened.merchant_ids() == {"m_1", "m_2"}
+    assert reopened.row_count("m_1") == len(LINES)  # The unflushed line was never sealed
+    assert reopened.format(reopened.select("m_1")) == LINES
+    assert reopened.format(reopened.select("m_2", levels=["WARN"])) == [LINES[1]]
+    # Persisted messages are found again instead of being stored twice
+    reopened.extend("m_3", [LINES[0]])
+    assert reopened.select("m_3").msg[0] == reopened.select("m_1").msg[0]
+    assert reopened.messages == []
+
+
+def test_catalog_is_rebuilt_when_missing(tmp_path):
+    segments = SegmentDirectory(str(tmp_path))
+    rows = np.zeros(3, dtype=ROW_DTYPE)
+    segments.add_segment(segments.write_segment({"m_1": rows, "m_2": rows[:1]}))
+    segments.add_segment(segments.write_segment({"m_1": rows[:2]}))
+    os.remove(tmp_path / CATALOG)
+
+    assert SegmentDirectory(str(tmp_path)).catalog == {"m_1": 5, "m_2": 1}
@@ -0,0 +1,66 @@
+# MerchantLogStore: lines render back as ingested, and select() filters by level, time and recency
+
+import pytest
+
+from log_store import LEVEL_CODES, SEVERITY_MASK, UNPARSED_TS, MerchantLogStore, format_timestamp, parse_timestamp
+
+LINES = [
+    "2024-01-15 10:00:00 ERROR: Payment declined",
+    "2024-01-15 10:00:01 Warning: Slow response from gateway",
+    "2024-01-15T10:00:02 info: Checkout started",
+    "2024-01-15 10:00:03 FATAL: Worker crashed",
+    "free-form line",
+    "2024-01-15 10:00:04 CRITICAL: Payment declined",
+]
+
+
+@pytest.fixture
+def store():
+    store = MerchantLogStore()
+    store.extend("m_1", LINES)
+    return store
+
+
+def test_lines_round_trip_with_their_original_tokens(store):
+    assert store.format(store.select("m_1")) == LINES
+
+
+def test_parsed_columns(store):
+    rows = store.select("m_1")
+    assert (rows.level & SEVERITY_MASK).tolist() == [
+        LEVEL_CODES["ERROR"], LEVEL_CODES["WARN"], LEVEL_CODES["INFO"], LEVEL_CODES["INFO"],
+        LEVEL_CODES["INFO"], LEVEL_CODES["ERROR"],
+    ]
+    assert rows.ts[4] == UNPARSED_TS
+    assert format_timestamp(int(rows.ts[0])) == "2024-01-15 10:00:00"
+    # Identical messages share one interned id
+    assert rows.msg[0] == rows.msg[5]
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"levels": ["error"]}, [0, 5]),
+    ({"levels": ["WARNING"]}, [1]),
+    ({"since": "2024-01-15 10:00:01", "until": "2024-01-15 10:00:03"}, [1, 2]),
+    ({"newest": 2}, [4, 5]),
+    ({"newest": 0}, []),
+    ({"levels": ["ERROR", "INFO"], "newest": 3}, [3, 4, 5]),
+])
+def test_select_filters(store, filters, expected):
+    for bound in ("since", "until"):
+        if bound in filters:
+            filters[bound] = parse_timestamp(filters[bound])
+    assert store.format(store.select("m_1", **filters)) == [LINES[i] for i in expected]
+
+
+def test_unknown_merchant_and_counts(store):
+    assert store.select("m_2").count == 0
+    assert "m_1" in store and "m_2" not in store
+    assert store.row_count("m_1") == len(LINES)
+    assert store.extend_batch({"m_1": LINES[:2], "m_2": []}) == 2
+    assert store.merchant_ids() == {"m_1", "m_2"} and store.row_count("m_1") == len(LINES) + 2
+
+
+def test_unique_messages_in_first_seen_order(store):
+    assert store.unique_messages(store.select("m_1")) == [
+        "Payment declined", "Slow response from gateway", "Checkout started", "FATAL: Worker crashed", "free-form line",
+    ]
@@ -0,0 +1,56 @@
+# Log template mining: parameter-only differences collapse into one template with counts and samples
+
+import pytest
+
+from log_store import LEVEL_CODES, MerchantLogStore
+from log_templates import WILDCARD, is_parameter, mine_templates
+
+ERROR, INFO = LEVEL_CODES["ERROR"], LEVEL_CODES["INFO"]
+
+
+@pytest.mark.parametrize("token", ["30s", "5,234ms", "#10045", "$149.99", "1/5", "0xdeadbeef", "SKU-12345",
+                                   "https://shop.example.com/cart", "'blue'"])
+def test_parameters(token):
+    assert is_parameter(token)
+
+
+@pytest.mark.parametrize("token", ["Timeout", "order", "gateway", "m_ecom"])
+def test_words_are_not_parameters(token):
+    assert not is_parameter(token)
+
+
+def test_mine_templates_merges_and_keeps_samples():
+    templates = mine_templates([
+        (ERROR, "Timeout after 30s on order #1001", 1, 10, 10),
+        (ERROR, "Timeout after 45s on order #1002", 2, 20, 30),
+        (ERROR, "Timeout after 30s on order #1001", 1, 40, 40),
+        (INFO, "Cache warmed in 120ms", 1, 5, 5),
+        (ERROR, "Payment gateway unreachable", 1, 50, 50),
+    ])
+    assert [t.template for t in templates] == [
+        f"Cache warmed in {WILDCARD}", f"Timeout after {WILDCARD} on order {WILDCARD}", "Payment gateway unreachable",
+    ]
+    timeout = templates[1]
+    assert (timeout.count, timeout.first_ts, timeout.last_ts) == (4, 10, 40)
+    assert timeout.samples == [["30s", "#1001"], ["45s", "#1002"]]
+    assert timeout.example == "Timeout after 30s on order #1001"
+
+
+def test_levels_and_lengths_are_never_merged():
+    templates = mine_templates([
+        (ERROR, "Webhook failed for order 1", 1, 1, 1),
+        (INFO, "Webhook failed for order 2", 1, 2, 2),
+        (ERROR, "Webhook failed for order 3 again", 1, 3, 3),
+    ])
+    assert len(templates) == 3
+
+
+def test_store_renders_templates_with_counts():
+    store = MerchantLogStore()
+    store.extend("m_1", [f"2024-01-15 10:00:0{i} ERROR: Timeout after {30 + i}s on order #10{i:02d}" for i in range(5)])
+    store.extend("m_1", ["2024-01-15 10:00:09 INFO: Done"])
+    assert store.format_templates(store.templates(store.select("m_1"))) == [
+        "2024-01-15 10:00:00 ERROR: Timeout after <*> on order <*> [x5, last 2024-01-15 10:00:04]"
+        " (e.g. 30s, #1000; 31s, #1001; 32s, #1002)",
+        "2024-01-15 10:00:09 INFO: Done",
+    ]
@@ -0,0 +1,81 @@
+# Merchant ID alias index: canonical forms, alias resolution and ambiguity; ID extraction from ticket text
+
+import pytest
+
+from merchant_index import MerchantIdIndex, canonical_merchant_id, extract_merchant_ids
+
+MERCHANTS = ["m_123", "m_ecom_007", "m_retail_007", "m_456"]
+
+
+@pytest.mark.parametrize("raw, canonical", [
+    ("M-ECOM-007", "ecom_7"),
+    (" m_123 ", "123"),
+    ("'ecom 007'", "ecom_7"),
+    ("m_100", "100"),
+    ("acme", "acme"),
+])
+def test_canonical_merchant_id(raw, canonical):
+    assert canonical_merchant_id(raw) == canonical
+
+
+@pytest.mark.parametrize("raw, resolved", [
+    ("m_123", "m_123"),
+    ("M_456", "m_456"),
+    ("123", "m_123"),
+    ("M-ECOM-7", "m_ecom_007"),
+    ("ecom_007", "m_ecom_007"),
+    ("retail 7", "m_retail_007"),
+])
+def test_resolve_aliases(raw, resolved):
+    match = MerchantIdIndex(MERCHANTS).resolve(raw)
+    assert match.merchant_id == resolved and match.candidates == [resolved] and not match.ambiguous
+
+
+def test_shared_suffix_is_ambiguous():
+    index = MerchantIdIndex(MERCHANTS)
+    for raw in ("007", "7"):
+        match = index.resolve(raw)
+        assert match.merchant_id is None and match.ambiguous
+        assert match.candidates == ["m_ecom_007", "m_retail_007"]
+
+
+@pytest.mark.parametrize("raw", ["", "   ", "unknown", "m_999"])
+def test_unknown_ids_resolve_to_nothing(raw):
+    assert MerchantIdIndex(MERCHANTS).resolve(raw) == (None, [])
+
+
+def test_adding_a_key_twice_keeps_one_alias():
+    index = MerchantIdIndex(["m_123", "m_123"])
+    assert index.aliases["123"] == ["m_123"]
+
+
+def extracted(text):
+    return [(found.merchant_id, found.strategy, found.known) for found in extract_merchant_ids(text, MerchantIdIndex(MERCHANTS))]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Order m_999 failed, merchant: 456", [("m_999", "direct", False), ("m_456", "labelled", True)]),
+    ("Checkout broken, account #ecom_7", [("m_ecom_007", "generic", True)]),
+    ("customer: 42 says m_123 is down", [("m_123", "direct", True), ("m_42", "generic", False)]),
+    ("customer=acme", [("acme", "generic", False)]),
+    ("merchant is down since the account was moved", []),
+    ("no ids in here at all", []),
+])
+def test_extract_merchant_ids(text, expected):
+    assert extracted(text) == expected
+
+
+def test_known_ids_rank_before_unknown_ones():
+    found = extracted("id: 555 and merchant: 123")
+    assert found == [("m_123", "labelled", True), ("m_555", "generic", False)]
+
+
+def test_each_id_is_reported_once():
+    assert extracted("m_123 again m_123, merchant: 123") == [("m_123", "direct", True)]
+
+
+def test_unknown_bare_word_is_only_a_hint():
+    (hint,) = extract_merchant_ids("merchant: acme", MerchantIdIndex(MERCHANTS))
+    assert not hint.known and not hint.plausible
+    (shaped,) = extract_merchant_ids("merchant: acme_42", MerchantIdIndex(MERCHANTS))
+    assert not shaped.known and shaped.plausible
@@ -0,0 +1,91 @@
+# Local merchant resolver: submitter email, typo'd IDs and log vocabulary, with a per-merchant vocabulary cache
+
+import pytest
+
+from merchant_index import MerchantIdIndex
+from merchant_resolver import EMAIL_CONFIDENCE, LocalMerchantResolver, edit_distance
+
+LOGS = {
+    "m_shop_101": ["Stripe webhook signature verification failed", "Checkout session expired for cart"],
+    "m_shop_202": ["Inventory sync drift with ERP", "Variant metafield missing on import"],
+    "m_bakery_303": ["Image fetch failed from cdn", "Image URL returned 404"],
+}
+EMAILS = {"owner@shop101.com": "m_shop_101", "ghost@example.com": "m_unknown"}
+
+
+@pytest.fixture
+def resolver():
+    return LocalMerchantResolver(MerchantIdIndex(LOGS), lambda m: LOGS[m], lambda: 1, EMAILS.get)
+
+
+@pytest.mark.parametrize("a, b, limit, distance", [
+    ("kitten", "sitting", 5, 3),
+    ("kitten", "sitting", 2, 3),  # Gave up past the limit
+    ("abc", "abcdefg", 2, 3),
+    ("shop_101", "shop_101", 2, 0),
+])
+def test_edit_distance(a, b, limit, distance):
+    assert edit_distance(a, b, limit) == distance
+
+
+def test_by_email_trusts_only_known_submitters(resolver):
+    assert resolver.by_email(None, "Help!\nSubmitted by: owner@shop101.com") == ("m_shop_101", EMAIL_CONFIDENCE, "email")
+    assert resolver.by_email(None, "cc: owner@shop101.com").merchant_id is None  # Not the submitter
+    assert resolver.by_email("ghost@example.com").merchant_id is None  # Maps to an unknown merchant
+    assert resolver.by_email("nobody@example.com").merchant_id is None
+
+
+@pytest.mark.parametrize("text, merchant_id", [
+    ("our id is shop_10l, maybe", "m_shop_101"),
+    ("m_shop_2O2 is broken", "m_shop_202"),
+    ("bakery_330 down", "m_bakery_303"),
+])
+def test_by_edit_distance(resolver, text, merchant_id):
+    resolution = resolver.by_edit_distance(text)
+    assert resolution.merchant_id == merchant_id and resolution.method == "edit_distance"
+    assert 0.6 < resolution.confidence < 1
+
+
+def test_by_edit_distance_skips_ties_and_short_tokens(resolver):
+    assert resolver.by_edit_distance("shop_1x2 and id 12").merchant_id is None
+
+
+def test_by_log_vocabulary(resolver):
+    resolution = resolver.by_log_vocabulary("Our inventory sync with the ERP is drifting and a variant metafield is missing")
+    assert resolution == ("m_shop_202", 1.0, "log_vocabulary")
+    assert resolver.by_log_vocabulary("hello there").merchant_id is None
+
+
+def test_resolve_stops_at_a_confident_email(resolver):
+    assert resolver.resolve("Image fetch failed", email="owner@shop101.com").method == "email"
+    assert resolver.resolve("Image fetch failed from cdn").merchant_id == "m_bakery_303"
+
+
+def test_vocabulary_is_reread_only_for_merchants_with_new_logs():
+    logs = {merchant_id: list(messages) for merchant_id, messages in LOGS.items()}
+    versions = {merchant_id: 1 for merchant_id in logs}
+    reads = []
+
+    def messages(merchant_id):
+        reads.append(merchant_id)
+        return logs[merchant_id]
+
+    resolver = LocalMerchantResolver(
+        MerchantIdIndex(logs), messages, lambda: sum(versions.values()), merchant_version=versions.get
+    )
+    assert resolver.by_log_vocabulary("refund charge mismatch").merchant_id is None
+    assert sorted(reads) == sorted(logs)
+
+    reads.clear()
+    logs["m_bakery_303"].append("Refund charge id version mismatch")
+    versions["m_bakery_303"] += 1
+    assert resolver.by_log_vocabulary("refund charge mismatch").merchant_id == "m_bakery_303"
+    assert reads == ["m_bakery_303"]
+
+
+def test_stats(resolver):
+    assert resolver.get_stats()["llm_skip_rate"] == "N/A"
+    resolver.record(escalated=False)
+    resolver.record(escalated=False)
+    resolver.record(escalated=True)
+    assert resolver.get_stats() == {"local_resolved": 2, "llm_escalations": 1, "llm_skip_rate": "66.7%"}
@@ -0,0 +1,73 @@
+# SharedWork: each key computed once per batch, failures retried, one caller's cancellation isolated
+
+import asyncio
+import threading
+
+import pytest
+
+from shared_work import SharedWork
+
+
+def test_concurrent_callers_share_one_computation():
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(threading.current_thread().name)
+        release.wait(5)
+        return {"logs": 3}
+
+    async def run():
+        work = SharedWork()
+        waiters = [asyncio.create_task(work.get_or_compute(("logs", "m_1"), compute)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(*waiters)
+        results.append(await work.get_or_compute(("logs", "m_1"), compute))
+        return work, results
+
+    work, results = asyncio.run(run())
+    assert len(calls) == 1 and calls[0] != threading.main_thread().name
+    assert results == [{"logs": 3}] * 6
+    assert work.get_stats() == {"computed": 1, "reused": 5}
+
+
+def test_failure_is_not_kept():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("log store busy")
+        return "ok"
+
+    async def run():
+        work = SharedWork()
+        with pytest.raises(RuntimeError):
+            await work.get_or_compute("k", flaky)
+        return work, await work.get_or_compute("k", flaky)
+
+    work, result = asyncio.run(run())
+    assert result == "ok" and len(attempts) == 2
+    assert work.get_stats() == {"computed": 1, "reused": 0}
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        return 42
+
+    async def run():
+        work = SharedWork()
+        first = asyncio.create_task(work.get_or_compute("k", compute))
+        second = asyncio.create_task(work.get_or_compute("k", compute))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        release.set()
+        return first, await second, work
+
+    first, result, work = asyncio.run(run())
+    assert first.cancelled() and result == 42
+    assert work.results == {"k": 42} and not work.pending
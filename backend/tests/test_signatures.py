@@ -0,0 +1,46 @@
+# Error signature catalog: one regex pass, matches attributed to the right section
+
+import re
+
+import pytest
+
+from signatures import SIGNATURE_PATTERN, SIGNATURES, SIGNATURES_BY_NAME, scan_sections
+
+
+def names(hits):
+    return [signature.name for signature in hits]
+
+
+def test_names_are_unique_and_fragments_have_no_groups():
+    assert len(SIGNATURES_BY_NAME) == len(SIGNATURES)
+    for signature in SIGNATURES:
+        assert re.compile(signature.pattern).groups == 0, signature.name
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Got a 403 Forbidden from the API", ["forbidden"]),
+    ("HTTP 429: Too Many Requests", ["rate_limit"]),
+    ("Stripe webhook: signature verification failed", ["webhook_signature"]),
+    ("OAuth redirect_uri mismatch after SSO change", ["oauth_redirect"]),
+    ("Blocked by CORS preflight", ["cors"]),
+    ("Request timed out, then Internal Server Error", ["timeout", "server_error"]),
+    ("Order 14030 shipped", []),  # 403 only as a whole number
+    ("", []),
+])
+def test_single_section(text, expected):
+    assert names(scan_sections([text])[0]) == expected
+
+
+def test_matches_are_attributed_to_their_section():
+    sections = ["403 forbidden, forbidden again", "", "rate limit hit\nand a timeout", "nothing here"]
+    assert [names(hits) for hits in scan_sections(sections)] == [["forbidden"], [], ["rate_limit", "timeout"], []]
+
+
+def test_match_at_section_boundary():
+    # The joining newline belongs to the first section; a match right after it is in the second
+    assert [names(hits) for hits in scan_sections(["timeout", "403"])] == [["timeout"], ["forbidden"]]
+
+
+def test_case_insensitive_single_pattern():
+    assert SIGNATURE_PATTERN.flags & re.IGNORECASE
+    assert names(scan_sections(["CERTIFICATE expired; SSL handshake failed"])[0]) == ["ssl"]
@@ -0,0 +1,103 @@
+# SQLiteTicketBackend: schema, durability settings, group commit and warm reload into TicketStore
+
+import sqlite3
+from concurrent.futures import Future
+
+import pytest
+
+from ticket_db import TICKET_FIELDS, SQLiteTicketBackend
+from ticket_helpers import Ticket, check_indexes, expected_order, make_ticket, walk
+from ticket_store import TicketStore
+
+
+def test_schema_and_pragmas(tmp_path):
+    path = str(tmp_path / "tickets.sqlite3")
+    backend = SQLiteTicketBackend(path)
+    try:
+        columns = [row[1] for row in backend.reader_db.execute("PRAGMA table_info(tickets)")]
+        assert columns == [*TICKET_FIELDS, "revision"]
+        indexes = [row[1] for row in backend.reader_db.execute("PRAGMA index_list(tickets)") if row[3] == "c"]
+        assert indexes == ["tickets_order"]
+        # 2 = FULL: a write is acknowledged only once the WAL is synced
+        assert backend.writer_db.execute("PRAGMA synchronous").fetchone()[0] == 2
+        assert backend.writer_db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        backend.close()
+
+
+def test_group_commit_persists_every_row(tmp_path):
+    path = str(tmp_path / "tickets.sqlite3")
+    backend = SQLiteTicketBackend(path, max_batch=50)
+    rows = [make_ticket(n).model_dump() for n in range(120)]
+    futures = [backend.write(row, n + 1) for n, row in enumerate(rows[:20])]
+    futures.append(backend.write_many([(row, n + 21) for n, row in enumerate(rows[20:])]))
+    for future in futures:
+        future.result(timeout=5)
+    stats = backend.get_stats()
+    backend.close()
+    assert stats["rows_written"] == 120 and stats["queued"] == 0
+    assert stats["commits"] <= 21
+
+    db = sqlite3.connect(path)
+    try:
+        stored = db.execute(f"SELECT {', '.join(TICKET_FIELDS)}, revision FROM tickets ORDER BY revision").fetchall()
+    finally:
+        db.close()
+    assert [dict(zip(TICKET_FIELDS, row[:-1])) for row in stored] == rows
+    assert [row[-1] for row in stored] == list(range(1, 121))
+
+
+def test_reload_from_sqlite(tmp_path, tickets):
+    path = str(tmp_path / "tickets.sqlite3")
+    store = TicketStore(SQLiteTicketBackend(path), model=Ticket)
+    store.add_many(tickets[:60], keep_bodies=False)
+    for ticket in tickets[60:]:
+        store.add(ticket)
+    store.update(tickets[5].id, status="pending", created_at="2023-12-31T00:00:00")
+    revision = store.get_revision()
+    store.close()
+
+    current = {t.id: t for t in tickets}
+    current[tickets[5].id] = tickets[5].model_copy(update={"status": "pending", "created_at": "2023-12-31T00:00:00"})
+    reopened = TicketStore(SQLiteTicketBackend(path), model=Ticket)
+    try:
+        assert reopened.get_revision() == revision
+        assert walk(reopened, 13) == expected_order(current.values())
+        assert walk(reopened, 3, status="pending") == [tickets[5].id]
+        assert reopened.get(tickets[5].id) == current[tickets[5].id]
+        exported = [row for batch in reopened.export(batch_size=16) for row in batch]
+        assert [row["id"] for row in exported] == expected_order(current.values())
+        check_indexes(reopened)
+    finally:
+        reopened.close()
+
+
+class FailingBackend(SQLiteTicketBackend):
+    """Commits fail on demand."""
+
+    fail = False
+
+    def write(self, row, revision):
+        if not self.fail:
+            return super().write(row, revision)
+        future = Future()
+        future.set_exception(RuntimeError("disk full"))
+        return future
+
+
+def test_failed_commit_is_undone_in_memory(tmp_path, tickets):
+    backend = FailingBackend(str(tmp_path / "tickets.sqlite3"))
+    store = TicketStore(backend, model=Ticket)
+    try:
+        store.add(tickets[0])
+        backend.fail = True
+        with pytest.raises(RuntimeError):
+            store.update(tickets[0].id, status="pending")
+        with pytest.raises(RuntimeError):
+            store.add(tickets[1])
+        assert store.get(tickets[0].id) == tickets[0]
+        assert store.get(tickets[1].id) is None
+        assert store.find(status="pending") == []
+        check_indexes(store)
+    finally:
+        store.close()
@@ -0,0 +1,87 @@
+# Near-duplicate ticket index: what may and may not reuse an earlier analysis
+
+import pytest
+
+from ticket_dedup import DEFAULT_SIMILARITY, NearDuplicateIndex, log_signature, minhash, shingles
+
+RESULT = {"diagnosis": "Checkout webhook secret rotated", "confidence_score": 0.9, "recommended_action": "Update secret"}
+FOOTER = "\n\nSubmitted by: owner@shop.example"
+
+
+def ticket(title: str, description: str) -> str:
+    return f"{title}\n\n{description}{FOOTER}"
+
+
+ORIGINAL = ticket("Webhook signature verification failed", "Stripe webhooks fail signature verification after the migration")
+REWORDED = ticket("Webhook signature verification failing", "Stripe webhooks fail signature verification after our migration")
+
+
+def similarity(a: str, b: str) -> float:
+    return float((minhash(shingles(a)) == minhash(shingles(b))).mean())
+
+
+def test_footer_is_not_shingled():
+    assert shingles(ticket("Checkout broken", "Payments fail")) == shingles("Checkout broken\n\nPayments fail")
+
+
+def test_unrelated_tickets_from_one_submitter_are_not_duplicates():
+    signature = log_signature("m_shop", "logs", [])
+    index = NearDuplicateIndex()
+    index.add(ticket("Checkout broken", "Customers cannot pay since this morning"), signature, RESULT)
+    for other in (ticket("Images broken", "Product images show as blank since this morning"),
+                  ticket("Login broken", "Customers cannot log in since this morning")):
+        assert index.find(other, signature) is None
+
+
+def test_reworded_ticket_reuses_the_analysis():
+    signature = log_signature("m_shop", "logs", ["Webhook Signature Failure"])
+    index = NearDuplicateIndex()
+    index.add(ORIGINAL, signature, RESULT)
+    match = index.find(REWORDED, signature)
+    assert match is not None and match.result == RESULT
+    assert match.similarity >= DEFAULT_SIMILARITY
+    assert similarity(ORIGINAL, REWORDED) >= DEFAULT_SIMILARITY
+
+
+def test_signature_requires_same_merchant_logs_and_errors():
+    base = log_signature("m_shop", "logs", ["403 Forbidden"])
+    assert base == log_signature("m_shop", "logs", ["403 Forbidden"])
+    assert base != log_signature("m_other", "logs", ["403 Forbidden"])
+    assert base != log_signature("m_shop", "new logs", ["403 Forbidden"])
+    assert base != log_signature("m_shop", "logs", ["429 Rate Limited"])
+    # Nothing but wording to go on: no reuse at all
+    assert log_signature(None, "No logs found for this merchant.", []) is None
+    assert log_signature(None, "No logs found for this merchant.", ["403 Forbidden"]) is not None
+
+
+def test_oldest_entries_are_evicted():
+    signature = log_signature("m_shop", "logs", [])
+    index = NearDuplicateIndex(max_entries=2)
+    texts = [ticket(f"Issue {word}", f"Something about {word} keeps failing") for word in ("alpha", "bravo", "charlie")]
+    for text in texts:
+        index.add(text, signature, {"diagnosis": text})
+    assert index.find(texts[0], signature) is None
+    assert index.find(texts[2], signature).result == {"diagnosis": texts[2]}
+    assert index.get_stats()["indexed_tickets"] == 2
+
+
+def test_minhash_estimates_jaccard_similarity():
+    a, b = shingles(ORIGINAL), shingles(REWORDED)
+    jaccard = len(a & b) / len(a | b)
+    assert abs(similarity(ORIGINAL, REWORDED) - jaccard) < 0.15
+    assert similarity(ORIGINAL, ORIGINAL) == 1.0
+
+
+@pytest.mark.parametrize("threshold, reused", [(0.5, True), (DEFAULT_SIMILARITY, True), (0.99, False)])
+def test_similarity_threshold(threshold, reused):
+    signature = log_signature("m_shop", "logs", [])
+    index = NearDuplicateIndex(similarity=threshold)
+    index.add(ORIGINAL, signature, RESULT)
+    assert (index.find(REWORDED, signature) is not None) == reused
+
+
+def test_identical_text_under_another_signature_is_not_reused():
+    index = NearDuplicateIndex()
+    index.add(ORIGINAL, log_signature("m_shop", "logs", []), RESULT)
+    assert index.find(ORIGINAL, log_signature("m_other", "logs", [])) is None
+    assert index.find(ORIGINAL, log_signature("m_shop", "logs", [])).similarity == 1.0
@@ -0,0 +1,84 @@
+# TicketFeed: coalesced deltas per subscriber, filters, and one event per bulk import
+
+import asyncio
+
+from ticket_feed import TicketFeed
+from ticket_helpers import make_ticket
+from ticket_store import TicketStore
+
+
+def feed_messages(write, **filters):
+    """Run write(store) with a feed attached; returns the messages one subscriber receives."""
+
+    async def run():
+        store = TicketStore()
+        feed = TicketFeed(coalesce_seconds=0.01)
+        feed.attach(asyncio.get_running_loop())
+        store.listeners.append(feed.publish)
+        store.batch_listeners.append(feed.publish_import)
+        subscriber = feed.subscribe(**filters)
+        messages = []
+        for step in write(store):
+            await asyncio.sleep(0)  # Let call_soon_threadsafe hand the step's writes over
+            if subscriber.ready.is_set():
+                messages.append(await subscriber.next_message(feed.coalesce_seconds))
+        return messages
+
+    return asyncio.run(run())
+
+
+def test_writes_to_one_ticket_are_coalesced():
+    ticket = make_ticket(1)
+
+    def write(store):
+        store.add(ticket)
+        store.update(ticket.id, status="pending")
+        store.update(ticket.id, status="resolved")
+        yield
+
+    (message,) = feed_messages(write)
+    assert message["type"] == "changes" and message["revision"] == 3
+    (change,) = message["changes"]
+    assert change["op"] == "create" and change["fields"]["status"] == "resolved"
+
+
+def test_update_entering_a_filter_carries_the_whole_ticket():
+    ticket = make_ticket(2, status="open")
+
+    def write(store):
+        store.add(ticket)
+        yield
+        store.update(ticket.id, status="pending")
+        yield
+
+    (message,) = feed_messages(write, status="pending")
+    (change,) = message["changes"]
+    assert change["op"] == "update" and change["fields"] == {**ticket.model_dump(), "status": "pending"}
+
+
+def test_bulk_import_is_one_event():
+    batch = [make_ticket(n) for n in range(500)]
+
+    def write(store):
+        store.add(make_ticket(900))
+        store.add_many(batch[:250])
+        store.add_many(batch[250:])
+        yield
+        store.update(batch[0].id, status="pending")
+        yield
+
+    imported, changed = feed_messages(write)
+    # Pending deltas are dropped: the client's refetch since its revision covers them
+    assert imported == {"type": "import", "revision": 501}
+    assert changed["type"] == "changes" and [c["id"] for c in changed["changes"]] == [batch[0].id]
+
+
+def test_import_skips_subscribers_it_does_not_concern():
+    batch = [make_ticket(n, merchant_id="m_a") for n in range(10)]
+
+    def write(store):
+        store.add_many(batch)
+        yield
+
+    assert feed_messages(write, merchant_id="m_b") == []
+    assert feed_messages(write, merchant_id="m_a") == [{"type": "import", "revision": 10}]
@@ -0,0 +1,64 @@
+# NDJSON ticket import: bad lines are reported, created_at is validated and canonical
+
+import json
+import uuid
+from datetime import datetime, timezone
+
+import main
+from ndjson_helpers import ndjson
+
+
+def test_import_keeps_good_lines_and_reports_bad_ones(client):
+    prefix = uuid.uuid4().hex[:8]
+    ticket = {"title": "Checkout", "description": "Fails", "email": f"{prefix}@example.com", "merchant_id": f"m_{prefix}"}
+    body = ndjson(
+        {**ticket, "id": f"{prefix}-1", "created_at": "2024-01-01T00:00:00"},
+        {**ticket, "id": f"{prefix}-2", "title": None},
+        b"{broken",
+        {"id": f"{prefix}-3", "email": "x@example.com"},
+        {**ticket, "id": f"{prefix}-4", "status": "closed", "created_at": "2024-01-02T00:00:00"},
+        {**ticket, "id": f"{prefix}-1", "status": "pending", "created_at": "2024-01-01T00:00:00"},
+    )
+    response = client.post("/tickets/import", content=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 3
+    assert result["failed"] == 3
+    assert [error["line"] for error in result["errors"]] == [2, 3, 4]
+
+    # The later line for the same id wins
+    exported = client.get("/tickets/export", params={"merchant_id": f"m_{prefix}"}).text.splitlines()
+    rows = [json.loads(line) for line in exported]
+    assert [(row["id"], row["status"]) for row in rows] == [(f"{prefix}-1", "pending"), (f"{prefix}-4", "closed")]
+
+
+def test_import_of_only_bad_lines_imports_nothing(client):
+    revision = main.tickets.get_revision()
+    response = client.post("/tickets/import", content=ndjson(b"[]", b"null", {"title": "no body"}))
+    result = response.json()
+    assert result["imported"] == 0 and result["failed"] == 3
+    assert main.tickets.get_revision() == revision
+
+
+def test_import_validates_and_canonicalizes_created_at(client):
+    prefix = uuid.uuid4().hex[:8]
+    ticket = {"title": "Checkout", "description": "Fails", "email": f"{prefix}@example.com", "merchant_id": f"m_{prefix}"}
+    body = ndjson(
+        {**ticket, "id": f"{prefix}-1", "created_at": "yesterday"},
+        {**ticket, "id": f"{prefix}-2", "created_at": "15/01/2024"},
+        {**ticket, "id": f"{prefix}-3", "created_at": "2024-01-15 10:23:45"},
+        {**ticket, "id": f"{prefix}-4", "created_at": "2024-01-15T10:23:45.500000"},
+    )
+    result = client.post("/tickets/import", content=body).json()
+    assert result["imported"] == 2
+    assert [error["line"] for error in result["errors"]] == [1, 2]
+    rows = [json.loads(line) for line in client.get("/tickets/export", params={"merchant_id": f"m_{prefix}"}).text.splitlines()]
+    assert [(row["id"], row["created_at"]) for row in rows] == [
+        (f"{prefix}-3", "2024-01-15T10:23:45"),
+        (f"{prefix}-4", "2024-01-15T10:23:45.500000"),
+    ]
+
+
+def test_ticket_timestamp_converts_zoned_times_to_local():
+    moment = datetime(2024, 1, 15, 10, 23, 45, tzinfo=timezone.utc)
+    assert main.ticket_timestamp(moment) == moment.astimezone().replace(tzinfo=None).isoformat()
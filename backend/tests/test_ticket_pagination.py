@@ -0,0 +1,79 @@
+# Ticket listing: cursor pages (both directions, filtered) and revision deltas
+
+import pytest
+
+from ticket_helpers import expected_order, make_ticket, walk
+from ticket_store import TicketStore
+
+
+@pytest.mark.parametrize("limit", [1, 7, 50, 500])
+def test_pages_cover_every_ticket_in_order(tickets, limit):
+    store = TicketStore()
+    store.add_many(tickets)
+    assert walk(store, limit) == expected_order(tickets)
+    assert walk(store, limit, descending=True) == expected_order(tickets)[::-1]
+
+
+@pytest.mark.parametrize("filters", [
+    {"merchant_id": "m_1"},
+    {"status": "open"},
+    {"merchant_id": "m_2", "status": "closed"},
+    {"merchant_id": "m_3", "status": "open", "email": "user0@example.com"},
+    {"merchant_id": "m_missing"},
+])
+def test_filtered_pages_and_find(tickets, filters):
+    store = TicketStore()
+    for ticket in tickets:
+        store.add(ticket)
+    expected = expected_order(tickets, **filters)
+    assert walk(store, 5, **filters) == expected
+    assert walk(store, 5, descending=True, **filters) == expected[::-1]
+    assert [t.id for t in store.find(**filters)] == expected
+
+
+def test_unknown_cursor_raises(tickets):
+    store = TicketStore()
+    store.add_many(tickets)
+    with pytest.raises(KeyError):
+        store.page(after="no-such-ticket")
+
+
+def test_changes_since_pages_by_revision(tickets):
+    store = TicketStore()
+    for ticket in tickets[:10]:
+        store.add(ticket)
+    revision = store.get_revision()
+    store.update(tickets[3].id, status="pending")
+    store.add(tickets[10])
+    store.update(tickets[0].id, status="pending")
+
+    changed, resume = store.changes_since(revision)
+    assert [t.id for t in changed] == [tickets[3].id, tickets[10].id, tickets[0].id]
+    assert resume is None
+
+    first, resume = store.changes_since(revision, limit=2)
+    assert [t.id for t in first] == [tickets[3].id, tickets[10].id]
+    rest, resume = store.changes_since(resume, limit=2)
+    assert [t.id for t in rest] == [tickets[0].id]
+    assert resume is None
+
+    pending, _ = store.changes_since(revision, status="pending")
+    assert [t.id for t in pending] == [tickets[3].id, tickets[0].id]
+
+
+def test_changes_since_skips_superseded_writes_and_drains_in_pages():
+    store = TicketStore()
+    store.add_many([make_ticket(n) for n in range(500)])
+    revision = store.get_revision()
+    for n in range(2000):
+        store.update(f"t{n % 50:04d}", title=f"edit {n}")
+    # Every ticket's earlier writes are superseded; each shows up once, in last-write order
+    drained, resume = [], revision
+    while True:
+        page, resume = store.changes_since(resume, limit=7)
+        drained.extend(t.id for t in page)
+        if resume is None:
+            break
+    assert drained == [f"t{n % 50:04d}" for n in range(1950, 2000)]
+    assert len(store.change_log) <= 2 * len(store.changed) + 64
+    assert store.changes_since(store.get_revision()) == ([], None)
@@ -0,0 +1,64 @@
+# TicketStore: secondary indexes kept up to date on every write
+
+import random
+
+import pytest
+
+from ticket_helpers import Ticket, check_indexes, expected_order, make_ticket, walk
+from ticket_store import TicketStore
+
+
+@pytest.mark.parametrize("filters", [
+    {"merchant_id": "m_1"},
+    {"status": "open", "email": "user2@example.com"},
+    {"merchant_id": "m_missing"},
+])
+def test_find_uses_the_indexes(tickets, filters):
+    store = TicketStore()
+    for ticket in tickets:
+        store.add(ticket)
+    assert [t.id for t in store.find(**filters)] == expected_order(tickets, **filters)
+    check_indexes(store)
+
+
+def test_updates_move_tickets_between_buckets(tickets):
+    store = TicketStore()
+    store.add_many(tickets)
+    current = {t.id: t for t in tickets}
+    rng = random.Random(11)
+    for _ in range(300):
+        ticket_id = rng.choice(list(current))
+        if rng.random() < 0.5:
+            changes = {"status": rng.choice(["open", "closed", "pending"])}
+            current[ticket_id] = store.update(ticket_id, **changes)
+        else:
+            # Replacing a ticket may move it in the listing order too
+            replacement = make_ticket(rng.randrange(200), id=ticket_id, merchant_id=rng.choice(["m_0", "m_9"]))
+            current[ticket_id] = store.add(replacement)
+    check_indexes(store)
+    assert walk(store, 9) == expected_order(current.values())
+    assert walk(store, 4, status="pending") == expected_order(current.values(), status="pending")
+    assert walk(store, 4, merchant_id="m_9") == expected_order(current.values(), merchant_id="m_9")
+
+
+def test_update_of_missing_ticket_returns_none():
+    store = TicketStore()
+    assert store.update("nope", status="closed") is None
+
+
+def test_add_many_keeps_last_version_of_duplicates():
+    store = TicketStore()
+    assert store.add_many([make_ticket(1), make_ticket(2), make_ticket(1, status="pending")]) == 2
+    assert store.get("t0001").status == "pending"
+    assert [t.id for t in store.find(status="pending")] == ["t0001"]
+    check_indexes(store)
+
+
+def test_listeners_see_previous_version(tickets):
+    store = TicketStore()
+    seen = []
+    store.listeners.append(lambda ticket, previous, revision: seen.append((ticket.status, previous and previous.status, revision)))
+    store.add(tickets[0])
+    store.update(tickets[0].id, status="pending")
+    assert seen == [(tickets[0].status, None, 1), ("pending", tickets[0].status, 2)]
+
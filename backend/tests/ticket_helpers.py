@@ -0,0 +1,54 @@
+# Shared ticket model and checks for the ticket store tests
+
+from pydantic import BaseModel
+
+from ticket_store import INDEXED_FIELDS
+
+
+class Ticket(BaseModel):
+    id: str
+    title: str
+    description: str
+    email: str
+    merchant_id: str
+    status: str
+    created_at: str
+
+
+def make_ticket(n: int, **fields) -> Ticket:
+    values = {
+        "id": f"t{n:04d}",
+        "title": f"Ticket {n}",
+        "description": "Checkout fails",
+        "email": f"user{n % 3}@example.com",
+        "merchant_id": f"m_{n % 4}",
+        "status": "open" if n % 2 else "closed",
+        "created_at": f"2024-01-{1 + n % 28:02d}T10:00:{n % 60:02d}",
+    }
+    values.update(fields)
+    return Ticket(**values)
+
+
+def expected_order(tickets, **filters):
+    matching = [t for t in tickets if all(getattr(t, field) == value for field, value in filters.items())]
+    return [t.id for t in sorted(matching, key=lambda t: (t.created_at, t.id))]
+
+
+def walk(store, limit, descending=False, **filters):
+    ids, after = [], None
+    while True:
+        page, after = store.page(after=after, limit=limit, descending=descending, **filters)
+        ids.extend(t.id for t in page)
+        if after is None:
+            return ids
+
+
+def check_indexes(store):
+    """Every index bucket holds exactly the tickets with that value, in listing order."""
+    for position, field in enumerate(INDEXED_FIELDS):
+        expected = {}
+        for ticket_id, values in store.values.items():
+            expected.setdefault(values[position], []).append(store.keys[ticket_id])
+        buckets = {value: keys for value, keys in store.indexes[field].items() if keys}
+        assert buckets == {value: sorted(keys) for value, keys in expected.items()}
+    assert store.order == sorted(store.keys.values())
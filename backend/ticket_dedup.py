@@ -0,0 +1,155 @@
+# Near-duplicate ticket detection
+# MinHash signatures over ticket text shingles, bucketed with LSH banding, so
+# a reworded ticket for the same merchant, the same logs and the same detected
+# errors can reuse an earlier analysis instead of another Gemini call. Lookups
+# only touch the tickets that share a band bucket, not every analyzed ticket.
+
+import re
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from doc_index import STOPWORDS, tokenize
+
+# Signature length = bands * rows. 8 bands of 8 rows put the LSH
+# candidate threshold around Jaccard (1/8) ** (1/8) ~= 0.77.
+LSH_BANDS = 8
+LSH_ROWS = 8
+NUM_HASHES = LSH_BANDS * LSH_ROWS
+
+# Character shingle width (over the stopword-free token stream)
+SHINGLE_SIZE = 4
+# Estimated Jaccard similarity needed to reuse an analysis
+DEFAULT_SIMILARITY = 0.8
+# Analyzed tickets kept in the index (oldest dropped first)
+DEFAULT_MAX_ENTRIES = 2000
+
+# Universal hash family (a * x + b) mod p over 32-bit values: the largest
+# 32-bit prime keeps a * x + b inside uint64 without overflow
+_PRIME = np.uint64(4294967291)
+_rng = np.random.default_rng(20240611)
+_HASH_A = _rng.integers(1, int(_PRIME), size=NUM_HASHES, dtype=np.uint64)
+_HASH_B = _rng.integers(0, int(_PRIME), size=NUM_HASHES, dtype=np.uint64)
+
+# "Submitted by: <email>" footer of ticket texts; the same on every ticket of a
+# submitter, so it is left out of the shingles
+FOOTER_PATTERN = re.compile(r"^\s*submitted by:.*$", re.IGNORECASE | re.MULTILINE)
+
+
+def shingles(text: str) -> set[str]:
+    """Character shingles of the ticket's title and description words (robust to rewording and typos)."""
+    words = [w for w in tokenize(FOOTER_PATTERN.sub("", text)) if w not in STOPWORDS]
+    stream = " ".join(words)
+    if len(stream) <= SHINGLE_SIZE:
+        return {stream} if stream else set()
+    return {stream[i:i + SHINGLE_SIZE] for i in range(len(stream) - SHINGLE_SIZE + 1)}
+
+
+def minhash(items: set[str]) -> np.ndarray:
+    """MinHash signature: per hash function, the minimum hash over all shingles."""
+    if not items:
+        return np.full(NUM_HASHES, _PRIME, dtype=np.uint64)
+    values = np.fromiter((zlib.crc32(item.encode("utf-8")) for item in items), dtype=np.uint64, count=len(items)) % _PRIME
+    # (num_shingles, NUM_HASHES) matrix of hashes, one column per hash function
+    hashed = (values[:, None] * _HASH_A[None, :] + _HASH_B[None, :]) % _PRIME
+    return hashed.min(axis=0)
+
+
+def log_signature(merchant_id: Optional[str], logs_context: str, error_types: list[str]) -> Optional[str]:
+    """
+    Identity of what the LLM saw about a merchant plus the errors detected in
+    the ticket; duplicates must share it. None when there is neither a merchant
+    nor a detected error to match on, so wording alone never reuses an answer.
+    """
+    if not merchant_id and not error_types:
+        return None
+    key = "\x1f".join([merchant_id or "", logs_context, *sorted(error_types)])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class DuplicateMatch(NamedTuple):
+    """An earlier analysis that a new ticket can reuse."""
+    ticket_text: str
+    similarity: float  # Estimated Jaccard similarity of the shingle sets
+    result: dict
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH index of analyzed tickets.
+
+    Band buckets are keyed by (log signature, band number, band values), so a
+    candidate must come from the same merchant with the same logs context and
+    detected errors, and agree on at least one whole band of its MinHash
+    signature.
+    """
+
+    def __init__(self, similarity: float = DEFAULT_SIMILARITY, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.similarity = similarity
+        self.max_entries = max_entries
+        self.entries: OrderedDict[int, tuple[str, np.ndarray, dict, list[tuple]]] = OrderedDict()
+        self.buckets: dict[tuple, set[int]] = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _band_keys(signature: str, hashes: np.ndarray) -> list[tuple]:
+        bands = hashes.reshape(LSH_BANDS, LSH_ROWS)
+        return [(signature, band, bands[band].tobytes()) for band in range(LSH_BANDS)]
+
+    def add(self, ticket_text: str, signature: str, result: dict):
+        """Index an analyzed ticket and its result."""
+        hashes = minhash(shingles(ticket_text))
+        keys = self._band_keys(signature, hashes)
+        with self.lock:
+            entry_id = self.next_id
+            self.next_id += 1
+            self.entries[entry_id] = (ticket_text, hashes, result, keys)
+            for key in keys:
+                self.buckets.setdefault(key, set()).add(entry_id)
+            while len(self.entries) > self.max_entries:
+                old_id, (_, _, _, old_keys) = self.entries.popitem(last=False)
+                for key in old_keys:
+                    bucket = self.buckets.get(key)
+                    if bucket is not None:
+                        bucket.discard(old_id)
+                        if not bucket:
+                            del self.buckets[key]
+
+    def find(self, ticket_text: str, signature: str) -> Optional[DuplicateMatch]:
+        """Most similar indexed ticket at or above the threshold, or None."""
+        hashes = minhash(shingles(ticket_text))
+        with self.lock:
+            candidates = set()
+            for key in self._band_keys(signature, hashes):
+                candidates |= self.buckets.get(key, set())
+
+            best = None
+            for entry_id in candidates:
+                text, other, result, _ = self.entries[entry_id]
+                similarity = float(np.mean(hashes == other))
+                if similarity >= self.similarity and (best is None or similarity > best.similarity):
+                    best = DuplicateMatch(text, similarity, result)
+
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return best
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "indexed_tickets": len(self.entries),
+            "reused": self.hits,
+            "misses": self.misses,
+            "reuse_rate": f"{(self.hits / lookups * 100):.1f}%" if lookups > 0 else "N/A",
+            "similarity_threshold": self.similarity,
+        }
@@ -0,0 +1,136 @@
+# Real-time ticket change feed
+# The ticket store reports every committed write; the feed turns it into a
+# compact delta (the whole ticket on create, only the changed fields on
+# update) and fans it out to subscribers whose filters match. Each
+# subscriber coalesces what arrives within a short window, so a burst of
+# writes to one ticket goes out as one delta and dashboards receive one
+# message per window instead of refetching the ticket list. Bulk imports are
+# the exception: a batch becomes a single "import" event, and clients fetch
+# the changes since their revision instead of receiving thousands of deltas.
+
+import asyncio
+from typing import Any, Optional
+
+# Deltas arriving within this window go out in one message
+DEFAULT_COALESCE_SECONDS = 0.1
+# Fields a feed can be filtered on
+FILTER_FIELDS = ("merchant_id", "status")
+
+
+class FeedSubscriber:
+    """One connection's filters, its pending (not yet sent) deltas by ticket id and the last pending import."""
+
+    def __init__(self, filters: dict):
+        self.filters = {field: value for field, value in filters.items() if value is not None}
+        self.pending: dict[str, dict] = {}
+        self.imported: Optional[int] = None  # Revision of the newest import not yet announced
+        self.ready = asyncio.Event()
+
+    def _matched(self, ticket: Any) -> bool:
+        return all(getattr(ticket, field) == value for field, value in self.filters.items())
+
+    def wants(self, ticket: Any, previous: Optional[Any]) -> bool:
+        """A ticket is sent if it matches now or did before the write (so clients see it leave the filter)."""
+        return self._matched(ticket) or (previous is not None and self._matched(previous))
+
+    def entering(self, ticket: Any, previous: Optional[Any]) -> bool:
+        """An update that brings a ticket into this filter; the client has not seen it yet."""
+        return previous is not None and bool(self.filters) and not self._matched(previous)
+
+    def push(self, change: dict):
+        existing = self.pending.get(change["id"])
+        if existing is None:
+            self.pending[change["id"]] = {**change, "fields": dict(change["fields"])}
+        else:
+            # Listeners can run out of order across threads: the newer revision wins per field
+            if change["revision"] > existing["revision"]:
+                existing["fields"].update(change["fields"])
+                existing["revision"] = change["revision"]
+            else:
+                existing["fields"] = {**change["fields"], **existing["fields"]}
+            if change["op"] == "create":
+                existing["op"] = "create"
+        self.ready.set()
+
+    def push_import(self, revision: int):
+        self.imported = max(revision, self.imported or 0)
+        self.ready.set()
+
+    async def next_message(self, coalesce_seconds: float) -> dict:
+        """
+        Wait for writes, give the burst a moment to settle, then take everything
+        pending as one message. After an import the pending deltas are dropped:
+        the client's refetch of everything since its revision covers them.
+        """
+        await self.ready.wait()
+        await asyncio.sleep(coalesce_seconds)
+        self.ready.clear()
+        batch = sorted(self.pending.values(), key=lambda change: change["revision"])
+        imported = self.imported
+        self.pending = {}
+        self.imported = None
+        if imported is not None:
+            return {"type": "import", "revision": max(imported, batch[-1]["revision"] if batch else 0)}
+        return {"type": "changes", "revision": batch[-1]["revision"], "changes": batch}
+
+
+class TicketFeed:
+    """
+    Fan-out hub between the ticket store and feed connections.
+
+    publish() is registered as a TicketStore listener and publish_import()
+    as a batch listener; both may be called from any thread, and hand their
+    work to the event loop given to attach(). An
+    update that moves a ticket into a subscriber's filter carries the whole
+    ticket, since that subscriber has not seen it before.
+    """
+
+    def __init__(self, coalesce_seconds: float = DEFAULT_COALESCE_SECONDS):
+        self.coalesce_seconds = coalesce_seconds
+        self.subscribers: set[FeedSubscriber] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    def subscribe(self, **filters) -> FeedSubscriber:
+        for field in filters:
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Cannot filter the feed on '{field}'")
+        subscriber = FeedSubscriber(filters)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: FeedSubscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, ticket: Any, previous: Optional[Any], revision: int):
+        """Store listener: build the delta once and queue it for matching subscribers."""
+        if self.loop is None or not self.subscribers:
+            return
+        full = ticket.model_dump()
+        if previous is None:
+            change = {"op": "create", "id": ticket.id, "revision": revision, "fields": full}
+            entered = change
+        else:
+            before = previous.model_dump()
+            fields = {field: value for field, value in full.items() if before.get(field) != value}
+            change = {"op": "update", "id": ticket.id, "revision": revision, "fields": fields}
+            entered = {**change, "fields": full}
+        self.loop.call_soon_threadsafe(self._fan_out, ticket, previous, change, entered)
+
+    def _fan_out(self, ticket: Any, previous: Optional[Any], change: dict, entered: dict):
+        for subscriber in self.subscribers:
+            if subscriber.wants(ticket, previous):
+                subscriber.push(entered if subscriber.entering(ticket, previous) else change)
+
+    def publish_import(self, batch: list[Any], previous: dict[str, Any], revision: int):
+        """Batch listener: one import event for subscribers that any ticket of the batch concerns."""
+        if self.loop is None or not self.subscribers:
+            return
+        self.loop.call_soon_threadsafe(self._fan_out_import, batch, previous, revision)
+
+    def _fan_out_import(self, batch: list[Any], previous: dict[str, Any], revision: int):
+        for subscriber in self.subscribers:
+            if any(subscriber.wants(ticket, previous.get(ticket.id)) for ticket in batch):
+                subscriber.push_import(revision)
@@ -0,0 +1,484 @@
+# Indexed ticket store
+# Tickets by id, plus secondary indexes (merchant_id, status, email) kept up
+# to date on every write, so lookups and filtered listings never scan the
+# whole ticket history. Safe to call from FastAPI's sync-endpoint threadpool.
+# Every write bumps a store revision, which backs cheap change detection
+# (ETags) and "what changed since revision N" deltas.
+# With a persistence backend (ticket_db.py) writes are durable before they
+# return, and a restart loads only the index columns; bodies load on demand.
+# Listeners (e.g. the WebSocket change feed) are told about every write.
+# Bulk imports go through add_many(): one lock pass, one backend write and one
+# batch notification per batch, and with a backend the imported bodies stay
+# on disk until needed.
+# Listings are ordered by (created_at, id), so imported historical tickets
+# sit among the others by their own creation time.
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Iterator, Optional
+
+from ticket_db import TicketBackend
+
+# Fields with a secondary index: value -> listing keys of tickets with that value, kept sorted
+INDEXED_FIELDS = ("merchant_id", "status", "email")
+# Record lock stripes; writes to different tickets rarely contend
+LOCK_STRIPES = 16
+# Out-of-order keys inserted one at a time into a sorted list; beyond this the list is rebuilt once
+INSORT_LIMIT = 64
+
+
+def insert_sorted(keys: list[tuple], new: list[tuple]):
+    """Merge listing keys (already sorted) into a sorted list of keys."""
+    if not new:
+        return
+    if not keys or new[0] > keys[-1]:
+        keys.extend(new)  # The usual case: newer than everything listed
+    elif len(new) <= INSORT_LIMIT:
+        for key in new:
+            insort(keys, key)
+    else:
+        # Bisect each new key's slot (slots only move forward) and rebuild the list once
+        merged = []
+        start = 0
+        for key in new:
+            position = bisect_right(keys, key, lo=start)
+            merged.extend(keys[start:position])
+            merged.append(key)
+            start = position
+        merged.extend(keys[start:])
+        keys[:] = merged
+
+
+def remove_sorted(keys: list[tuple], key: tuple):
+    """Remove a listing key from a sorted list of keys, if present."""
+    position = bisect_left(keys, key)
+    if position < len(keys) and keys[position] == key:
+        del keys[position]
+
+
+class TicketStore:
+    """
+    Ticket repository: id -> ticket hash map with secondary indexes.
+
+    Tickets are immutable pydantic models; an update swaps in a copy with the
+    changed fields (model_copy) and moves the ticket between index buckets.
+    Read-modify-write of one ticket holds that ticket's stripe lock, so
+    concurrent updates of different tickets run in parallel and updates of
+    the same ticket serialize. Index buckets are guarded by one short-held
+    lock. Listings come back ordered by (created_at, id): the listing order
+    and every index bucket are sorted lists of those key tuples, so a page
+    bisects to its cursor (in the smallest matching bucket when filtered)
+    and walks forward from there.
+
+    With a backend, `model` rebuilds tickets from stored rows. Tickets whose
+    body has not been read yet are held as None until first needed.
+
+    Listeners are called as listener(ticket, previous, revision) once a
+    write is durable; previous is None for a new ticket. An add_many()
+    batch calls each batch listener once instead, as
+    batch_listener(tickets, previous, revision) with previous versions by id
+    and the batch's last revision. A write whose
+    commit fails is undone in memory (unless a later write replaced it
+    meanwhile) and the error is raised to the caller.
+    """
+
+    def __init__(self, backend: Optional[TicketBackend] = None, model: Optional[Callable[..., Any]] = None,
+                 stripes: int = LOCK_STRIPES):
+        self.backend = backend
+        self.model = model
+        self.tickets: dict[str, Any] = {}  # id -> ticket, or None while its body is on disk
+        self.values: dict[str, tuple] = {}  # id -> indexed field values
+        self.keys: dict[str, tuple[str, str]] = {}  # id -> listing key (created_at, id)
+        self.order: list[tuple[str, str]] = []  # Listing keys of every ticket, sorted
+        self.revision = 0  # Bumped on every write
+        self.changed: dict[str, int] = {}  # id -> revision of its last write
+        # (revision, id) of every write, ascending; an entry is live while it is its ticket's last write
+        self.change_log: list[tuple[int, str]] = []
+        self.indexes: dict[str, dict[Any, list[tuple[str, str]]]] = {field: {} for field in INDEXED_FIELDS}
+        self.stripes = [threading.Lock() for _ in range(stripes)]
+        self.index_lock = threading.Lock()
+
+        self.loaded = backend is None
+        self.load_lock = threading.Lock()
+        self.listeners: list[Callable[[Any, Optional[Any], int], None]] = []
+        self.batch_listeners: list[Callable[[list[Any], dict[str, Any], int], None]] = []
+
+    def _stripe(self, ticket_id: str) -> threading.Lock:
+        return self.stripes[hash(ticket_id) % len(self.stripes)]
+
+    def _ensure_loaded(self):
+        """First access with a backend: rebuild order, indexes and change log from the index columns."""
+        if self.loaded:
+            return
+        with self.load_lock:
+            if self.loaded:
+                return
+            rows = list(self.backend.load_index())
+            with self.index_lock:
+                for ticket_id, created_at, revision, merchant_id, status, email in rows:
+                    self.keys[ticket_id] = (created_at, ticket_id)
+                    self.order.append(self.keys[ticket_id])
+                    self.tickets[ticket_id] = None
+                    self._index(ticket_id, (merchant_id, status, email))
+                    self.changed[ticket_id] = revision
+                self.change_log = sorted((revision, ticket_id) for ticket_id, revision in self.changed.items())
+                self.revision = max(self.changed.values(), default=0)
+            self.loaded = True
+            print(f"[Tickets] Loaded index of {len(rows)} tickets (bodies on demand)")
+
+    def _bodies(self, ticket_ids: list[str]) -> list[Any]:
+        """Tickets for the ids, reading bodies not in memory yet from the backend in one go."""
+        missing = [ticket_id for ticket_id in ticket_ids if self.tickets.get(ticket_id) is None]
+        if missing:
+            rows = self.backend.load_bodies(missing)
+            with self.index_lock:
+                for ticket_id, row in rows.items():
+                    # A concurrent update may have put a newer version in meanwhile
+                    if self.tickets.get(ticket_id) is None:
+                        self.tickets[ticket_id] = self.model(**row)
+        return [self.tickets[ticket_id] for ticket_id in ticket_ids]
+
+    def _index(self, ticket_id: str, values: tuple):
+        self._index_many([(ticket_id, values)])
+
+    def _index_many(self, entries: list[tuple[str, tuple]]):
+        """Add (id, indexed values) entries to the index buckets, one sorted merge per bucket."""
+        added: dict[tuple[str, Any], list[tuple]] = {}
+        for ticket_id, values in entries:
+            self.values[ticket_id] = values
+            for field, value in zip(INDEXED_FIELDS, values):
+                added.setdefault((field, value), []).append(self.keys[ticket_id])
+        for (field, value), keys in added.items():
+            insert_sorted(self.indexes[field].setdefault(value, []), sorted(keys))
+
+    def _unindex(self, ticket_id: str):
+        """Take a ticket out of its index buckets (before its listing key changes)."""
+        key = self.keys[ticket_id]
+        for field, value in zip(INDEXED_FIELDS, self.values.pop(ticket_id)):
+            bucket = self.indexes[field].get(value)
+            if bucket is not None:
+                remove_sorted(bucket, key)
+                if not bucket:
+                    del self.indexes[field][value]
+
+    def _place(self, ticket: Any) -> Optional[tuple]:
+        """
+        Give a ticket its listing key (caller holds index_lock). Returns the
+        key if it still has to be inserted into order, i.e. the ticket is new
+        or its created_at changed (then it is taken out of order here).
+        """
+        key = (ticket.created_at, ticket.id)
+        previous = self.keys.get(ticket.id)
+        if previous == key:
+            return None
+        if previous is not None:
+            remove_sorted(self.order, previous)
+        self.keys[ticket.id] = key
+        return key
+
+    def _snapshot(self, ticket_id: str) -> Optional[tuple]:
+        """State of a ticket to restore if a write to it fails: (body, indexed values, key), None if new."""
+        if ticket_id not in self.tickets:
+            return None
+        return self.tickets[ticket_id], self.values[ticket_id], self.keys[ticket_id]
+
+    def _restore(self, written: Any, snapshot: Optional[tuple]):
+        """Undo a write whose commit failed, unless a later write replaced it (caller holds index_lock)."""
+        ticket_id = written.id
+        if self.tickets.get(ticket_id) is not written:
+            return
+        self._unindex(ticket_id)
+        remove_sorted(self.order, self.keys[ticket_id])
+        if snapshot is None:
+            del self.tickets[ticket_id], self.keys[ticket_id]
+            self.changed.pop(ticket_id, None)
+            return
+        # Without the body in memory, the row on disk is the last durable version
+        body, values, key = snapshot
+        self.tickets[ticket_id] = body
+        self.keys[ticket_id] = key
+        insert_sorted(self.order, [key])
+        self._index(ticket_id, values)
+
+    def _bump(self, ticket_id: str) -> int:
+        """Bump the store revision for a write to this ticket (caller holds index_lock)."""
+        self.revision += 1
+        self.changed[ticket_id] = self.revision
+        self.change_log.append((self.revision, ticket_id))
+        # Superseded entries are dropped once they make up half the log (amortized O(1) per write)
+        if len(self.change_log) > 2 * len(self.changed) + 64:
+            self.change_log = [(rev, tid) for rev, tid in self.change_log if self.changed.get(tid) == rev]
+        return self.revision
+
+    def _touch(self, ticket: Any):
+        """Record a write and hand it to the backend (caller holds index_lock, so writes reach it in revision order)."""
+        self._bump(ticket.id)
+        if self.backend is not None:
+            return self.backend.write(ticket.model_dump(), self.revision)
+        return None
+
+    def _notify(self, ticket: Any, previous: Optional[Any], revision: int):
+        for listener in self.listeners:
+            try:
+                listener(ticket, previous, revision)
+            except Exception as e:
+                print(f"[Tickets] Listener failed for {ticket.id}: {e}")
+
+    def _notify_batch(self, batch: list[Any], previous: dict[str, Any], revision: int):
+        for listener in self.batch_listeners:
+            try:
+                listener(batch, previous, revision)
+            except Exception as e:
+                print(f"[Tickets] Batch listener failed for {len(batch)} tickets: {e}")
+
+    def add(self, ticket: Any) -> Any:
+        """Insert or replace a ticket. With a backend, returns once it is durable."""
+        self._ensure_loaded()
+        with self._stripe(ticket.id):
+            previous = self._bodies([ticket.id])[0] if ticket.id in self.tickets else None
+            with self.index_lock:
+                snapshot = self._snapshot(ticket.id)
+                if ticket.id in self.tickets:
+                    self._unindex(ticket.id)
+                key = self._place(ticket)
+                if key is not None:
+                    insert_sorted(self.order, [key])
+                self.tickets[ticket.id] = ticket
+                self._index(ticket.id, tuple(getattr(ticket, field) for field in INDEXED_FIELDS))
+                written = self._touch(ticket)
+                revision = self.revision
+        if written is not None:
+            try:
+                written.result()
+            except Exception:
+                with self.index_lock:
+                    self._restore(ticket, snapshot)
+                raise
+        self._notify(ticket, previous, revision)
+        return ticket
+
+    def add_many(self, batch: list[Any], keep_bodies: bool = True) -> int:
+        """
+        Insert or replace a batch of tickets (bulk import). Takes every stripe
+        lock once instead of one per ticket and hands the backend one write for
+        the whole batch; returns the number of tickets once it is durable.
+        Batch listeners hear about the batch once; per-ticket listeners do not.
+        With a backend and keep_bodies=False the bodies are dropped from
+        memory after the commit, as after a restart.
+        """
+        self._ensure_loaded()
+        # A ticket listed twice is imported once, as its last version
+        batch = list({ticket.id: ticket for ticket in batch}.values())
+        rows = [ticket.model_dump() for ticket in batch] if self.backend is not None else None
+        # Always in the same order, so this cannot deadlock with single-ticket writers
+        for stripe in self.stripes:
+            stripe.acquire()
+        try:
+            replaced = [ticket.id for ticket in batch if ticket.id in self.tickets]
+            previous = dict(zip(replaced, self._bodies(replaced))) if replaced and self.batch_listeners else {}
+            revisions = []
+            placed = []
+            with self.index_lock:
+                snapshots = [self._snapshot(ticket.id) for ticket in batch]
+                for ticket in batch:
+                    if ticket.id in self.tickets:
+                        self._unindex(ticket.id)
+                    key = self._place(ticket)
+                    if key is not None:
+                        placed.append(key)
+                    self.tickets[ticket.id] = ticket
+                    revisions.append(self._bump(ticket.id))
+                # One merge per list for the batch; historical imports land by their created_at
+                insert_sorted(self.order, sorted(placed))
+                self._index_many([(ticket.id, tuple(getattr(ticket, field) for field in INDEXED_FIELDS))
+                                  for ticket in batch])
+                written = None
+                if self.backend is not None:
+                    written = self.backend.write_many(list(zip(rows, revisions)))
+        finally:
+            for stripe in reversed(self.stripes):
+                stripe.release()
+        if written is not None:
+            try:
+                written.result()
+            except Exception:
+                with self.index_lock:
+                    for ticket, snapshot in zip(batch, snapshots):
+                        self._restore(ticket, snapshot)
+                raise
+            if not keep_bodies:
+                with self.index_lock:
+                    for ticket in batch:
+                        # Leave alone tickets updated since; their body is the newer one
+                        if self.tickets.get(ticket.id) is ticket:
+                            self.tickets[ticket.id] = None
+        if batch:
+            self._notify_batch(batch, previous, revisions[-1])
+        return len(batch)
+
+    def get(self, ticket_id: str) -> Optional[Any]:
+        self._ensure_loaded()
+        if ticket_id not in self.tickets:
+            return None
+        return self._bodies([ticket_id])[0]
+
+    def update(self, ticket_id: str, **changes) -> Optional[Any]:
+        """Change fields of a ticket. Returns the updated ticket, or None if there is no such ticket."""
+        self._ensure_loaded()
+        with self._stripe(ticket_id):
+            if ticket_id not in self.tickets:
+                return None
+            (ticket,) = self._bodies([ticket_id])
+            updated = ticket.model_copy(update=changes)
+            reindex = any(field in changes for field in INDEXED_FIELDS) or updated.created_at != ticket.created_at
+            with self.index_lock:
+                snapshot = self._snapshot(ticket_id)
+                if reindex:
+                    self._unindex(ticket_id)
+                key = self._place(updated)
+                if key is not None:
+                    insert_sorted(self.order, [key])
+                if reindex:
+                    self._index(ticket_id, tuple(getattr(updated, field) for field in INDEXED_FIELDS))
+                self.tickets[ticket_id] = updated
+                written = self._touch(updated)
+                revision = self.revision
+        if written is not None:
+            try:
+                written.result()
+            except Exception:
+                with self.index_lock:
+                    self._restore(updated, snapshot)
+                raise
+        self._notify(updated, ticket, revision)
+        return updated
+
+    def _active_filters(self, filters: dict) -> list[tuple[str, Any]]:
+        """(field, value) of the given filters, None values ignored."""
+        active = [(field, value) for field, value in filters.items() if value is not None]
+        for field, _ in active:
+            if field not in self.indexes:
+                raise ValueError(f"No index on '{field}'")
+        return active
+
+    def find(self, **filters) -> list[Any]:
+        """Tickets matching every given indexed field, ordered by (created_at, id)."""
+        self._ensure_loaded()
+        ids, _ = self._page_ids(None, len(self.tickets), False, **filters)
+        return self._bodies(ids)
+
+    def page(self, after: Optional[str] = None, limit: int = 100, descending: bool = False,
+             **filters) -> tuple[list[Any], Optional[str]]:
+        """
+        One page of tickets matching the filters, ordered by (created_at, id)
+        (newest first with descending=True). `after` is the cursor: the id of the last
+        ticket of the previous page. Returns (tickets, next cursor or None).
+        Raises KeyError for an unknown cursor.
+        """
+        selected, next_cursor = self._page_ids(after, limit, descending, **filters)
+        return self._bodies(selected), next_cursor
+
+    def _page_ids(self, after: Optional[str], limit: int, descending: bool,
+                  **filters) -> tuple[list[str], Optional[str]]:
+        self._ensure_loaded()
+        active = self._active_filters(filters)
+        with self.index_lock:
+            position = self.keys[after] if after is not None else None
+            ordered, checks = self.order, []
+            if active:
+                # Walk the smallest matching bucket; the other filters are checked on the indexed values
+                smallest = min(active, key=lambda item: len(self.indexes[item[0]].get(item[1], ())))
+                ordered = self.indexes[smallest[0]].get(smallest[1], [])
+                checks = [(INDEXED_FIELDS.index(field), value) for field, value in active if field != smallest[0]]
+            if descending:
+                end = len(ordered) if position is None else bisect_left(ordered, position)
+                positions = range(end - 1, -1, -1)
+            else:
+                start = 0 if position is None else bisect_right(ordered, position)
+                positions = range(start, len(ordered))
+            if not checks:
+                selected = [ordered[i][1] for i in positions[:limit]]
+                more = len(positions) > limit
+            else:
+                selected, more = [], False
+                for i in positions:
+                    ticket_id = ordered[i][1]
+                    values = self.values[ticket_id]
+                    if all(values[field] == value for field, value in checks):
+                        if len(selected) == limit:
+                            more = True
+                            break
+                        selected.append(ticket_id)
+        return selected, (selected[-1] if more and selected else None)
+
+    def export(self, batch_size: int = 1000, **filters) -> Iterator[list[dict]]:
+        """
+        Every ticket matching the filters as plain dicts, ordered by
+        (created_at, id), a batch at a time. Bodies still on disk are read straight into dicts and
+        not kept, so walking the whole store leaves memory as it was.
+        """
+        after = None
+        while True:
+            ids, after = self._page_ids(after, batch_size, False, **filters)
+            in_memory = [self.tickets.get(ticket_id) for ticket_id in ids]
+            missing = [ticket_id for ticket_id, ticket in zip(ids, in_memory) if ticket is None]
+            rows = self.backend.load_bodies(missing) if missing else {}
+            yield [ticket.model_dump() if ticket is not None else rows[ticket_id]
+                   for ticket_id, ticket in zip(ids, in_memory)]
+            if after is None:
+                return
+
+    def changes_since(self, revision: int, limit: Optional[int] = None,
+                      **filters) -> tuple[list[Any], Optional[int]]:
+        """
+        Tickets created or updated after the given revision (matching the
+        filters), oldest change first, at most `limit` of them. Returns
+        (tickets, resume revision): when more changes remain, the revision of
+        the last one returned, to pass back as the next `revision`; else None.
+        """
+        self._ensure_loaded()
+        active = [(INDEXED_FIELDS.index(field), value) for field, value in self._active_filters(filters)]
+        changed, resume = [], None
+        with self.index_lock:
+            # Bisect to the first write after `revision` and walk forward, stopping
+            # once one more match than `limit` shows there is another page
+            position = bisect_right(self.change_log, revision, key=lambda entry: entry[0])
+            for i in range(position, len(self.change_log)):
+                entry_revision, ticket_id = self.change_log[i]
+                if self.changed.get(ticket_id) != entry_revision:
+                    continue  # Superseded by a later write
+                values = self.values[ticket_id]
+                if all(values[field] == value for field, value in active):
+                    if limit is not None and len(changed) == limit:
+                        resume = self.changed[changed[-1]] if changed else revision
+                        break
+                    changed.append(ticket_id)
+        return self._bodies(changed), resume
+
+    def all(self) -> list[Any]:
+        """Every ticket, ordered by (created_at, id)."""
+        self._ensure_loaded()
+        with self.index_lock:
+            ids = [ticket_id for _, ticket_id in self.order]
+        return self._bodies(ids)
+
+    def get_revision(self) -> int:
+        """Current store revision (changes on every write)."""
+        self._ensure_loaded()
+        return self.revision
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self.tickets)
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+
+    def get_stats(self) -> dict:
+        return {
+            "tickets": len(self.tickets),
+            "bodies_in_memory": sum(1 for ticket in self.tickets.values() if ticket is not None),
+            "revision": self.revision,
+            **({"backend": self.backend.get_stats()} if self.backend is not None else {}),
+        }
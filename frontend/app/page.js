@@ -1,11 +1,13 @@
 'use client'
 
 // Main page with login, ticket form and list
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import AgentInsightPanel from '../components/AgentInsightPanel'
 
 const API_URL = 'http://localhost:8000'
+const FEED_URL = `${API_URL.replace(/^http/, 'ws')}/tickets/feed`
 const STORAGE_KEY = 'cyphercypher_user'
+const PAGE_SIZE = 50
 
 export default function Home() {
   const [user, setUser] = useState(null)
@@ -20,6 +22,12 @@ export default function Home() {
   const [description, setDescription] = useState('')
 
   const [tickets, setTickets] = useState([])
+  // GET /tickets paging: cursor of the next page, last store revision seen, ETag of the last refresh
+  const [nextCursor, setNextCursor] = useState(null)
+  const revisionRef = useRef(null)
+  const etagRef = useRef(null)
+  // Live change feed (WS /tickets/feed); while it is open, writes show up without refetching
+  const feedRef = useRef(null)
   const [success, setSuccess] = useState(false)
 
   const [aiResponse, setAiResponse] = useState(null)
@@ -50,16 +58,123 @@ export default function Home() {
     fetchTickets()
   }, [])
 
+  useEffect(() => {
+    let socket = null
+    let retry = null
+    let stopped = false
+
+    function connect() {
+      // Reconnects resume from the last revision seen, so nothing is missed while offline
+      const since = revisionRef.current !== null ? `?since=${revisionRef.current}` : ''
+      socket = new WebSocket(`${FEED_URL}${since}`)
+      feedRef.current = socket
+      socket.onmessage = (event) => {
+        const message = JSON.parse(event.data)
+        if (message.type === 'hello' && message.resync) {
+          // Too much changed while offline: reload the list instead of replaying it
+          revisionRef.current = null
+          fetchTickets()
+          return
+        } else if (message.type === 'hello') {
+          mergeTickets(message.tickets)
+        } else if (message.type === 'changes') {
+          applyChanges(message.changes)
+        } else if (message.type === 'import') {
+          // A bulk import is announced once, not ticket by ticket: fetch the
+          // changes since our revision (fetchTickets advances it)
+          fetchTickets()
+          return
+        }
+        if (revisionRef.current === null || message.revision > Number(revisionRef.current)) {
+          revisionRef.current = message.revision
+        }
+      }
+      socket.onclose = () => {
+        if (!stopped) retry = setTimeout(connect, 3000)
+      }
+    }
+
+    connect()
+    return () => {
+      stopped = true
+      clearTimeout(retry)
+      socket.close()
+    }
+  }, [])
+
+  function feedOpen() {
+    return feedRef.current !== null && feedRef.current.readyState === WebSocket.OPEN
+  }
+
+  // Replace tickets we already have by id, append the rest
+  function mergeTickets(changed) {
+    setTickets((current) => {
+      const byId = new Map(changed.map((ticket) => [ticket.id, ticket]))
+      const merged = current.map((ticket) => byId.get(ticket.id) || ticket)
+      const known = new Set(current.map((ticket) => ticket.id))
+      return merged.concat(changed.filter((ticket) => !known.has(ticket.id)))
+    })
+  }
+
+  // Apply feed deltas: updates patch the fields of tickets we have, creates are appended
+  function applyChanges(changes) {
+    setTickets((current) => {
+      const byId = new Map(current.map((ticket) => [ticket.id, ticket]))
+      const added = []
+      for (const change of changes) {
+        const existing = byId.get(change.id)
+        if (existing) {
+          byId.set(change.id, { ...existing, ...change.fields })
+        } else if (change.op === 'create') {
+          added.push(change.fields)
+        }
+      }
+      return current.map((ticket) => byId.get(ticket.id)).concat(added)
+    })
+  }
+
+  // First call loads the first page; later calls only fetch tickets changed
+  // since the last revision seen (304 when nothing changed)
   async function fetchTickets() {
     try {
-      const res = await fetch(`${API_URL}/tickets`)
-      const data = await res.json()
-      setTickets(data)
+      if (revisionRef.current === null) {
+        const res = await fetch(`${API_URL}/tickets?limit=${PAGE_SIZE}`)
+        const data = await res.json()
+        revisionRef.current = res.headers.get('X-Revision')
+        setTickets(data)
+        setNextCursor(res.headers.get('X-Next-Cursor'))
+        return
+      }
+      // Deltas come a page at a time; keep going while the server has more
+      let more = true
+      while (more) {
+        const res = await fetch(`${API_URL}/tickets?since=${revisionRef.current}`, {
+          headers: etagRef.current ? { 'If-None-Match': etagRef.current } : {},
+        })
+        if (res.status === 304) return
+        const data = await res.json()
+        etagRef.current = res.headers.get('ETag')
+        revisionRef.current = res.headers.get('X-Revision')
+        more = res.headers.get('X-Has-More') === 'true'
+        mergeTickets(data)
+      }
     } catch (error) {
       console.error('Failed to fetch tickets:', error)
     }
   }
 
+  async function loadMoreTickets() {
+    if (!nextCursor) return
+    try {
+      const res = await fetch(`${API_URL}/tickets?limit=${PAGE_SIZE}&cursor=${encodeURIComponent(nextCursor)}`)
+      const data = await res.json()
+      mergeTickets(data)
+      setNextCursor(res.headers.get('X-Next-Cursor'))
+    } catch (error) {
+      console.error('Failed to load more tickets:', error)
+    }
+  }
+
   async function handleLogin(e) {
     e.preventDefault()
     setLoginLoading(true)
@@ -112,7 +227,7 @@ export default function Home() {
         setDescription('')
         setSuccess(true)
         setTimeout(() => setSuccess(false), 3000)
-        fetchTickets()
+        if (!feedOpen()) fetchTickets()
       }
     } catch (error) {
       console.error('Failed to create ticket:', error)
@@ -127,7 +242,7 @@ export default function Home() {
         body: JSON.stringify({ status: newStatus }),
       })
 
-      if (res.ok) {
+      if (res.ok && !feedOpen()) {
         fetchTickets()
       }
     } catch (error) {
@@ -140,11 +255,28 @@ export default function Home() {
     setAiResponse(null)
 
     try {
+      // Answers from the stored analysis when it is current; otherwise queues
+      // a background analysis job, long-polled until it finishes
       const res = await fetch(`${API_URL}/ask-ai/${ticketId}`, {
         method: 'POST',
       })
       const data = await res.json()
-      setAiResponse(data)
+      if (data.result) {
+        setAiResponse({ result: data.result.diagnosis })
+      } else if (!res.ok || !data.job_id) {
+        setAiResponse({ error: data.detail || data.error || 'Analysis failed' })
+      } else {
+        let job = { status: data.status }
+        while (job.status === 'queued' || job.status === 'running') {
+          const poll = await fetch(`${API_URL}/jobs/${data.job_id}?wait=20`)
+          job = await poll.json()
+        }
+        setAiResponse(
+          job.status === 'done'
+            ? { result: job.result.diagnosis }
+            : { error: job.error || job.detail || 'Analysis failed' }
+        )
+      }
     } catch (error) {
       console.error('Failed to ask AI:', error)
       setAiResponse({ error: 'Failed to connect to AI' })
@@ -691,11 +823,29 @@ export default function Home() {
                 </div>
               ))
             )}
+            {nextCursor && (
+              <button
+                onClick={loadMoreTickets}
+                style={{
+                  marginTop: 4,
+                  background: 'transparent',
+                  border: '1px solid rgba(168,85,247,0.25)',
+                  color: '#e9d5ff',
+                  borderRadius: 10,
+                  padding: '8px 14px',
+                  cursor: 'pointer',
+                  fontWeight: 600,
+                }}
+              >
+                Load More
+              </button>
+            )}
           </div>
           {selectedTicket && (
             <AgentInsightPanel
               ticketContent={`${selectedTicket.title}\n\n${selectedTicket.description}\n\nSubmitted by: ${selectedTicket.email}`}
               merchantId={selectedTicket.merchant_id}
+              ticketId={selectedTicket.id}
               onClose={() => setSelectedTicket(null)}
             />
           )}
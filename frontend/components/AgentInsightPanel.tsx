@@ -30,66 +30,100 @@ interface AnalysisResult {
 
 type AnalysisStatus = 'idle' | 'analyzing' | 'complete' | 'error'
 
-const loadingSteps = [
-  'Reading ticket',
-  'Extracting metadata',
-  'Searching logs',
-  'Finding docs',
-  'Generating diagnosis',
-]
+// Splits a Server-Sent Events buffer into complete frames and the unfinished rest
+function parseSSE(buffer: string): { events: { event: string; data: any }[]; rest: string } {
+  const frames = buffer.split('\n\n')
+  const rest = frames.pop() ?? ''
+  const events = frames
+    .map(frame => {
+      let event = 'message'
+      let data = ''
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data += line.slice(5).trim()
+      }
+      return { event, data: data ? JSON.parse(data) : {} }
+    })
+  return { events, rest }
+}
 
 export default function AgentInsightPanel({
   ticketContent,
   merchantId,
+  ticketId,
   onClose,
 }: {
   ticketContent: string
   merchantId?: string
+  ticketId?: string
   onClose?: () => void
 }) {
   const [status, setStatus] = useState<AnalysisStatus>('idle')
   const [result, setResult] = useState<AnalysisResult | null>(null)
   const [error, setError] = useState<string | null>(null)
-  const [step, setStep] = useState(0)
+  const [liveSteps, setLiveSteps] = useState<string[]>([])
+  const [streamedReply, setStreamedReply] = useState('')
   const [copied, setCopied] = useState(false)
   const [reply, setReply] = useState('')
 
-  useEffect(() => {
-    if (status === 'analyzing') {
-      setStep(0)
-      const i = setInterval(() => {
-        setStep(s => Math.min(s + 1, loadingSteps.length - 1))
-      }, 700)
-      return () => clearInterval(i)
-    }
-  }, [status])
-
   const analyzeTicket = useCallback(async () => {
     if (!ticketContent.trim()) return
     setStatus('analyzing')
     setError(null)
+    setLiveSteps([])
+    setStreamedReply('')
 
     try {
-      const res = await fetch(`${API_URL}/agent/analyze`, {
+      // Steps and reply tokens arrive as Server-Sent Events while the agent runs
+      const res = await fetch(`${API_URL}/agent/analyze/stream`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           ticket_text: ticketContent,
           merchant_id: merchantId || null,
+          ticket_id: ticketId || null,
         }),
       })
 
-      if (!res.ok) throw new Error('Analysis failed')
+      if (!res.ok || !res.body) throw new Error('Analysis failed')
 
-      const data: AnalysisResult = await res.json()
-      setResult(data)
-      setReply(data.recommended_action)
-      setStatus('complete')
+      const reader = res.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      let finished = false
+
+      while (!finished) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const { events, rest } = parseSSE(buffer)
+        buffer = rest
+
+        for (const { event, data } of events) {
+          if (event === 'step') {
+            setLiveSteps(steps => [...steps, data.step])
+          } else if (event === 'token') {
+            setStreamedReply(text => text + data.text)
+          } else if (event === 'reset') {
+            setStreamedReply('')
+          } else if (event === 'result') {
+            const final: AnalysisResult = data
+            setResult(final)
+            setReply(final.recommended_action)
+            setStatus('complete')
+            finished = true
+          } else if (event === 'error') {
+            throw new Error(data.detail || 'Analysis failed')
+          }
+        }
+      }
+
+      if (!finished) throw new Error('Analysis stream ended unexpectedly')
     } catch (e: any) {
       setError(e.message)
       setStatus('error')
     }
-  }, [ticketContent, merchantId])
+  }, [ticketContent, merchantId, ticketId])
 
   useEffect(() => {
     analyzeTicket()
@@ -175,24 +209,29 @@ export default function AgentInsightPanel({
           {status === 'analyzing' && (
             <div className="space-y-6 py-10">
               <Loader2 className="w-9 h-9 mx-auto animate-spin text-violet-400" />
-              {loadingSteps.map((s, i) => (
+              {liveSteps.map((s, i) => (
                 <div key={i} className="flex items-center gap-4 text-sm">
                   <div
                     className="w-3 h-3 rounded-full"
                     style={{
                       background:
-                        i <= step ? '#a78bfa' : 'rgba(168,85,247,0.2)',
+                        i === liveSteps.length - 1 ? '#a78bfa' : 'rgba(168,85,247,0.45)',
                     }}
                   />
                   <span
                     className={
-                      i === step ? 'text-violet-100' : 'text-violet-300'
+                      i === liveSteps.length - 1 ? 'text-violet-100' : 'text-violet-300'
                     }
                   >
                     {s}
                   </span>
                 </div>
               ))}
+              {streamedReply && (
+                <div className="rounded-xl p-5 bg-black/40 border border-violet-500/30 text-sm whitespace-pre-wrap">
+                  {streamedReply}
+                </div>
+              )}
             </div>
           )}
 